@@ -3,7 +3,6 @@
 import logging
 import partbuilder
 import sys
-import yaml
 from partbuilder import Action, Step
 
 def msg(a: partbuilder.PartAction):
@@ -42,13 +41,12 @@ def parse_step(s: str) -> Step:
 def main():
     logging.basicConfig(level=logging.DEBUG)
 
-    with open("parts.yaml") as f:
-        parts = yaml.safe_load(f)
+    parts = partbuilder.load_parts("parts.yaml")
 
     target_step = parse_step(sys.argv[1]) if len(sys.argv) > 1 else Step.PRIME
     part_names = sys.argv[2:] if len(sys.argv) > 2 else []
 
-    lf = partbuilder.LifecycleManager(parts=parts)
+    lf = partbuilder.LifecycleManager(parts=parts, validate=False)
     actions = lf.actions(target_step, part_names)
 
     for a in actions:
@@ -14,9 +14,57 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+"""Partbuilder public API.
 
-from ._manager import LifecycleManager  # noqa: F401
-from ._manager import register_pre_step_callback  # noqa: F401
-from ._manager import register_post_step_callback  # noqa: F401
-from ._step import Action, Step, PartAction  # noqa: F401
-from .plugins import register_plugin  # noqa: F401
+The public names are resolved on first access, so importing the package
+doesn't load the YAML and state machinery needed only to plan and execute
+the lifecycle.
+"""
+
+import importlib
+import sys
+import types
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from ._manager import LifecycleManager  # noqa: F401
+    from ._manager import register_pre_step_callback  # noqa: F401
+    from ._manager import register_post_step_callback  # noqa: F401
+    from ._loader import load_parts  # noqa: F401
+    from ._result import ExecutionResult, FailedAction  # noqa: F401
+    from ._step import Action, Step, PartAction  # noqa: F401
+    from .plugins import register_plugin  # noqa: F401
+
+_LAZY_NAMES = {
+    "LifecycleManager": "._manager",
+    "register_pre_step_callback": "._manager",
+    "register_post_step_callback": "._manager",
+    "load_parts": "._loader",
+    "ExecutionResult": "._result",
+    "FailedAction": "._result",
+    "Action": "._step",
+    "Step": "._step",
+    "PartAction": "._step",
+    "register_plugin": ".plugins",
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+class _LazyModule(types.ModuleType):
+    # a module level __getattr__ (PEP 562) needs Python 3.7
+
+    def __getattr__(self, name: str) -> Any:
+        module_name = _LAZY_NAMES.get(name)
+        if not module_name:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(module_name, __name__), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self) -> List[str]:
+        return sorted(set(vars(self)) | set(__all__))
+
+
+sys.modules[__name__].__class__ = _LazyModule
@@ -0,0 +1,156 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Pre and post step callback registration and dispatch."""
+
+# The inspect and asyncio machinery is only imported when callbacks are
+# registered or run, keeping it out of the package import time.
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from ._step import STEPS, Step
+from ._stepinfo import PartStepInfo
+
+if TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures
+
+Callback = Callable[[PartStepInfo], Any]
+
+# A callback and whether it's a coroutine function
+_CallbackEntry = Tuple[Callback, bool]
+
+
+class _CallbackRegistry:
+    """Callbacks to run for each step.
+
+    The dispatch table is rebuilt on registration, so looking up the
+    callbacks for a step during execution is a single dictionary access
+    returning an empty tuple if no callbacks were registered.
+    """
+
+    def __init__(self) -> None:
+        self._callbacks: Dict[Step, List[_CallbackEntry]] = {s: [] for s in STEPS}
+        self.dispatch: Dict[Step, Tuple[_CallbackEntry, ...]] = {s: () for s in STEPS}
+
+    def register(self, callback: Callback, steps: List[Step]) -> None:
+        import inspect
+
+        entry = (callback, inspect.iscoroutinefunction(callback))
+        for step in steps:
+            self._callbacks[step].append(entry)
+            self.dispatch[step] = tuple(self._callbacks[step])
+
+    def clear(self) -> None:
+        for step in STEPS:
+            self._callbacks[step] = []
+            self.dispatch[step] = ()
+
+
+pre_step = _CallbackRegistry()
+post_step = _CallbackRegistry()
+
+
+class AsyncCallbackRunner:
+    """Run coroutine callbacks in a background event loop.
+
+    The event loop thread is only started when the first coroutine callback
+    is submitted. Exiting the context waits for all pending callbacks and
+    raises the first error found, if any.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional["asyncio.AbstractEventLoop"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pending: List["concurrent.futures.Future"] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "AsyncCallbackRunner":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if not self._loop:
+            return
+
+        try:
+            if exc_type is None:
+                for future in self._pending:
+                    future.result()
+            else:
+                for future in self._pending:
+                    future.cancel()
+        finally:
+            self._stop()
+
+    def submit(self, coro) -> "concurrent.futures.Future":
+        import asyncio
+
+        # callbacks are submitted by concurrent actions
+        with self._lock:
+            loop = self._loop or self._start()
+            future = asyncio.run_coroutine_threadsafe(coro, loop)
+            self._pending.append(future)
+        return future
+
+    def _start(self) -> "asyncio.AbstractEventLoop":
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=loop.run_forever, name="partbuilder-callbacks", daemon=True
+        )
+        thread.start()
+        self._loop, self._thread = loop, thread
+        return loop
+
+    def _stop(self) -> None:
+        import concurrent.futures
+
+        loop, thread = self._loop, self._thread
+        if loop is None or thread is None:
+            return
+
+        # wait for cancelled callbacks to unwind before stopping the loop
+        concurrent.futures.wait(self._pending)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        self._loop = None
+        self._thread = None
+        self._pending = []
+
+
+def run_callbacks(
+    callbacks: Tuple[_CallbackEntry, ...],
+    step_info: PartStepInfo,
+    *,
+    runner: AsyncCallbackRunner,
+    wait: bool
+) -> None:
+    """Invoke callbacks for a step.
+
+    Coroutine callbacks run in the runner's event loop. If wait is False
+    they are left running, overlapping with the execution of the next
+    steps, and their completion is checked when the runner exits.
+    """
+
+    for callback, is_async in callbacks:
+        if is_async:
+            future = runner.submit(callback(step_info))
+            if wait:
+                future.result()
+        else:
+            callback(step_info)
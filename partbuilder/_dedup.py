@@ -0,0 +1,150 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Replacement of identical files with hard links.
+
+Files are first grouped by size and metadata, and only the files sharing a
+group with other files are hashed, using the file cache. Files with the same
+content are then replaced by hard links to one of them. Files must also have
+the same permissions and owner, as hard links share them.
+"""
+
+import logging
+import os
+import stat
+from typing import Dict, List, NamedTuple, Tuple
+
+from partbuilder._file_cache import FileCache
+from partbuilder._filesets import compile_fileset
+from partbuilder.utils import file_utils
+
+logger = logging.getLogger(__name__)
+
+# Smaller files are not worth hashing
+_MIN_SIZE = 1024
+
+_Inode = Tuple[int, int]  # device and inode number
+
+# files can only be linked if they have the same device, size, mode and owner
+_GroupKey = Tuple[int, int, int, int, int]
+
+
+class DedupResult(NamedTuple):
+    """The outcome of a deduplication pass."""
+
+    linked: int  # files replaced by hard links
+    saved: int  # bytes freed
+
+
+class _Files(NamedTuple):
+    """The regular files found, by inode."""
+
+    paths: Dict[_Inode, List[str]]
+    stats: Dict[_Inode, os.stat_result]
+    groups: Dict[_GroupKey, List[_Inode]]
+
+
+def deduplicate(
+    roots: List[str], *, cache_dir: str, workers: int = 1, min_size: int = _MIN_SIZE
+) -> DedupResult:
+    """Hard link identical files found under the given directories.
+
+    :param str cache_dir: The partbuilder cache directory.
+    :param int workers: The number of files hashed concurrently.
+    :param int min_size: The size of the smallest files considered.
+    """
+    files = _group(roots, min_size)
+    identical = _identical(files, cache_dir=cache_dir, workers=workers)
+    linked, saved = _link(identical, files)
+
+    if linked:
+        logger.debug(f"hard linked {linked} files, saved {saved} bytes")
+    return DedupResult(linked, saved)
+
+
+def _group(roots: List[str], min_size: int) -> _Files:
+    """Group the files that can be linked together."""
+    files = _Files({}, {}, {})
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        paths, _ = compile_fileset(("*",)).walk(root)
+        for rel in paths:
+            path = os.path.join(root, rel)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                continue
+
+            inode = (st.st_dev, st.st_ino)
+            if inode not in files.paths:
+                files.paths[inode] = []
+                files.stats[inode] = st
+                key = (st.st_dev, st.st_size, st.st_mode, st.st_uid, st.st_gid)
+                files.groups.setdefault(key, []).append(inode)
+            files.paths[inode].append(path)
+    return files
+
+
+def _identical(files: _Files, *, cache_dir: str, workers: int) -> List[List[_Inode]]:
+    """Return the inodes with the same content, hashing the grouped ones."""
+    groups = [group for group in files.groups.values() if len(group) > 1]
+    if not groups:
+        return []
+
+    hashes = FileCache(cache_dir, "sha256").values(
+        {files.paths[i][0]: files.stats[i] for group in groups for i in group},
+        lambda path: file_utils.calculate_hash(path, algorithm="sha256"),
+        workers=workers,
+    )
+
+    identical = []  # type: List[List[_Inode]]
+    for group in groups:
+        by_hash = {}  # type: Dict[str, List[_Inode]]
+        for inode in group:
+            by_hash.setdefault(hashes[files.paths[inode][0]], []).append(inode)
+        identical.extend(inodes for inodes in by_hash.values() if len(inodes) > 1)
+    return identical
+
+
+def _link(identical: List[List[_Inode]], files: _Files) -> Tuple[int, int]:
+    """Link identical files, return the files linked and the bytes freed."""
+    linked = saved = 0
+    for inodes in identical:
+        # keep the inode with the most links, the others may then be freed
+        inodes.sort(key=lambda i: (-files.stats[i].st_nlink, files.paths[i][0]))
+        target = files.paths[inodes[0]][0]
+        for inode in inodes[1:]:
+            try:
+                for path in files.paths[inode]:
+                    _replace_with_link(target, path)
+                    linked += 1
+            except OSError as err:
+                # such as too many links to the target
+                logger.debug(f"cannot link {target!r}: {err}")
+                break
+            if files.stats[inode].st_nlink == len(files.paths[inode]):
+                saved += files.stats[inode].st_size
+    return linked, saved
+
+
+def _replace_with_link(target: str, path: str) -> None:
+    tmp_path = f"{path}.partbuilder-dedup"
+    os.link(target, tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,224 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Durations and resource usage of the steps executed in previous runs.
+
+Every executed action is recorded in a SQLite database in the work dir
+cache, grouped by run (one call to LifecycleManager.execute()). Only the
+latest runs are kept.
+"""
+
+import contextlib
+import logging
+import os
+import resource
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from partbuilder._step import Action, Step, step_for_action
+
+logger = logging.getLogger(__name__)
+
+# Bump when the database schema changes, older databases are discarded
+_SCHEMA_VERSION = 1
+
+# Number of runs to keep
+_MAX_RUNS = 20
+
+# Weight of the latest run in the estimated duration of a step
+_SMOOTHING = 0.5
+
+
+class StepUsage(NamedTuple):
+    """Resources used to execute an action."""
+
+    wall: float
+    cpu: float
+    max_rss: Optional[int] = None
+
+
+class PartDuration(NamedTuple):
+    """Resources used by a part, averaged over the runs it was executed in."""
+
+    part_name: str
+    wall: float
+    cpu: float
+    max_rss: Optional[int]
+    runs: int
+
+
+class UsageMeter:
+    """Measure the resources used since the meter was created.
+
+    CPU time includes the calling thread and the child processes waited
+    for. Children are accounted per process, so with concurrent actions
+    their CPU time is attributed to the actions running when they exit.
+    The kernel only reports the peak RSS of all children waited for so far,
+    so a peak is only known if it's larger than the ones seen before.
+    """
+
+    def __init__(self):
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._wall = time.monotonic()
+        self._cpu = _thread_time() + children.ru_utime + children.ru_stime
+        self._max_rss = children.ru_maxrss
+
+    def stop(self) -> StepUsage:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = _thread_time() + children.ru_utime + children.ru_stime
+        if children.ru_maxrss > self._max_rss:
+            max_rss = children.ru_maxrss * 1024  # type: Optional[int]
+        else:
+            max_rss = None
+
+        return StepUsage(
+            wall=time.monotonic() - self._wall, cpu=cpu - self._cpu, max_rss=max_rss
+        )
+
+
+def _thread_time() -> float:
+    # time.thread_time() needs Python 3.7
+    return time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID)
+
+
+class StepDurations:
+    """Step usage history, kept in the work dir cache.
+
+    The estimated duration of a step is an exponential moving average of
+    its wall time in previous runs. Actions recorded are saved as a new run
+    when save() is called.
+    """
+
+    def __init__(self, cache_dir: str):
+        self._path = os.path.join(cache_dir, "durations.sqlite")
+        self._estimates = None  # type: Optional[Dict[Tuple[str, Step], float]]
+        self._pending = []  # type: List[Tuple[str, Action, StepUsage]]
+
+    @property
+    def estimates(self) -> Dict[Tuple[str, Step], float]:
+        if self._estimates is None:
+            self._estimates = {}
+            rows = self._query("SELECT part, action, wall FROM actions ORDER BY rowid")
+            for part_name, action, wall in rows:
+                self._update_estimate(part_name, step_for_action(Action(action)), wall)
+            for part_name, action, usage in self._pending:
+                self._update_estimate(part_name, step_for_action(action), usage.wall)
+        return self._estimates
+
+    def get(self, part_name: str, step: Step) -> Optional[float]:
+        """Return the estimated duration of a step, if it ran before."""
+        return self.estimates.get((part_name, step))
+
+    def record(self, part_name: str, action: Action, usage: StepUsage) -> None:
+        self._pending.append((part_name, action, usage))
+        self._update_estimate(part_name, step_for_action(action), usage.wall)
+
+    def slowest_parts(self, limit: int = 10) -> List[PartDuration]:
+        """Return the parts that took the longest to execute in saved runs."""
+        rows = self._query(
+            "SELECT part, SUM(wall) / COUNT(DISTINCT run), "
+            "SUM(cpu) / COUNT(DISTINCT run), MAX(max_rss), COUNT(DISTINCT run) "
+            "FROM actions GROUP BY part ORDER BY 2 DESC LIMIT ?",
+            (limit,),
+        )
+        return [PartDuration(*row) for row in rows]
+
+    def save(self) -> None:
+        if not self._pending:
+            return
+
+        import sqlite3
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        try:
+            with _connect(self._path) as conn:
+                run = conn.execute(
+                    "INSERT INTO runs (timestamp) VALUES (?)", (time.time(),)
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (run, name, int(action), u.wall, u.cpu, u.max_rss)
+                        for name, action, u in self._pending
+                    ],
+                )
+                conn.execute(
+                    "DELETE FROM actions WHERE run <= ?", (run - _MAX_RUNS,)
+                )
+                conn.execute("DELETE FROM runs WHERE id <= ?", (run - _MAX_RUNS,))
+        except sqlite3.Error as err:
+            # losing the history must not fail the build
+            logger.warning(f"Cannot save step durations: {err}")
+        else:
+            self._pending = []
+
+    def _update_estimate(self, part_name: str, step: Step, wall: float) -> None:
+        if self._estimates is None:
+            return
+
+        key = (part_name, step)
+        previous = self._estimates.get(key)
+        if previous is not None:
+            wall = _SMOOTHING * wall + (1 - _SMOOTHING) * previous
+        self._estimates[key] = wall
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        if not os.path.exists(self._path):
+            return []
+
+        import sqlite3
+
+        try:
+            with _connect(self._path) as conn:
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as err:
+            logger.warning(f"Cannot read step durations: {err}")
+            return []
+
+
+@contextlib.contextmanager
+def _connect(path: str) -> Iterator[Any]:
+    """Open the database in a transaction, creating the schema if needed."""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        _create_schema(conn)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _create_schema(conn: Any) -> None:
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version != _SCHEMA_VERSION:
+        conn.executescript(
+            f"""
+            DROP TABLE IF EXISTS actions;
+            DROP TABLE IF EXISTS runs;
+            CREATE TABLE runs (id INTEGER PRIMARY KEY, timestamp REAL);
+            CREATE TABLE actions (
+                run INTEGER REFERENCES runs(id),
+                part TEXT,
+                action INTEGER,
+                wall REAL,
+                cpu REAL,
+                max_rss INTEGER
+            );
+            PRAGMA user_version = {_SCHEMA_VERSION};
+            """
+        )
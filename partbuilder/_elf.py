@@ -0,0 +1,242 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Library dependencies of ELF files.
+
+The dynamic section of ELF files is read in-process through mmap, only
+touching the headers, the dynamic section and the referenced strings. Trees
+are scanned on a thread pool and the results are kept in the file cache, so
+scanning files that didn't change since the last scan costs a stat call.
+"""
+
+import logging
+import mmap
+import os
+import stat
+import struct
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from partbuilder._file_cache import FileCache
+
+logger = logging.getLogger(__name__)
+
+_ELF_MAGIC = b"\x7fELF"
+
+# program header types
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+_PT_INTERP = 3
+
+# dynamic section tags
+_DT_NULL = 0
+_DT_NEEDED = 1
+_DT_STRTAB = 5
+_DT_SONAME = 14
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+
+class ElfFile(NamedTuple):
+    """The dynamic linking information of an ELF file."""
+
+    needed: Tuple[str, ...]
+    rpath: Tuple[str, ...]
+    runpath: Tuple[str, ...]
+    soname: Optional[str] = None
+    interpreter: Optional[str] = None
+
+
+def read_elf(path: str) -> Optional[ElfFile]:
+    """Read the dynamic linking information of a file.
+
+    :return: None if the file is not a valid ELF file.
+    """
+    with open(path, "rb") as f:
+        if f.read(4) != _ELF_MAGIC:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _parse(data)
+            except (struct.error, IndexError, ValueError):
+                logger.debug(f"{path}: truncated or invalid ELF file")
+                return None
+
+
+def scan_elf_files(
+    root: str, files: Iterable[str], *, cache_dir: str, workers: int = 1
+) -> Dict[str, ElfFile]:
+    """Return the ELF files among files, relative to root.
+
+    :param str cache_dir: The partbuilder cache directory.
+    :param int workers: The number of files read concurrently.
+    """
+    stats = {}  # type: Dict[str, os.stat_result]
+    for path in files:
+        st = os.lstat(os.path.join(root, path))
+        if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+            stats[path] = st
+
+    values = FileCache(cache_dir, "elf").values(
+        stats, lambda path: _encode(read_elf(os.path.join(root, path))), workers=workers
+    )
+    return {path: _decode(v) for path, v in values.items() if v is not None}
+
+
+def dependency_paths(files: Iterable[str], elf_files: Dict[str, ElfFile]) -> Set[str]:
+    """Return the directories of a tree holding libraries needed by its ELF files.
+
+    Libraries are looked up in the RUNPATH, or the RPATH if there is none,
+    then anywhere in the tree. Libraries not in the tree are provided by the
+    system and are ignored.
+
+    :param files: All files of the tree, including symbolic links.
+    :param elf_files: The ELF files of the tree.
+    """
+    locations = {}  # type: Dict[str, List[str]]
+    for path in files:
+        locations.setdefault(os.path.basename(path), []).append(os.path.dirname(path))
+
+    paths = set()  # type: Set[str]
+    for path, elf in elf_files.items():
+        origin = os.path.dirname(path)
+        search = [_expand_origin(d, origin) for d in (elf.runpath or elf.rpath)]
+        for name in elf.needed:
+            dirs = locations.get(name)
+            if not dirs:
+                continue
+            found = [d for d in search if d in dirs]
+            paths.update(found[:1] or dirs)
+
+    return paths
+
+
+def _parse(data: mmap.mmap) -> Optional[ElfFile]:
+    ei_class, ei_data = data[4], data[5]
+    if ei_class not in (1, 2) or ei_data not in (1, 2):
+        return None
+
+    end = "<" if ei_data == 1 else ">"
+    if ei_class == 2:
+        (phoff,) = struct.unpack_from(end + "Q", data, 32)
+        phentsize, phnum = struct.unpack_from(end + "HH", data, 54)
+        dyn_format = struct.Struct(end + "qQ")
+    else:
+        (phoff,) = struct.unpack_from(end + "I", data, 28)
+        phentsize, phnum = struct.unpack_from(end + "HH", data, 42)
+        dyn_format = struct.Struct(end + "iI")
+
+    loads = []  # type: List[Tuple[int, int, int]]
+    dynamic = None  # type: Optional[Tuple[int, int]]
+    interpreter = None  # type: Optional[str]
+    for i in range(phnum):
+        p_type, offset, vaddr, filesz = _program_header(
+            data, phoff + i * phentsize, end, ei_class
+        )
+        if p_type == _PT_LOAD:
+            loads.append((vaddr, offset, filesz))
+        elif p_type == _PT_DYNAMIC:
+            dynamic = (offset, filesz)
+        elif p_type == _PT_INTERP:
+            interpreter = os.fsdecode(data[offset : offset + filesz].rstrip(b"\0"))
+
+    if dynamic is None:
+        return ElfFile((), (), (), interpreter=interpreter)
+
+    values = _dynamic_strings(data, dynamic, dyn_format, loads)
+
+    def paths(tag: int) -> Tuple[str, ...]:
+        return tuple(p for v in values.get(tag, []) for p in v.split(":") if p)
+
+    return ElfFile(
+        needed=tuple(values.get(_DT_NEEDED, [])),
+        rpath=paths(_DT_RPATH),
+        runpath=paths(_DT_RUNPATH),
+        soname=values.get(_DT_SONAME, [None])[0],
+        interpreter=interpreter,
+    )
+
+
+def _dynamic_strings(
+    data: mmap.mmap,
+    dynamic: Tuple[int, int],
+    dyn_format: struct.Struct,
+    loads: List[Tuple[int, int, int]],
+) -> Dict[int, List[str]]:
+    """Return the string values of the dynamic section entries, by tag."""
+    entries = []  # type: List[Tuple[int, int]]
+    strtab = None
+    offset, size = dynamic
+    for pos in range(offset, offset + size, dyn_format.size):
+        tag, value = dyn_format.unpack_from(data, pos)
+        if tag == _DT_NULL:
+            break
+        if tag == _DT_STRTAB:
+            strtab = _file_offset(loads, value)
+        elif tag in (_DT_NEEDED, _DT_SONAME, _DT_RPATH, _DT_RUNPATH):
+            entries.append((tag, value))
+
+    if strtab is None:
+        raise ValueError("no string table")
+
+    values = {}  # type: Dict[int, List[str]]
+    for tag, value in entries:
+        values.setdefault(tag, []).append(_string(data, strtab + value))
+    return values
+
+
+def _program_header(
+    data: mmap.mmap, pos: int, end: str, ei_class: int
+) -> Tuple[int, int, int, int]:
+    """Return the type, offset, address and size of a segment."""
+    if ei_class == 2:
+        p_type, _, offset, vaddr, _, filesz = struct.unpack_from(
+            end + "IIQQQQ", data, pos
+        )
+    else:
+        p_type, offset, vaddr, _, filesz = struct.unpack_from(end + "IIIII", data, pos)
+    return p_type, offset, vaddr, filesz
+
+
+def _file_offset(loads: List[Tuple[int, int, int]], address: int) -> Optional[int]:
+    for vaddr, offset, filesz in loads:
+        if vaddr <= address < vaddr + filesz:
+            return offset + address - vaddr
+    return None
+
+
+def _string(data: mmap.mmap, pos: int) -> str:
+    end = data.find(b"\0", pos)
+    if end < 0:
+        raise ValueError("unterminated string")
+    return os.fsdecode(data[pos:end])
+
+
+def _expand_origin(path: str, origin: str) -> str:
+    """Return a search path relative to the tree root."""
+    path = path.replace("${ORIGIN}", "$ORIGIN")
+    if path.startswith("$ORIGIN"):
+        path = os.path.join(origin, path[len("$ORIGIN") :].lstrip("/"))
+    path = os.path.normpath(path.lstrip("/"))
+    return "" if path == "." else path
+
+
+def _encode(elf: Optional[ElfFile]) -> Optional[List]:
+    return None if elf is None else list(elf)
+
+
+def _decode(value: List) -> ElfFile:
+    needed, rpath, runpath, soname, interpreter = value
+    return ElfFile(tuple(needed), tuple(rpath), tuple(runpath), soname, interpreter)
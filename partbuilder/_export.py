@@ -0,0 +1,247 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Export of the prime directory to a compressed tar archive.
+
+The tar stream is cut in fixed size chunks that are compressed concurrently,
+each into a gzip member. Concatenated gzip members are a valid gzip file, so
+the archive can be read by any tar implementation.
+
+The entries are taken from the prime manifests rather than by walking the
+tree, and read from the parts' install directories. An index written next to
+the archive records where each gzip member and each file's data start, so a
+file can be read by decompressing a single chunk instead of the whole archive:
+
+    {
+        "version": 1,
+        "members": [[compressed offset, uncompressed offset], ...],
+        "files": {path: [uncompressed offset, size], ...}
+    }
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import tarfile
+import zlib
+from typing import IO, Any, Deque, Dict, List, Optional, Sequence, Tuple, cast
+
+from partbuilder._part import Part
+from partbuilder.sequencer.states import MANIFEST_SUFFIX, Manifest
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+# Size of the tar stream chunks compressed as one gzip member
+_CHUNK_SIZE = 1 << 20
+
+_COMPRESSION_LEVEL = 6
+
+
+def export_prime(
+    archive_path: str,
+    *,
+    parts: Sequence[Part],
+    workers: int = 1,
+    reproducible: bool = False,
+) -> None:
+    """Write the primed files of the given parts to a tar.gz archive.
+
+    The entries listed in a part's prime manifest are read from its install
+    directory, see partbuilder.executor.
+
+    :param int workers: The number of chunks compressed concurrently.
+    :param bool reproducible: Whether to make the archive only depend on the
+        content of the files: entries are sorted, owners are reset, and
+        timestamps are set to $SOURCE_DATE_EPOCH, or 0 if not defined.
+    """
+    entries = _primed_entries(parts)
+    if reproducible:
+        entries.sort()
+        mtime: Optional[int] = int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+    else:
+        mtime = None
+
+    tmp_path = archive_path + ".partial"
+    try:
+        with open(tmp_path, "wb") as out, concurrent.futures.ThreadPoolExecutor(
+            workers
+        ) as pool:
+            stream = _GzipMembers(out, pool=pool, workers=workers)
+            # tarfile only writes to and tells the position of the stream
+            with tarfile.TarFile(fileobj=cast(IO[bytes], stream), mode="w") as tar:
+                files = _add_entries(tar, entries, mtime=mtime)
+            stream.close()
+
+        index = {"version": INDEX_VERSION, "members": stream.members, "files": files}
+        with open(tmp_path + INDEX_SUFFIX, "w") as f:
+            json.dump(index, f, sort_keys=reproducible)
+    except BaseException:
+        for path in (tmp_path, tmp_path + INDEX_SUFFIX):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+        raise
+
+    os.replace(tmp_path + INDEX_SUFFIX, archive_path + INDEX_SUFFIX)
+    os.replace(tmp_path, archive_path)
+
+
+def _add_entries(
+    tar: tarfile.TarFile, entries: List[Tuple[str, str]], *, mtime: Optional[int]
+) -> Dict[str, List[int]]:
+    """Add entries to an archive, returning the data offset and size of files.
+
+    :param entries: The path of each entry, and the directory it is read from.
+    :param mtime: The timestamp of all entries, if normalized.
+    """
+    files: Dict[str, List[int]] = {}
+    for path, root in entries:
+        tarinfo = tar.gettarinfo(os.path.join(root, path), arcname=path)
+        if tarinfo is None:
+            logger.warning(f"Cannot export {path!r}: unsupported file type")
+            continue
+        if mtime is not None:
+            _normalize(tarinfo, mtime)
+
+        if tarinfo.isreg():
+            with open(os.path.join(root, path), "rb") as f:
+                tar.addfile(tarinfo, f)
+            data_size = -(-tarinfo.size // tarfile.BLOCKSIZE)
+            data_offset = tar.offset - data_size * tarfile.BLOCKSIZE
+            files[path] = [data_offset, tarinfo.size]
+        else:
+            tar.addfile(tarinfo)
+            if tarinfo.islnk() and tarinfo.linkname in files:
+                files[path] = files[tarinfo.linkname]
+    return files
+
+
+def read_file(archive_path: str, path: str) -> bytes:
+    """Read the content of a file from an archive, using its index."""
+    with open(archive_path + INDEX_SUFFIX) as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"unsupported archive index version in {archive_path!r}")
+
+    offset, size = index["files"][path]
+    members = [m for m in index["members"] if m[1] <= offset]
+    compressed_offset, uncompressed_offset = members[-1]
+
+    data = bytearray()
+    skip = offset - uncompressed_offset
+    with open(archive_path, "rb") as f:
+        f.seek(compressed_offset)
+        decompressor = zlib.decompressobj(31)
+        while len(data) < skip + size:
+            if decompressor.eof:
+                # continue with the next member
+                unused = decompressor.unused_data
+                decompressor = zlib.decompressobj(31)
+                data += decompressor.decompress(unused)
+                continue
+            chunk = f.read(65536)
+            if not chunk:
+                raise ValueError(f"truncated archive {archive_path!r}")
+            data += decompressor.decompress(chunk)
+
+    return bytes(data[skip : skip + size])
+
+
+def _primed_entries(parts: Sequence[Part]) -> List[Tuple[str, str]]:
+    """Return the directories then files primed by the parts.
+
+    Each entry is returned with the install directory it is read from. An
+    entry primed by several parts is read from the first one.
+    """
+    directories: Dict[str, str] = {}
+    files: Dict[str, str] = {}
+    for part in parts:
+        manifest_file = os.path.join(part.part_state_dir, "prime" + MANIFEST_SUFFIX)
+        if not os.path.exists(manifest_file):
+            continue
+        manifest = Manifest(manifest_file)
+        root = part.part_install_dir
+        for path in manifest.directories:
+            directories.setdefault(path, root)
+        for path in manifest.files:
+            files.setdefault(path, root)
+    return list(directories.items()) + list(files.items())
+
+
+def _normalize(tarinfo: tarfile.TarInfo, mtime: int) -> None:
+    tarinfo.mtime = mtime
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ""
+
+
+def _compress(data: bytes) -> bytes:
+    compressor = zlib.compressobj(_COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _GzipMembers:
+    """A writable stream compressing chunks concurrently as gzip members.
+
+    zlib releases the GIL while compressing, so chunks are compressed in
+    parallel by the threads of the pool. At most two chunks per worker are
+    kept in memory.
+    """
+
+    def __init__(self, out: IO[bytes], *, pool: Any, workers: int):
+        self._out = out
+        self._pool = pool
+        self._max_pending = 2 * max(workers, 1)
+        self._buffer = bytearray()
+        self._offset = 0  # uncompressed bytes written
+        self._compressed = 0
+        self._pending: Deque[Tuple[int, Any]] = collections.deque()
+        self.members: List[List[int]] = []
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self._offset += len(data)
+        while len(self._buffer) >= _CHUNK_SIZE:
+            self._submit(bytes(self._buffer[:_CHUNK_SIZE]))
+            del self._buffer[:_CHUNK_SIZE]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def close(self) -> None:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_next()
+
+    def _submit(self, chunk: bytes) -> None:
+        start = self._offset - len(self._buffer)
+        self._pending.append((start, self._pool.submit(_compress, chunk)))
+        while len(self._pending) > self._max_pending:
+            self._write_next()
+
+    def _write_next(self) -> None:
+        start, future = self._pending.popleft()
+        data = future.result()
+        self._out.write(data)
+        self.members.append([self._compressed, start])
+        self._compressed += len(data)
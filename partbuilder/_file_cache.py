@@ -0,0 +1,171 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of values computed from the content of files.
+
+Values such as content hashes or the dynamic section of ELF files are kept
+in a SQLite database in the work dir cache, keyed by the fingerprint of the
+file they were computed from: its device, inode, size and modification time.
+A file that wasn't modified since gets the cached value, even if it was
+renamed or hard linked meanwhile.
+"""
+
+import contextlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Bump when the database schema changes, older databases are discarded
+_SCHEMA_VERSION = 1
+
+# Number of entries of each kind to keep, the oldest ones are dropped
+_MAX_ENTRIES = 500000
+
+# Number of keys looked up per query
+_BATCH_SIZE = 500
+
+
+def fingerprint(st: os.stat_result) -> str:
+    """Return the key of the values computed from a file."""
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class FileCache:
+    """Values of one kind, keyed by file fingerprint.
+
+    :param str cache_dir: The partbuilder cache directory.
+    :param str kind: The name of the values, such as "sha256".
+    """
+
+    def __init__(self, cache_dir: str, kind: str):
+        self._path = os.path.join(cache_dir, "files.sqlite")
+        self._kind = kind
+
+    def values(
+        self,
+        stats: Dict[str, os.stat_result],
+        compute: Callable[[str], Any],
+        *,
+        workers: int = 1,
+    ) -> Dict[str, Any]:
+        """Return the value of each file, computing the ones not cached.
+
+        :param stats: The stat results of the files, by path.
+        :param compute: The function computing the value of a file from its
+            path. Values must be serializable to JSON.
+        :param int workers: The number of values computed concurrently.
+        """
+        keys = {path: fingerprint(st) for path, st in stats.items()}
+        cached = self.lookup(keys.values())
+        missing = [path for path, key in keys.items() if key not in cached]
+        if missing:
+            logger.debug(f"{self._kind}: computing {len(missing)} of {len(keys)}")
+            if workers > 1 and len(missing) > 1:
+                import concurrent.futures
+
+                with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+                    results = list(pool.map(compute, missing))
+            else:
+                results = [compute(path) for path in missing]
+
+            computed = {keys[p]: value for p, value in zip(missing, results)}
+            self.store(computed)
+            cached.update(computed)
+
+        return {path: cached[key] for path, key in keys.items()}
+
+    def lookup(self, fingerprints: Iterable[str]) -> Dict[str, Any]:
+        """Return the cached values of the given fingerprints, if any."""
+        if not os.path.exists(self._path):
+            return {}
+
+        import sqlite3
+
+        keys = list(set(fingerprints))
+        values = {}  # type: Dict[str, Any]
+        try:
+            with _connect(self._path) as conn:
+                for i in range(0, len(keys), _BATCH_SIZE):
+                    batch = keys[i : i + _BATCH_SIZE]
+                    rows = conn.execute(
+                        "SELECT key, value FROM entries WHERE kind = ? "
+                        f"AND key IN ({', '.join('?' * len(batch))})",
+                        [self._kind, *batch],
+                    )
+                    values.update((key, json.loads(value)) for key, value in rows)
+        except sqlite3.Error as err:
+            logger.warning(f"Cannot read file cache: {err}")
+            return {}
+
+        return values
+
+    def store(self, values: Dict[str, Any]) -> None:
+        """Cache values computed from files with the given fingerprints."""
+        if not values:
+            return
+
+        import sqlite3
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        try:
+            with _connect(self._path) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries (kind, key, value) "
+                    "VALUES (?, ?, ?)",
+                    [(self._kind, k, json.dumps(v)) for k, v in values.items()],
+                )
+                (last,) = conn.execute("SELECT MAX(rowid) FROM entries").fetchone()
+                conn.execute(
+                    "DELETE FROM entries WHERE kind = ? AND rowid <= ?",
+                    (self._kind, last - _MAX_ENTRIES),
+                )
+        except sqlite3.Error as err:
+            # losing the cache only makes the next run slower
+            logger.warning(f"Cannot save file cache: {err}")
+
+
+@contextlib.contextmanager
+def _connect(path: str) -> Iterator[Any]:
+    """Open the database in a transaction, creating the schema if needed."""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        _create_schema(conn)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _create_schema(conn: Any) -> None:
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version != _SCHEMA_VERSION:
+        conn.executescript(
+            f"""
+            DROP TABLE IF EXISTS entries;
+            CREATE TABLE entries (
+                kind TEXT,
+                key TEXT,
+                value TEXT,
+                UNIQUE (kind, key)
+            );
+            PRAGMA user_version = {_SCHEMA_VERSION};
+            """
+        )
@@ -0,0 +1,229 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Selection of the files to stage and prime.
+
+The `stage` and `prime` properties are lists of glob patterns relative to
+the part's install directory, and references to named `filesets`. Patterns
+starting with a dash exclude files. A pattern matching a directory selects
+everything under it, and if no include patterns are given, everything is
+included.
+
+All patterns of a list are compiled into a few regular expressions, so each
+path is checked once against the whole list. Directories that are excluded,
+or that can't contain included files, are not visited.
+"""
+
+import functools
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from partbuilder import errors
+
+
+def expand_filesets(
+    part_name: str, entries: List[str], filesets: Dict[str, List[str]]
+) -> Tuple[str, ...]:
+    """Replace references to named filesets with their patterns.
+
+    :param part_name: The name of the part the entries belong to.
+    :param entries: Patterns and `$name` fileset references.
+    :param filesets: The part's named filesets.
+    """
+    patterns = []  # type: List[str]
+    for entry in entries:
+        if entry.startswith("$"):
+            name = entry[1:]
+            if name not in filesets:
+                raise errors.PartbuilderFilesetNotFound(part_name, name)
+            patterns.extend(filesets[name])
+        else:
+            patterns.append(entry)
+
+    for pattern in patterns:
+        if pattern.lstrip("-").startswith("/"):
+            raise errors.PartbuilderInvalidFileset(part_name, pattern)
+
+    return tuple(patterns)
+
+
+class FilesetMatcher:
+    """A compiled list of include and exclude patterns.
+
+    Use compile_fileset() to obtain cached instances.
+    """
+
+    def __init__(self, patterns: Tuple[str, ...]):
+        includes = [_normalize(p) for p in patterns if not p.startswith("-")]
+        excludes = [_normalize(p[1:]) for p in patterns if p.startswith("-")]
+        if not includes or "*" in includes:
+            includes = []  # everything
+
+        self._include_all = not includes
+        self._include = _compile(includes)
+        self._include_prefix = _compile_prefixes(includes)
+        self._exclude = _compile(excludes)
+
+    def matches(self, path: str) -> bool:
+        """Whether a path relative to the tree root is selected."""
+        if self._exclude and self._exclude.match(path):
+            return False
+        if self._include_all:
+            return True
+        return bool(self._include and self._include.match(path))
+
+    def filter(
+        self, files: Iterable[str], directories: Iterable[str]
+    ) -> Tuple[List[str], List[str]]:
+        """Select files and directories from lists of paths.
+
+        The parent directories of selected entries are also returned.
+        """
+        selected_files = [f for f in files if self.matches(f)]
+        dirs = {d for d in directories if self.matches(d)}
+        for path in selected_files:
+            _add_parents(dirs, os.path.dirname(path))
+        return selected_files, sorted(dirs)
+
+    def walk(self, root: str) -> Tuple[List[str], List[str]]:
+        """Return the selected files and directories under root.
+
+        The parent directories of selected entries are also returned.
+        """
+        files = []  # type: List[str]
+        dirs = set()  # type: Set[str]
+
+        # directories to visit, and whether everything under them is included
+        stack = [("", self._include_all)]
+        while stack:
+            rel, included = stack.pop()
+            with os.scandir(os.path.join(root, rel)) as entries:
+                for entry in entries:
+                    path = rel + entry.name
+                    if self._exclude and self._exclude.match(path):
+                        continue
+
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    selected = included or bool(
+                        self._include and self._include.match(path)
+                    )
+                    if selected:
+                        if is_dir:
+                            dirs.add(path)
+                        else:
+                            files.append(path)
+                            _add_parents(dirs, rel.rstrip("/"))
+                    if is_dir and (
+                        selected or self._include_prefix.match(path) is not None
+                    ):
+                        stack.append((path + "/", selected))
+
+        return sorted(files), sorted(dirs)
+
+
+@functools.lru_cache(maxsize=128)
+def compile_fileset(patterns: Tuple[str, ...]) -> FilesetMatcher:
+    """Return the compiled matcher for a pattern list."""
+    return FilesetMatcher(patterns)
+
+
+def _normalize(pattern: str) -> str:
+    return os.path.normpath(pattern).lstrip("/")
+
+
+def _add_parents(dirs: Set[str], path: str) -> None:
+    while path and path not in dirs:
+        dirs.add(path)
+        path = os.path.dirname(path)
+
+
+def _compile(patterns: List[str]) -> Optional["re.Pattern"]:
+    """Compile a regex matching the patterns and everything under them."""
+    if not patterns:
+        return None
+
+    regex = "|".join(translate_glob(p) for p in patterns)
+    return re.compile(f"(?:{regex})(?:/.*)?\\Z", re.DOTALL)
+
+
+def _compile_prefixes(patterns: List[str]) -> "re.Pattern":
+    """Compile a regex matching the directories that may contain matches.
+
+    These are the paths matching the first components of a pattern.
+    """
+    alternatives = []
+    for pattern in patterns:
+        components = [translate_glob(c) for c in pattern.split("/")][:-1]
+        if not components:
+            continue
+        regex = components[-1]
+        for component in reversed(components[:-1]):
+            regex = f"{component}(?:/{regex})?"
+        alternatives.append(regex)
+
+    if not alternatives:
+        return re.compile("(?!)")
+    return re.compile(f"(?:{'|'.join(alternatives)})\\Z", re.DOTALL)
+
+
+def translate_glob(pattern: str) -> str:
+    """Translate a glob pattern to a regex, wildcards don't match slashes."""
+    i, n = 0, len(pattern)
+    regex = []
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            while i < n and pattern[i] == "*":
+                i += 1
+            regex.append("[^/]*")
+        elif c == "?":
+            regex.append("[^/]")
+        elif c == "[":
+            part, i = _translate_class(pattern, i)
+            regex.append(part)
+        else:
+            regex.append(re.escape(c))
+    return "".join(regex)
+
+
+def _translate_class(pattern: str, i: int) -> Tuple[str, int]:
+    """Translate the character class starting after the bracket at i - 1.
+
+    :return: The regex and the position following the class.
+    """
+    j, n = i, len(pattern)
+    if j < n and pattern[j] == "!":
+        j += 1
+    # a leading bracket is part of the class
+    if j < n and pattern[j] == "]":
+        j += 1
+    while j < n and pattern[j] != "]":
+        j += 1
+    if j >= n:
+        return "\\[", i
+
+    chars = pattern[i:j].replace("\\", "\\\\")
+    if chars.startswith("!"):
+        # a negated class doesn't match slashes either
+        chars = chars[1:]
+        if chars.startswith("]"):
+            chars = "\\" + chars
+        chars = "^/" + chars
+    elif chars.startswith("^"):
+        chars = "\\" + chars
+    return f"[{chars}]", j + 1
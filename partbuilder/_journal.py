@@ -0,0 +1,229 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Execution journal, allowing interrupted runs to be resumed.
+
+The journal of a run records the planned actions, and when each of them
+starts and completes. The record of a starting action is synced to disk
+before the action runs, so after a crash the journal tells which actions
+completed, and which ones were in flight and may have left partial results.
+The journal is removed when the run ends, and is locked while the run is in
+progress so other runs don't take it for an interrupted one. Records also
+hold the state generation (see partbuilder._plan_cache) when they were
+written, so a journal is not used if the state changed since.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from partbuilder import _plan_cache
+from partbuilder._step import Action, PartAction
+
+logger = logging.getLogger(__name__)
+
+
+class InterruptedRun(NamedTuple):
+    """The actions of a run that didn't end."""
+
+    remaining: List[PartAction]  # in planned order, including in-flight ones
+    in_flight: List[PartAction]
+    complete: bool  # whether all actions were planned before the interruption
+
+
+class Journal:
+    """Record the progress of the execution of actions.
+
+    :param str cache_dir: The partbuilder cache directory.
+    :param key: The fingerprint of the project and planned target. Nothing
+        is recorded if None, as actions that weren't planned by the manager
+        can't be resumed.
+    """
+
+    def __init__(self, cache_dir: str, key: Optional[str]):
+        self._cache_dir = cache_dir
+        self._path = _journal_file(cache_dir, key) if key else None
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self._index: Dict[int, Tuple[int, PartAction]] = {}
+        # actions carrying ephemeral states can't be resumed
+        self._resumable = True
+
+    def __enter__(self) -> "Journal":
+        if self._path is None:
+            return self
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._file = open(self._path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        self._file.truncate(0)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._file is None:
+            return
+
+        # a run that raised an error can be resumed after the error is fixed
+        if exc_type is None and self._path is not None:
+            os.unlink(self._path)
+        self._file.close()
+        self._file = None
+
+    def planned(self, actions: Iterable[PartAction], *, complete: bool) -> None:
+        """Record planned actions.
+
+        :param bool complete: Whether these are the last actions planned.
+        """
+        with self._lock:
+            records = [self._plan_record(act) for act in actions]
+            if complete and self._resumable:
+                records.append({"complete": True})
+            records.append(self._generation_record())
+            self._append(records, sync=True)
+
+    def recording(self, actions: Iterator[PartAction]) -> Iterator[PartAction]:
+        """Record actions as they are planned."""
+        for act in actions:
+            with self._lock:
+                self._append([self._plan_record(act)], sync=False)
+            yield act
+
+        # runs interrupted from here on can be resumed without planning
+        self.planned([], complete=True)
+
+    def started(self, act: PartAction) -> None:
+        with self._lock:
+            record = self._generation_record()
+            record["started"] = self._index[id(act)][0]
+            self._append([record], sync=True)
+
+    def done(self, act: PartAction) -> None:
+        # losing this record only makes a resumed run execute the action again
+        with self._lock:
+            record = self._generation_record()
+            record["done"] = self._index[id(act)][0]
+            self._append([record], sync=False)
+
+    def _generation_record(self) -> Dict[str, Any]:
+        if self._file is None:
+            return {}
+        return {"generation": _plan_cache.state_generation(self._cache_dir)}
+
+    def _plan_record(self, act: PartAction) -> Dict[str, Any]:
+        index = len(self._index)
+        self._index[id(act)] = (index, act)
+        if act.state is not None:
+            self._resumable = False
+        return {
+            "planned": index,
+            "part": act.part_name,
+            "action": int(act.action),
+            "reason": act.reason,
+        }
+
+    def _append(self, records: List[Dict[str, Any]], *, sync: bool) -> None:
+        if self._file is None:
+            return
+
+        self._file.write("".join(json.dumps(r) + "\n" for r in records))
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+
+def interrupted_run(cache_dir: str, key: str) -> Optional[InterruptedRun]:
+    """Return the progress of an interrupted run, if any.
+
+    The journal is discarded if the state of the parts changed since the
+    run was interrupted, as its remaining actions may no longer apply.
+    """
+    try:
+        f = open(_journal_file(cache_dir, key))
+    except FileNotFoundError:
+        return None
+
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.debug("run in progress, journal not loaded")
+            return None
+        lines = f.read().splitlines()
+
+    progress = _Progress()
+    for line in lines:
+        try:
+            progress.add(json.loads(line))
+        except ValueError:
+            # the last record may be incomplete
+            break
+
+    if not progress.planned:
+        return None
+    if progress.generation != _plan_cache.state_generation(cache_dir):
+        logger.debug("state changed since the run was interrupted")
+        return None
+
+    planned = progress.planned
+    return InterruptedRun(
+        remaining=[planned[i] for i in sorted(planned) if i not in progress.done],
+        in_flight=[planned[i] for i in sorted(progress.started - progress.done)],
+        complete=progress.complete,
+    )
+
+
+class _Progress:
+    """The records read from a journal."""
+
+    def __init__(self) -> None:
+        self.planned: Dict[int, PartAction] = {}
+        self.started: Set[int] = set()
+        self.done: Set[int] = set()
+        self.complete = False
+        self.generation: Optional[str] = None
+
+    def add(self, record: Dict[str, Any]) -> None:
+        if "planned" in record:
+            self.planned[record["planned"]] = PartAction(
+                record["part"], Action(record["action"]), reason=record["reason"]
+            )
+        elif "started" in record:
+            self.started.add(record["started"])
+        elif "done" in record:
+            self.done.add(record["done"])
+        elif "complete" in record:
+            self.complete = True
+
+        if "generation" in record:
+            self.generation = record["generation"]
+
+
+def _journal_file(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, "journal", key)
@@ -0,0 +1,75 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import io
+import logging
+import os
+from typing import Any, Dict
+
+from partbuilder import plugins
+from partbuilder._validator import SCHEMA_VERSION, Validator
+from partbuilder.utils import file_utils, yaml_utils
+
+logger = logging.getLogger(__name__)
+
+
+def load_parts(
+    filename: str, *, work_dir: str = ".", local_plugins_dir: str = ""
+) -> Dict[str, Any]:
+    """Load and validate a parts definition file.
+
+    The file is parsed with the libyaml-based loader. Validation results are
+    cached in the work directory keyed by the hash of the file contents and
+    of the available plugin names, so an unchanged file isn't validated
+    again. As the result is validated, it can be passed to LifecycleManager
+    with validate=False.
+
+    :param str filename: The parts definition file.
+    :param str work_dir: The work directory where the cache is kept.
+    :param str local_plugins_dir: The directory containing local plugins.
+    :raises PartbuilderPartsValidationError: If the definition is invalid.
+    """
+
+    with open(filename, "rb") as f:
+        content = f.read()
+
+    plugin_names = plugins.available_plugins(local_plugins_dir=local_plugins_dir)
+
+    digest = hashlib.sha256(content)
+    digest.update(f"\0{SCHEMA_VERSION}\0".encode())
+    digest.update("\0".join(plugin_names).encode())
+    marker = os.path.join(_validation_cache_dir(work_dir), digest.hexdigest())
+
+    stream = io.TextIOWrapper(io.BytesIO(content), encoding="utf-8")
+    if os.path.exists(marker):
+        logger.debug(f"{filename!r} unchanged, skip validation")
+        return yaml_utils.load(stream)
+
+    parts, duplicate_keys = yaml_utils.load_with_duplicate_keys(stream)
+    validator = Validator(
+        parts, duplicate_keys=duplicate_keys, plugin_names=plugin_names
+    )
+    validator.validate()
+
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    open(marker, "w").close()
+
+    return parts
+
+
+def _validation_cache_dir(work_dir: str) -> str:
+    return os.path.join(file_utils.cache_dir(work_dir), "validation")
@@ -0,0 +1,340 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Advisory locks allowing concurrent lifecycle runs on one work dir.
+
+Each part is locked through a byte range of a single lock file, at the
+part's ordinal in the topological order of the project's parts. The range is
+held exclusively by the run executing steps of the part and shared by runs
+building parts that depend on it. Part locks are acquired in the topological
+order of the parts, so runs never wait on each other in a cycle. Staging and
+priming write to directories shared by all parts, and are serialized with
+the stage/prime lock, which is only taken while the part locks are held.
+"""
+
+import contextlib
+import errno
+import fcntl
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from partbuilder._part import Part
+
+logger = logging.getLogger(__name__)
+
+PARTS_LOCK = "parts"
+STAGE_PRIME_LOCK = "stage-prime"
+
+# bytes of the parts lock file per part, holding the pid of an exclusive holder
+_SLOT_SIZE = 8
+
+
+class LockContention(NamedTuple):
+    """A lock that was held by another run when we tried to acquire it."""
+
+    name: str
+    holder: Optional[int]
+    waited: float
+
+
+class FileLock:
+    """An flock() based lock on a file in the locks directory.
+
+    The process holding the lock exclusively writes its pid to the lock
+    file, so contention can be reported.
+    """
+
+    def __init__(self, locks_dir: str, name: str):
+        self.name = name
+        self._path = os.path.join(locks_dir, f"{name}.lock")
+        self._fd = None  # type: Optional[int]
+        self._shared = False
+
+    def acquire(self, *, shared: bool = False) -> Optional[LockContention]:
+        """Acquire the lock, waiting if needed.
+
+        :return: The contention found, if the lock wasn't available.
+        """
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+
+        contention = None
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            holder = _read_pid(fd)
+            _log_waiting(self.name, holder)
+            start = time.monotonic()
+            fcntl.flock(fd, operation)
+            contention = LockContention(self.name, holder, time.monotonic() - start)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        if not shared:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, str(os.getpid()).encode(), 0)
+
+        self._fd = fd
+        self._shared = shared
+        return contention
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+
+        if not self._shared:
+            os.ftruncate(self._fd, 0)
+
+        # closing the file releases the lock
+        os.close(self._fd)
+        self._fd = None
+
+
+class PartLock:
+    """The lock of a part, a byte range of the parts lock file.
+
+    :param int ordinal: The position of the part in the topological order
+        of the project's parts.
+    """
+
+    def __init__(self, locks_dir: str, name: str, ordinal: int):
+        self.name = name
+        self._file = _lock_file(os.path.join(locks_dir, f"{PARTS_LOCK}.lock"))
+        self._ordinal = ordinal
+        self._held = False
+
+    def acquire(self, *, shared: bool = False) -> Optional[LockContention]:
+        """Acquire the lock, waiting if needed.
+
+        :return: The contention found, if the lock wasn't available.
+        """
+        contention = self._file.acquire(self._ordinal, self.name, shared=shared)
+        self._held = True
+        return contention
+
+    def release(self) -> None:
+        if self._held:
+            self._file.release(self._ordinal)
+            self._held = False
+
+
+class _LockFile:
+    """The parts lock file, shared by the runs of this process.
+
+    fcntl() record locks belong to the process: locking a range locked by
+    another thread succeeds, and closing any descriptor of the file releases
+    all of them. The file is then opened once, and the slots held by the
+    threads of this process are counted, so that the file is only locked by
+    the first holder of a slot and unlocked by the last one.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd = None  # type: Optional[int]
+        self._cond = threading.Condition()
+        # the number of holders of each slot, 0 while it is being locked,
+        # and whether it is shared
+        self._slots: Dict[int, Tuple[int, bool]] = {}
+
+    def acquire(
+        self, slot: int, name: str, *, shared: bool
+    ) -> Optional[LockContention]:
+        contention = None
+        with self._cond:
+            start = time.monotonic()
+            while slot in self._slots:
+                holders, slot_shared = self._slots[slot]
+                if holders and shared and slot_shared:
+                    self._slots[slot] = (holders + 1, True)
+                    return None
+                if contention is None:
+                    _log_waiting(name, os.getpid())
+                    contention = LockContention(name, os.getpid(), 0.0)
+                self._cond.wait()
+            if contention:
+                contention = contention._replace(waited=time.monotonic() - start)
+
+            self._slots[slot] = (0, shared)
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+            fd = self._fd
+
+        try:
+            contention = _lock_slot(fd, slot, name, shared=shared) or contention
+        except BaseException:
+            self._forget(slot)
+            raise
+
+        with self._cond:
+            self._slots[slot] = (1, shared)
+            self._cond.notify_all()
+        return contention
+
+    def release(self, slot: int) -> None:
+        with self._cond:
+            holders, shared = self._slots[slot]
+            if holders > 1:
+                self._slots[slot] = (holders - 1, shared)
+                return
+
+            offset = slot * _SLOT_SIZE
+            if self._fd is not None:
+                if not shared:
+                    os.pwrite(self._fd, bytes(_SLOT_SIZE), offset)
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _SLOT_SIZE, offset)
+        self._forget(slot)
+
+    def _forget(self, slot: int) -> None:
+        with self._cond:
+            del self._slots[slot]
+            # no lock of the process is left on the file
+            if not self._slots and self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._cond.notify_all()
+
+
+_lock_files: Dict[str, _LockFile] = {}
+_lock_files_lock = threading.Lock()
+
+
+def _lock_file(path: str) -> _LockFile:
+    path = os.path.abspath(path)
+    with _lock_files_lock:
+        if path not in _lock_files:
+            _lock_files[path] = _LockFile(path)
+        return _lock_files[path]
+
+
+def _lock_slot(
+    fd: int, slot: int, name: str, *, shared: bool
+) -> Optional[LockContention]:
+    """Lock a slot of a lock file, waiting for other processes if needed."""
+    offset = slot * _SLOT_SIZE
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+
+    contention = None
+    try:
+        fcntl.lockf(fd, operation | fcntl.LOCK_NB, _SLOT_SIZE, offset)
+    except OSError as err:
+        if err.errno not in (errno.EACCES, errno.EAGAIN):
+            raise
+        holder = _read_pid(fd, offset, _SLOT_SIZE)
+        _log_waiting(name, holder)
+        start = time.monotonic()
+        fcntl.lockf(fd, operation, _SLOT_SIZE, offset)
+        contention = LockContention(name, holder, time.monotonic() - start)
+
+    if not shared:
+        os.pwrite(fd, str(os.getpid()).encode().ljust(_SLOT_SIZE, b"\0"), offset)
+    return contention
+
+
+def _log_waiting(name: str, holder: Optional[int]) -> None:
+    logger.warning(
+        f"Waiting for {name!r}, locked by "
+        f"{'process ' + str(holder) if holder else 'another process'}."
+    )
+
+
+class PartLocks:
+    """The locks held while executing actions on a set of parts.
+
+    :param str locks_dir: The directory containing the lock files.
+    :param list parts: All parts, sorted topologically.
+    :param set exclusive: Names of the parts whose steps will run.
+    :param set shared: Names of the parts whose output will be used.
+    """
+
+    def __init__(
+        self,
+        locks_dir: str,
+        parts: List[Part],
+        *,
+        exclusive: Set[str],
+        shared: Set[str],
+    ):
+        self._locks_dir = locks_dir
+        self._parts = parts
+        self._exclusive = exclusive
+        self._shared = shared - exclusive
+        self._held = []  # type: List[Union[FileLock, PartLock]]
+        self._stage_prime_lock = FileLock(locks_dir, STAGE_PRIME_LOCK)
+        self._stage_prime_thread_lock = threading.Lock()
+        self.contention = []  # type: List[LockContention]
+
+    def __enter__(self) -> "PartLocks":
+        try:
+            for ordinal, part in enumerate(self._parts):
+                if part.name in self._exclusive or part.name in self._shared:
+                    lock = PartLock(self._locks_dir, part.name, ordinal)
+                    self._acquire(lock, shared=part.name not in self._exclusive)
+        except BaseException:
+            self._release_all()
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._release_all()
+        if self.contention:
+            waited = sum(c.waited for c in self.contention)
+            names = ", ".join(repr(c.name) for c in self.contention)
+            logger.warning(
+                f"Waited {waited:.1f}s for locks held by other runs: {names}."
+            )
+
+    @contextlib.contextmanager
+    def stage_prime(self) -> Iterator[None]:
+        """Hold the stage/prime lock, also excluding concurrent actions."""
+        with self._stage_prime_thread_lock:
+            self._acquire(self._stage_prime_lock, shared=False, hold=False)
+            try:
+                yield
+            finally:
+                self._stage_prime_lock.release()
+
+    @property
+    def contended(self) -> bool:
+        """Whether another run held any of the part locks."""
+        return any(c.name != STAGE_PRIME_LOCK for c in self.contention)
+
+    def _acquire(
+        self, lock: Union[FileLock, PartLock], *, shared: bool, hold: bool = True
+    ) -> None:
+        contention = lock.acquire(shared=shared)
+        if contention:
+            self.contention.append(contention)
+        if hold:
+            self._held.append(lock)
+
+    def _release_all(self) -> None:
+        for lock in reversed(self._held):
+            lock.release()
+        self._held = []
+
+
+def _read_pid(fd: int, offset: int = 0, size: int = 32) -> Optional[int]:
+    try:
+        return int(os.pread(fd, size, offset).rstrip(b"\0").decode())
+    except (OSError, ValueError):
+        return None
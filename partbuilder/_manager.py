@@ -14,13 +14,43 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Any, Callable, Dict, List, Optional
+import contextlib
+import logging
+import os
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Sized,
+    Tuple,
+)
 
-from ._stepinfo import StepInfo
-from ._part import Part
-from ._step import Step, PartAction
-from partbuilder import executor, sequencer
-from partbuilder.plugins import Plugin
+from ._durations import PartDuration, StepDurations, StepUsage, UsageMeter
+from ._stepinfo import PartStepInfo, StepInfo
+from ._part import Part, sort_parts
+from ._result import ExecutionResult, FailedAction
+from ._step import Action, Step, PartAction, is_skip_action, step_for_action
+from ._validator import Validator
+from partbuilder import _callbacks, _dedup, _journal, _plan_cache, errors
+
+if TYPE_CHECKING:
+    import concurrent.futures
+
+    from partbuilder._locks import PartLocks
+    from partbuilder._resources import ResourcePool, Resources
+    from partbuilder._scheduler import Scheduler
+    from partbuilder.distributed import Coordinator, JobResult
+    from partbuilder.sequencer import Sequencer
+
+logger = logging.getLogger(__name__)
 
 
 class LifecycleManager:
@@ -33,19 +63,38 @@ class LifecycleManager:
         target_arch: str = "",
         platform_id: str = "",
         platform_version_id: str = "",
-        parallel_build_count: int = 1,
+        parallel_build_count: int = 1,  # also enables concurrent actions if > 1
         local_plugins_dir: str = "",
+        validate: bool = True,
+        use_plan_cache: bool = True,
+        memory_limit: int = 0,  # in bytes, defaults to the physical memory
+        dedup: bool = False,  # hard link identical files in stage and prime
         **custom_args,  # custom passthrough args
     ):
-        # self._validator = Validator(parts)
-        # self._validator.validate()
+        # Parts loaded with load_parts() are already validated
+        if validate:
+            self._validator = Validator(parts)
+            self._validator.validate()
 
         parts_data = parts.get("parts", {})
         self._parts = [
             Part(name, p, work_dir=work_dir) for name, p in parts_data.items()
         ]
+        self._parts_by_name = {p.name: p for p in self._parts}
+        # parts depending directly on each part
+        self._dependents = {}  # type: Dict[str, List[str]]
+        for part in self._parts:
+            for name in part.data.get("after", []):
+                self._dependents.setdefault(name, []).append(part.name)
+        self._parts_data = parts_data
         self._build_packages = build_packages
-        self._sequencer = sequencer.Sequencer(self._parts)
+        self._sequencer = None  # type: Optional[Sequencer]
+        self._sorted_parts = None  # type: Optional[List[Part]]
+        self._use_plan_cache = use_plan_cache
+        self._memory_limit = memory_limit
+        self._dedup = dedup
+        self._custom_args = custom_args
+        self._executing = False  # part locks are held by execute()
 
         self._step_info = StepInfo(
             work_dir=work_dir,
@@ -54,40 +103,728 @@ class LifecycleManager:
             platform_version_id=platform_version_id,
             parallel_build_count=parallel_build_count,
             local_plugins_dir=local_plugins_dir,
+            **custom_args,
         )
 
     def clean(self, part_list: List[str] = []) -> None:
         pass
 
-    def actions(self, target_step: Step, part_names: List[str] = []) -> [PartAction]:
-        act = self._sequencer.actions(target_step, part_names)
-        return act
+    def actions(
+        self, target_step: Step, part_names: List[str] = []
+    ) -> List[PartAction]:
+        plan = self._iter_plan(target_step, part_names)
+        return _Plan(plan, journal_key=plan.journal_key, in_flight=plan.in_flight)
+
+    def iter_actions(
+        self, target_step: Step, part_names: List[str] = []
+    ) -> Iterator[PartAction]:
+        """Yield actions as they are planned, see Sequencer.iter_actions().
+
+        The first plan computed by a LifecycleManager is stored in the plan
+        cache. If the same plan is requested again and no step ran since, the
+        cached actions are returned without loading the state of the parts.
+
+        If the execution of the same plan was interrupted after it was fully
+        planned, the actions not completed are returned without planning
+        again. The steps that were running are cleaned by execute().
+
+        The returned actions carry the key of the plan's journal, so the
+        progress of their execution is only recorded if they are passed to
+        execute() as returned.
+        """
+        return self._iter_plan(target_step, part_names)
+
+    def _iter_plan(self, target_step: Step, part_names: List[str]) -> "_PlanIterator":
+        journal_key = _plan_cache.plan_key(
+            **self._plan_fingerprint(target_step, part_names)
+        )
+        interrupted = _journal.interrupted_run(self._step_info.cache_dir, journal_key)
+        if interrupted and interrupted.complete:
+            logger.info(
+                f"Resume interrupted run, {len(interrupted.remaining)} actions left."
+            )
+            return _PlanIterator(
+                iter(interrupted.remaining),
+                journal_key=journal_key,
+                in_flight=interrupted.in_flight,
+            )
+
+        return _PlanIterator(
+            self._planned_actions(target_step, part_names),
+            journal_key=journal_key,
+            in_flight=[],
+        )
+
+    def _planned_actions(
+        self, target_step: Step, part_names: List[str]
+    ) -> Iterator[PartAction]:
+        # Once planning started the sequencer state no longer matches the
+        # persistent state, so later plans can't be cached.
+        if not self._use_plan_cache or self._sequencer:
+            return self._plan(target_step, part_names)
+
+        key = self._plan_key(target_step, part_names)
+        plan_cache = _plan_cache.PlanCache(self._step_info.cache_dir)
+        plan = plan_cache.get(key)
+        if plan is not None:
+            return iter(plan)
+
+        actions = self._plan(target_step, part_names)
+        return _cache_plan(actions, plan_cache=plan_cache, key=key)
+
+    def _plan(self, target_step: Step, part_names: List[str]) -> Iterator[PartAction]:
+        """Yield the planned actions, holding the part locks shared.
+
+        Other runs can't change the state of the parts while it's read.
+        Planning streamed to execute() is already covered by its locks.
+        """
+        if self._executing:
+            yield from self._get_sequencer().iter_actions(target_step, part_names)
+            return
+
+        # the plan depends on the state of the parts and their dependencies
+        if part_names:
+            names = self._with_dependencies(part_names)
+        else:
+            names = set(self._parts_by_name)
+
+        with self._new_part_locks(exclusive=set(), shared=names):
+            yield from self._get_sequencer().iter_actions(target_step, part_names)
+
+    def _plan_key(self, target_step: Step, part_names: List[str]) -> str:
+        return _plan_cache.plan_key(
+            **self._plan_fingerprint(target_step, part_names),
+            generation=_plan_cache.state_generation(self._step_info.cache_dir),
+            # catch state files removed by other tools
+            state_dirs=[_mtime(p.part_state_dir) for p in self._parts],
+        )
+
+    def _plan_fingerprint(
+        self, target_step: Step, part_names: List[str]
+    ) -> Dict[str, Any]:
+        """Return the project data and options that determine a plan."""
+        info = self._step_info
+        return dict(
+            parts=self._parts_data,
+            build_packages=self._build_packages,
+            target_arch=info.target_arch,
+            platform_id=info.platform_id,
+            platform_version_id=info.platform_version_id,
+            parallel_build_count=info.parallel_build_count,
+            local_plugins_dir=info.local_plugins_dir,
+            custom_args=self._custom_args,
+            target_step=int(target_step),
+            part_names=sorted(part_names),
+        )
+
+    def _clean_in_flight(self, actions: List[PartAction]) -> None:
+        """Clean steps left incomplete by an interrupted run."""
+        from partbuilder import executor
 
-    def execute(self, actions: [PartAction]):
         for act in actions:
-            part = part_with_name(self._parts, act.part_name)
+            logger.info(f"Clean {act.part_name}:{act.action!r}, it was interrupted.")
+            part = self._part(act.part_name)
+            executor.clean_state(part, step_for_action(act.action), self._step_info)
+
+    def _get_sequencer(self) -> "Sequencer":
+        # The sequencer loads the state machinery (and the YAML parser), so
+        # it's only created when planning begins.
+        if not self._sequencer:
+            from partbuilder.sequencer import Sequencer
+
+            self._sequencer = Sequencer(self._parts)
+        return self._sequencer
+
+    def execute(
+        self,
+        actions: Iterable[PartAction],
+        *,
+        coordinator: Optional["Coordinator"] = None,
+        keep_going: bool = False,
+    ) -> ExecutionResult:
+        """Execute the given actions.
+
+        With a parallel build count of 1, actions are executed in order, and
+        if actions is the iterator returned by iter_actions(), each action is
+        executed as soon as it's planned.
+
+        Otherwise all actions are planned first, then executed concurrently
+        as soon as the actions they depend on are done and the resources
+        they need are available, see Scheduler and ResourcePool. There is no
+        separate setting for concurrent actions: the parallel build count is
+        the number of CPUs shared by all running actions, each build getting
+        the CPUs its part requests (all of them by default).
+
+        If a coordinator is given, all actions are planned first, then sent
+        to its workers, see partbuilder.distributed.
+
+        The state of a step is only kept if its action succeeds. An error
+        stops the execution, unless keep_going is set: then only the parts
+        that depend on the failed part are not executed, and the errors are
+        reported in the returned result.
+
+        If the manager was created with dedup set, identical files of the
+        stage and prime directories are then replaced with hard links.
+
+        Progress of the actions planned by this manager is recorded in a
+        journal, so a run interrupted before the actions are completed can be
+        resumed, see iter_actions().
+        """
+        # only the plans returned by the manager are journaled
+        journal_key = None  # type: Optional[str]
+        in_flight = []  # type: List[PartAction]
+        if isinstance(actions, (_Plan, _PlanIterator)):
+            journal_key = actions.journal_key
+            # the interrupted steps are only cleaned once
+            in_flight, actions.in_flight = actions.in_flight, []
+
+        durations = StepDurations(self._step_info.cache_dir)
+        if coordinator or self._step_info.parallel_build_count > 1:
+            actions = list(actions)
+
+        locks = self._part_locks(actions)
+        journal = _journal.Journal(self._step_info.cache_dir, journal_key)
+
+        with _callbacks.AsyncCallbackRunner() as runner, _saving(durations), locks:
+            self._clean_in_flight(in_flight)
+            with journal:
+                if isinstance(actions, Sized):
+                    journal.planned(actions, complete=True)
+                else:
+                    actions = journal.recording(iter(actions))
+
+                execution = _Execution(
+                    runner=runner,
+                    durations=durations,
+                    locks=locks,
+                    result=ExecutionResult(),
+                    keep_going=keep_going,
+                    blocked=set(),
+                    journal=journal,
+                )
+                self._executing = True
+                try:
+                    self._execute(actions, execution, coordinator)
+                finally:
+                    self._executing = False
+                self._deduplicate(execution)
+
+        return execution.result
+
+    def _execute(
+        self,
+        actions: Iterable[PartAction],
+        execution: "_Execution",
+        coordinator: Optional["Coordinator"],
+    ) -> None:
+        if not coordinator and self._step_info.parallel_build_count == 1:
+            self._execute_in_order(actions, execution)
+            return
+
+        # all actions are planned first, execute() already listed them
+        planned = actions if isinstance(actions, list) else list(actions)
+        if coordinator:
+            self._execute_distributed(planned, execution, coordinator)
+        else:
+            self._execute_concurrently(planned, execution)
+
+    def _deduplicate(self, execution: "_Execution") -> None:
+        """Hard link identical files of the stage and prime directories."""
+        if not self._dedup or not any(
+            step_for_action(a.action) in (Step.STAGE, Step.PRIME)
+            and not is_skip_action(a.action)
+            for a in execution.result.succeeded
+        ):
+            return
+
+        info = self._step_info
+        # other runs may be staging or priming parts we don't depend on
+        with execution.locks.stage_prime():
+            _dedup.deduplicate(
+                [info.stage_dir, info.prime_dir],
+                cache_dir=info.cache_dir,
+                workers=info.parallel_build_count,
+            )
+
+    def _failed(
+        self, act: PartAction, error: Exception, execution: "_Execution"
+    ) -> None:
+        """Record a failed action, or stop the execution if not keeping going."""
+        if not execution.keep_going:
+            raise error
+
+        logger.error(f"{act.part_name}:{act.action!r} failed: {error}")
+        execution.result.failed.append(FailedAction(act, error))
+
+        # later actions of the part and its dependents can't run
+        queue = [act.part_name]
+        while queue:
+            name = queue.pop()
+            if name not in execution.blocked:
+                execution.blocked.add(name)
+                queue.extend(self._dependents.get(name, []))
+
+    def _part(self, name: str) -> Part:
+        part = self._parts_by_name.get(name)
+        if part is None:
+            raise errors.PartbuilderInvalidPartName(name)
+        return part
+
+    def _skipped(self, act: PartAction, execution: "_Execution") -> bool:
+        """Whether the action's part depends on a failed part."""
+        if act.part_name not in execution.blocked:
+            return False
+
+        logger.info(f"Skip {act.part_name}:{act.action!r}, a dependency failed")
+        execution.result.skipped.append(act)
+        return True
+
+    def _part_locks(self, actions: Iterable[PartAction]) -> "PartLocks":
+        """Return the locks for the parts the actions read and write.
+
+        The parts executed by a streamed plan are only known as they are
+        planned, so all parts are locked.
+        """
+        if isinstance(actions, Sized):
+            exclusive = {a.part_name for a in actions if not is_skip_action(a.action)}
+        else:
+            exclusive = {p.name for p in self._parts}
+
+        shared = self._with_dependencies(exclusive) - exclusive
+        return self._new_part_locks(exclusive=exclusive, shared=shared)
+
+    def _with_dependencies(self, part_names: Iterable[str]) -> Set[str]:
+        """Return the given parts and the parts they depend on, recursively."""
+        names = set(part_names)
+        queue = list(names)
+        while queue:
+            for dep in self._part(queue.pop()).data.get("after", []):
+                if dep not in names:
+                    names.add(dep)
+                    queue.append(dep)
+        return names
+
+    def _new_part_locks(self, *, exclusive: Set[str], shared: Set[str]) -> "PartLocks":
+        from ._locks import PartLocks
+
+        if self._sorted_parts is None:
+            self._sorted_parts = sort_parts(self._parts)
+
+        return PartLocks(
+            os.path.join(self._step_info.cache_dir, "locks"),
+            self._sorted_parts,
+            exclusive=exclusive,
+            shared=shared,
+        )
+
+    def _execute_in_order(
+        self, actions: Iterable[PartAction], execution: "_Execution"
+    ) -> None:
+        durations = execution.durations
+
+        # the time left is only known if all actions were planned already
+        if isinstance(actions, Sized):
+            remaining = sum(
+                durations.get(a.part_name, step_for_action(a.action)) or 0.0
+                for a in actions
+                if not is_skip_action(a.action)
+            )  # type: Optional[float]
+        else:
+            remaining = None
+
+        for act in actions:
+            if self._skipped(act, execution):
+                continue
+
+            if not is_skip_action(act.action):
+                estimate = durations.get(act.part_name, step_for_action(act.action))
+                logger.info(_eta_message(act, estimate, remaining))
+                if remaining is not None and estimate is not None:
+                    remaining = max(remaining - estimate, 0.0)
+
+            try:
+                self._run_action(act, execution)
+            except Exception as error:
+                self._failed(act, error, execution)
+            else:
+                execution.result.succeeded.append(act)
+
+    def _execute_concurrently(
+        self, actions: List[PartAction], execution: "_Execution"
+    ) -> None:
+        import concurrent.futures
+
+        from ._resources import ResourcePool, Resources, physical_memory
+        from ._scheduler import Scheduler
+
+        capacity = Resources(
+            cpu=self._step_info.parallel_build_count,
+            memory=self._memory_limit or physical_memory(),
+        )
+        run = _ConcurrentRun(
+            capacity=capacity,
+            pool=ResourcePool(capacity),
+            scheduler=Scheduler(actions, self._parts, durations=execution.durations),
+            running={},
+        )
+
+        # The most critical ready action waits for resources instead of
+        # being overtaken by smaller ones, so large builds are not starved.
+        waiting = None  # type: Optional[PartAction]
+
+        with concurrent.futures.ThreadPoolExecutor(capacity.cpu) as workers:
+            while not run.scheduler.finished:
+                waiting = self._submit_ready(run, waiting, workers, execution)
+                if not run.running:
+                    raise errors.PartbuilderInternalError("no action is ready to run")
+
+                done, _ = concurrent.futures.wait(
+                    run.running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                self._harvest(run, done, execution)
+
+    def _submit_ready(
+        self,
+        run: "_ConcurrentRun",
+        waiting: Optional[PartAction],
+        workers: "concurrent.futures.Executor",
+        execution: "_Execution",
+    ) -> Optional[PartAction]:
+        """Submit the ready actions while resources are available.
+
+        :return: The action waiting for resources, if any.
+        """
+        from ._resources import requested_resources
+
+        while True:
+            act = waiting or run.scheduler.pop()
+            if not act:
+                return None
+
+            waiting = None
+            if self._skipped(act, execution):
+                run.scheduler.done(act)
+                continue
+
+            part = self._part(act.part_name)
+            step = step_for_action(act.action)
+            request = requested_resources(part, step, capacity=run.capacity)
+            granted = run.pool.admit(request)
+            if not granted:
+                return act
+
+            if not is_skip_action(act.action):
+                estimate = execution.durations.get(act.part_name, step)
+                logger.info(_eta_message(act, estimate, None))
+
+            future = workers.submit(
+                self._run_action, act, execution, parallel_build_count=granted.cpu
+            )
+            run.running[future] = (act, granted)
+
+    def _harvest(
+        self,
+        run: "_ConcurrentRun",
+        done: Iterable["concurrent.futures.Future"],
+        execution: "_Execution",
+    ) -> None:
+        """Record the outcome of completed actions and release their resources."""
+        for future in done:
+            act, granted = run.running.pop(future)
+            run.pool.release(granted)
+            try:
+                future.result()
+            except Exception as error:
+                # an error stops scheduling, running actions are finished
+                self._failed(act, error, execution)
+            else:
+                execution.result.succeeded.append(act)
+            run.scheduler.done(act)
+
+    def _execute_distributed(
+        self,
+        actions: List[PartAction],
+        execution: "_Execution",
+        coordinator: "Coordinator",
+    ) -> None:
+        runner = execution.runner
+        infos = {}  # type: Dict[int, PartStepInfo]
+
+        def on_start(act: PartAction) -> None:
+            execution.journal.started(act)
+            step = step_for_action(act.action)
+            estimate = execution.durations.get(act.part_name, step)
+            logger.info(_eta_message(act, estimate, None))
+
+            part = self._part(act.part_name)
+            infos[id(act)] = self._step_info.for_step(part=part, step=step)
+            pre = _callbacks.pre_step.dispatch[step]
+            if pre:
+                _callbacks.run_callbacks(pre, infos[id(act)], runner=runner, wait=True)
+
+        def skip(act: PartAction) -> bool:
+            if self._skipped(act, execution):
+                return True
+            if is_skip_action(act.action):
+                execution.result.succeeded.append(act)
+                execution.journal.done(act)
+            return False
+
+        def on_failed(act: PartAction, error: Exception) -> None:
+            infos.pop(id(act), None)
+            self._failed(act, error, execution)
+
+        def on_done(act: PartAction, result: "JobResult") -> None:
+            execution.result.succeeded.append(act)
+            execution.journal.done(act)
+            usage = StepUsage(wall=result.wall, cpu=result.cpu, max_rss=result.max_rss)
+            execution.durations.record(act.part_name, act.action, usage)
+
+            info = infos.pop(id(act))
+            post = _callbacks.post_step.dispatch[info.step]
+            if post:
+                _callbacks.run_callbacks(post, info, runner=runner, wait=False)
+
+        coordinator.execute(
+            actions,
+            parts=self._parts,
+            step_info=self._step_info,
+            durations=execution.durations,
+            on_start=on_start,
+            on_done=on_done,
+            on_failed=on_failed,
+            skip=skip,
+        )
+
+    def _run_action(
+        self,
+        act: PartAction,
+        execution: "_Execution",
+        *,
+        parallel_build_count: Optional[int] = None,
+    ) -> None:
+        from partbuilder import executor
+
+        part = self._part(act.part_name)
+        step = step_for_action(act.action)
+
+        if is_skip_action(act.action):
             executor.run_action(act.action, part=part, step_info=self._step_info)
+            execution.journal.done(act)
+            return
+
+        # Another run may have executed the step while we waited for the
+        # part lock. Steps to run again are planned as reruns, so only
+        # the first run of a step is checked.
+        if (
+            execution.locks.contended
+            and act.action <= Action.PRIME
+            and executor.step_has_run(part, step)
+        ):
+            logger.info(f"{part.name}:{step!r} already ran in another run")
+            execution.journal.done(act)
+            return
+
+        pre = _callbacks.pre_step.dispatch[step]
+        post = _callbacks.post_step.dispatch[step]
+        if pre or post:
+            info = self._step_info.for_step(
+                part=part, step=step, parallel_build_count=parallel_build_count
+            )
+
+        runner = execution.runner
+        if pre:
+            _callbacks.run_callbacks(pre, info, runner=runner, wait=True)
+
+        shared_dirs_lock: ContextManager[None]
+        if step in (Step.STAGE, Step.PRIME):
+            shared_dirs_lock = execution.locks.stage_prime()
+        else:
+            # no-op context manager, nullcontext() needs Python 3.7
+            shared_dirs_lock = contextlib.suppress()
+
+        if step == Step.PULL:
+            dependencies = set()  # type: Set[Part]
+        else:
+            names = self._with_dependencies([part.name]) - {part.name}
+            dependencies = {self._parts_by_name[name] for name in names}
+
+        meter = UsageMeter()
+        execution.journal.started(act)
+        with shared_dirs_lock:
+            try:
+                executor.run_action(
+                    act.action,
+                    part=part,
+                    step_info=self._step_info,
+                    parallel_build_count=parallel_build_count,
+                    dependencies=sorted(dependencies, key=lambda p: p.name),
+                )
+            except Exception:
+                # don't leave the state of a step that didn't complete
+                executor.clean_state(part, step, self._step_info)
+                raise
+        execution.journal.done(act)
+        execution.durations.record(part.name, act.action, meter.stop())
+
+        if post:
+            _callbacks.run_callbacks(post, info, runner=runner, wait=False)
+
+    def export_prime(self, archive_path: str, *, reproducible: bool = False) -> None:
+        """Write the primed files to a gzip-compressed tar archive.
+
+        The files listed in the prime manifests are read from the parts'
+        install directories. The archive is compressed in chunks by parallel build
+        count threads, and an index for random access is written next to
+        it, see partbuilder._export.
+
+        :param bool reproducible: Whether to sort the entries and reset
+            their owners and timestamps.
+        """
+        from partbuilder import _export
+
+        _export.export_prime(
+            archive_path,
+            parts=self._parts,
+            workers=self._step_info.parallel_build_count,
+            reproducible=reproducible,
+        )
 
+    def slowest_parts(self, limit: int = 10) -> List[PartDuration]:
+        """Return the parts that took the longest to execute in previous runs.
 
-def part_with_name(parts: [Part], name: str) -> Optional[Part]:
+        Durations and CPU times are averaged over the runs in which the part
+        was executed, and the largest peak RSS seen is reported.
+        """
+        return StepDurations(self._step_info.cache_dir).slowest_parts(limit)
+
+
+class _Plan(List[PartAction]):
+    """The actions returned by actions(), bound to the journal of their plan.
+
+    :param journal_key: The key of the plan's journal.
+    :param in_flight: The steps left incomplete by an interrupted run of the
+        plan, to be cleaned before the actions are executed.
+    """
+
+    def __init__(
+        self,
+        actions: Iterable[PartAction],
+        *,
+        journal_key: str,
+        in_flight: List[PartAction],
+    ):
+        super().__init__(actions)
+        self.journal_key = journal_key
+        self.in_flight = in_flight
+
+
+class _PlanIterator(Iterator[PartAction]):
+    """The actions yielded by iter_actions(), bound to the journal of their plan.
+
+    See _Plan.
+    """
+
+    def __init__(
+        self,
+        actions: Iterator[PartAction],
+        *,
+        journal_key: str,
+        in_flight: List[PartAction],
+    ):
+        self._actions = actions
+        self.journal_key = journal_key
+        self.in_flight = in_flight
+
+    def __next__(self) -> PartAction:
+        return next(self._actions)
+
+
+class _ConcurrentRun(NamedTuple):
+    """The state of the actions executed concurrently by one call to execute()."""
+
+    capacity: "Resources"
+    pool: "ResourcePool"
+    scheduler: "Scheduler"
+    running: Dict["concurrent.futures.Future", Tuple[PartAction, "Resources"]]
+
+
+class _Execution(NamedTuple):
+    """The state shared by the actions run by one call to execute()."""
+
+    runner: _callbacks.AsyncCallbackRunner
+    durations: StepDurations
+    locks: "PartLocks"
+    result: ExecutionResult
+    keep_going: bool
+    blocked: Set[str]  # parts depending on failed parts
+    journal: _journal.Journal
+
+
+def _eta_message(
+    action: PartAction, estimate: Optional[float], remaining: Optional[float]
+) -> str:
+    msg = f"Execute {action.part_name}:{action.action!r}"
+    if estimate is not None:
+        msg += f", estimated {estimate:.1f}s"
+    if remaining:
+        msg += f", {remaining:.1f}s left"
+    return msg
+
+
+@contextlib.contextmanager
+def _saving(durations: StepDurations) -> Iterator[StepDurations]:
+    # keep the durations of the steps that ran even if a later one fails
+    try:
+        yield durations
+    finally:
+        durations.save()
+
+
+def _cache_plan(
+    actions: Iterator[PartAction], *, plan_cache: _plan_cache.PlanCache, key: str
+) -> Iterator[PartAction]:
+    plan = []
+    for act in actions:
+        plan.append(act)
+        yield act
+
+    plan_cache.put(key, plan)
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def part_with_name(parts: List[Part], name: str) -> Optional[Part]:
     for p in parts:
-        if p.name is name:
+        if p.name == name:
             return p
 
     return None
 
 
 def register_pre_step_callback(
-    callback: Callable[[StepInfo], None], steps: List[str]
+    callback: Callable[[PartStepInfo], None], steps: List[Step]
 ) -> None:
-    pass
+    """Register a callback to run before the given steps are executed.
+
+    Coroutine functions are also accepted, and they must complete before
+    the step is executed.
+    """
+    _callbacks.pre_step.register(callback, steps)
 
 
 def register_post_step_callback(
-    callback: Callable[[StepInfo], None], steps: List[str]
+    callback: Callable[[PartStepInfo], None], steps: List[Step]
 ) -> None:
-    pass
-
+    """Register a callback to run after the given steps are executed.
 
-def register_plugin(plugins: Dict[str, Plugin]) -> None:
-    pass
+    If the callback is a coroutine function it runs in the background,
+    overlapping with the execution of the next steps. All pending callbacks
+    are waited for before LifecycleManager.execute() returns.
+    """
+    _callbacks.post_step.register(callback, steps)
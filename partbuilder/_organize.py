@@ -0,0 +1,205 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Reorganization of the files installed by a part.
+
+The `organize` property maps glob patterns relative to the install directory
+to destination paths. A destination ending with a slash is a directory the
+matched entries are moved into. A directory moved onto an existing directory
+is merged into it.
+
+The install tree is listed once, and all renames are planned and checked for
+conflicts before anything is moved. Patterns are matched against the tree as
+it is after the renames planned for the previous patterns.
+"""
+
+import errno
+import logging
+import os
+import re
+import shutil
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from partbuilder import errors
+from partbuilder._filesets import compile_fileset, translate_glob
+
+logger = logging.getLogger(__name__)
+
+
+class OrganizePlan(NamedTuple):
+    """The renames that reorganize an install directory."""
+
+    moves: List[Tuple[str, str]]  # source and destination, relative paths
+    merged_dirs: List[str]  # source directories emptied by merges
+
+
+def organize(part_name: str, install_dir: str, mapping: Dict[str, str]) -> None:
+    """Move the files of the install directory as defined in mapping."""
+    apply_plan(install_dir, plan_organize(part_name, install_dir, mapping))
+
+
+def plan_organize(
+    part_name: str, install_dir: str, mapping: Dict[str, str]
+) -> OrganizePlan:
+    """Compute the renames for a mapping, raising an error on conflicts."""
+    files, dirs = compile_fileset(("*",)).walk(install_dir)
+    planner = _Planner(part_name, files, dirs)
+
+    for pattern, target in mapping.items():
+        regex = re.compile(translate_glob(os.path.normpath(pattern)) + r"\Z")
+        sources = [p for p in planner.paths if regex.match(p)]
+        if not sources:
+            logger.debug(f"{part_name}: nothing to organize from {pattern!r}")
+            continue
+
+        into_dir = target.endswith("/")
+        target = os.path.normpath(target).lstrip("/")
+        if not into_dir and len(sources) > 1:
+            raise errors.PartbuilderOrganizeConflict(
+                part_name, pattern, target, "more than one entry matches"
+            )
+
+        for source in sources:
+            if into_dir:
+                planner.move(source, os.path.join(target, os.path.basename(source)))
+            else:
+                planner.move(source, target)
+
+    return OrganizePlan(planner.moves, planner.merged_dirs)
+
+
+def apply_plan(install_dir: str, plan: OrganizePlan) -> None:
+    created: Set[str] = set()
+    for source, destination in plan.moves:
+        logger.debug(f"organize {source!r} to {destination!r}")
+        src = os.path.join(install_dir, source)
+        dst = os.path.join(install_dir, destination)
+
+        parent = os.path.dirname(dst)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+
+        try:
+            os.rename(src, dst)
+        except OSError as err:
+            if err.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dst)
+
+    # children are listed before their parents
+    for path in plan.merged_dirs:
+        os.rmdir(os.path.join(install_dir, path))
+
+
+class _Planner:
+    """The install tree as it is after the moves planned so far."""
+
+    def __init__(self, part_name: str, files: List[str], dirs: List[str]):
+        self._part_name = part_name
+        self._files = set(files)
+        self._dirs = set(dirs)
+        self._children: Dict[str, Set[str]] = {}
+        for path in self._files | self._dirs:
+            self._children.setdefault(os.path.dirname(path), set()).add(path)
+
+        self.moves: List[Tuple[str, str]] = []
+        self._merged: Set[str] = set()
+        # the source of the entries created by moves, by destination
+        self._targets: Dict[str, str] = {}
+
+    @property
+    def paths(self) -> List[str]:
+        return sorted(self._files | self._dirs)
+
+    @property
+    def merged_dirs(self) -> List[str]:
+        """The merged directories left empty, children first."""
+        empty: Set[str] = set()
+        for path in sorted(self._merged, reverse=True):
+            children = self._children.get(path, set())
+            if path in self._dirs and children <= empty:
+                empty.add(path)
+        return sorted(empty, reverse=True)
+
+    def move(self, source: str, destination: str) -> None:
+        # the source may have been moved with a parent matched by the pattern
+        if source == destination or not self._exists(source):
+            return
+
+        if destination.startswith(source + "/"):
+            self._conflict(source, destination, "destination is inside the source")
+        if destination in self._targets:
+            self._conflict(
+                source,
+                destination,
+                f"{self._targets[destination]!r} is also organized there",
+            )
+
+        if self._exists(destination):
+            if source in self._dirs and destination in self._dirs:
+                self._merge(source, destination)
+                return
+            self._conflict(source, destination, "destination already exists")
+
+        parent = os.path.dirname(destination)
+        while parent:
+            if self._exists(parent) and parent not in self._dirs:
+                self._conflict(source, destination, f"{parent!r} is not a directory")
+            parent = os.path.dirname(parent)
+
+        self._relocate(source, destination)
+        self._targets[destination] = source
+        self.moves.append((source, destination))
+
+    def _merge(self, source: str, destination: str) -> None:
+        for child in sorted(self._children.get(source, set())):
+            name = os.path.basename(child)
+            self.move(child, os.path.join(destination, name))
+        self._merged.add(source)
+
+    def _relocate(self, source: str, destination: str) -> None:
+        """Move an entry and its children in the tree."""
+        parent = os.path.dirname(destination)
+        while parent and parent not in self._dirs:
+            self._add(parent, is_dir=True)
+            parent = os.path.dirname(parent)
+
+        stack = [source]
+        while stack:
+            path = stack.pop()
+            stack.extend(self._children.pop(path, set()))
+            new_path = destination + path[len(source) :]
+            is_dir = path in self._dirs
+            self._dirs.discard(path)
+            self._files.discard(path)
+            self._add(new_path, is_dir=is_dir)
+            if path in self._targets:
+                self._targets[new_path] = self._targets.pop(path)
+
+        self._children[os.path.dirname(source)].discard(source)
+
+    def _add(self, path: str, *, is_dir: bool) -> None:
+        (self._dirs if is_dir else self._files).add(path)
+        self._children.setdefault(os.path.dirname(path), set()).add(path)
+
+    def _exists(self, path: str) -> bool:
+        return path in self._files or path in self._dirs
+
+    def _conflict(self, source: str, destination: str, reason: str) -> None:
+        raise errors.PartbuilderOrganizeConflict(
+            self._part_name, source, destination, reason
+        )
@@ -70,14 +70,16 @@ def get_dependencies(
         raise errors.PartbuilderInvalidPartName(part_name)
 
     dependency_names = set(part.data.get("after", []))
-    dependencies = {p for p in parts if p.name in dependency_names}
 
     if recursive:
-        # No need to worry about infinite recursion due to circular
-        # dependencies since the YAML validation won't allow it.
-        for dependency_name in dependency_names:
-            dependencies |= get_dependencies(
-                dependency_name, parts=parts, recursive=recursive
-            )
-
-    return dependencies
+        # Visit each part once: dependencies shared through several paths
+        # would otherwise be expanded once per path.
+        after = {p.name: p.data.get("after", []) for p in parts}
+        queue = list(dependency_names)
+        while queue:
+            for name in after.get(queue.pop(), []):
+                if name not in dependency_names:
+                    dependency_names.add(name)
+                    queue.append(name)
+
+    return {p for p in parts if p.name in dependency_names}
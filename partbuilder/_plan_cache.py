@@ -0,0 +1,124 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent cache of planned actions.
+
+A plan is identified by a fingerprint of everything that influences it: the
+parts definition, the project options, the target step and part names, and
+the state directory generation. The generation changes every time a state
+file is written by partbuilder, so a cached plan is only reused if no step
+ran since it was computed.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from partbuilder._step import Action, PartAction
+
+logger = logging.getLogger(__name__)
+
+# Bump when planning rules change, to invalidate cached plans
+PLAN_CACHE_VERSION = 1
+
+# Number of cached plans to keep
+_MAX_PLANS = 32
+
+
+def state_generation(cache_dir: str) -> str:
+    """Return the current state directory generation."""
+    try:
+        with open(os.path.join(cache_dir, "state-generation")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_state_generation(cache_dir: str) -> None:
+    """Start a new state directory generation.
+
+    Generations are random tokens rather than sequential numbers, so
+    processes updating the state concurrently never produce the same
+    generation.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    generation = uuid.uuid4().hex
+    path = os.path.join(cache_dir, "state-generation")
+    # actions running concurrently in this process may bump it too
+    tmp_path = f"{path}.{generation}"
+    with open(tmp_path, "w") as f:
+        f.write(generation)
+    os.replace(tmp_path, path)
+
+
+def plan_key(**fingerprint: Any) -> str:
+    """Compute the cache key from the values that determine a plan."""
+    data = json.dumps(
+        [PLAN_CACHE_VERSION, fingerprint], sort_keys=True, default=str
+    ).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+class PlanCache:
+    """Store serialized plans in the cache directory."""
+
+    def __init__(self, cache_dir: str):
+        self._plans_dir = os.path.join(cache_dir, "plans")
+
+    def get(self, key: str) -> Optional[List[PartAction]]:
+        try:
+            with open(os.path.join(self._plans_dir, key)) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        logger.debug(f"use cached plan {key}")
+        return [
+            PartAction(a["part"], Action(a["action"]), reason=a["reason"]) for a in data
+        ]
+
+    def put(self, key: str, actions: List[PartAction]) -> None:
+        # actions carrying ephemeral states can't be serialized
+        if any(a.state is not None for a in actions):
+            return
+
+        data: List[Dict[str, Any]] = [
+            {"part": a.part_name, "action": int(a.action), "reason": a.reason}
+            for a in actions
+        ]
+
+        os.makedirs(self._plans_dir, exist_ok=True)
+        path = os.path.join(self._plans_dir, key)
+        tmp_path = f"{path}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+        self._prune()
+
+    def _prune(self) -> None:
+        with os.scandir(self._plans_dir) as entries:
+            plans = sorted(
+                (e for e in entries if "." not in e.name),
+                key=lambda e: e.stat().st_mtime,
+            )
+        for entry in plans[:-_MAX_PLANS]:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(entry.path)
@@ -0,0 +1,142 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Resource declarations and admission control for concurrent actions.
+
+Parts can declare the resources needed to build them in the part data::
+
+    resources:
+      cpu: 4
+      memory: 8G
+
+Actions are admitted to run only when the resources they request are
+available, so concurrent builds don't oversubscribe the machine.
+"""
+
+import os
+import re
+from typing import Any, List, NamedTuple, Optional
+
+from partbuilder import errors
+from partbuilder._part import Part
+from partbuilder._step import Step
+
+RESOURCE_PROPERTIES = frozenset(["cpu", "memory"])
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+
+class Resources(NamedTuple):
+    """Number of CPUs and bytes of memory."""
+
+    cpu: int
+    memory: int
+
+
+def parse_size(value: Any) -> int:
+    """Convert a size such as 512M or 4G to bytes.
+
+    :raises ValueError: If the size is not valid.
+    """
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+
+    match = _SIZE_RE.match(value) if isinstance(value, str) else None
+    if not match:
+        raise ValueError(f"invalid size {value!r}")
+
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def resources_problems(name: str, resources: Any) -> List[str]:
+    """Return the problems found in a part's resources declaration."""
+    if not isinstance(resources, dict):
+        return [f"Part {name!r}: 'resources' must be a mapping."]
+
+    problems = []
+    for key in resources:
+        if key not in RESOURCE_PROPERTIES:
+            problems.append(f"Part {name!r} has unknown resource {key!r}.")
+
+    cpu = resources.get("cpu", 1)
+    if not isinstance(cpu, int) or isinstance(cpu, bool) or cpu < 1:
+        problems.append(f"Part {name!r}: resource 'cpu' must be a positive integer.")
+
+    try:
+        parse_size(resources.get("memory", 0))
+    except ValueError:
+        problems.append(f"Part {name!r}: resource 'memory' must be a size.")
+
+    return problems
+
+
+def requested_resources(part: Part, step: Step, *, capacity: Resources) -> Resources:
+    """Return the resources to reserve to run a step of a part.
+
+    Builds request the resources declared by the part, defaulting to all
+    CPUs like a sequential build does. Other steps need a single CPU.
+    Requests are capped to the capacity, so any action can run alone.
+    """
+    if step != Step.BUILD:
+        return Resources(cpu=1, memory=0)
+
+    # parts are not validated if the manager was created with validate=False
+    declared = part.data.get("resources", {})
+    problems = resources_problems(part.name, declared)
+    if problems:
+        raise errors.PartbuilderPartsValidationError(problems)
+
+    cpu = declared.get("cpu", capacity.cpu)
+    memory = parse_size(declared.get("memory", 0))
+    return Resources(cpu=min(cpu, capacity.cpu), memory=min(memory, capacity.memory))
+
+
+def physical_memory() -> int:
+    """Return the amount of physical memory in bytes."""
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+class ResourcePool:
+    """Token based admission control.
+
+    The pool starts with tokens for the full capacity, and an action is
+    admitted when there are enough tokens left for its request.
+    """
+
+    def __init__(self, capacity: Resources):
+        self.capacity = capacity
+        self._cpu = capacity.cpu
+        self._memory = capacity.memory
+
+    @property
+    def idle(self) -> bool:
+        return self._cpu == self.capacity.cpu and self._memory == self.capacity.memory
+
+    def admit(self, request: Resources) -> Optional[Resources]:
+        """Take the tokens for a request, or return None if not available."""
+        if request.cpu > self._cpu or request.memory > self._memory:
+            return None
+
+        self._cpu -= request.cpu
+        self._memory -= request.memory
+        return request
+
+    def release(self, granted: Resources) -> None:
+        self._cpu += granted.cpu
+        self._memory += granted.memory
@@ -0,0 +1,49 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import List, NamedTuple
+
+from partbuilder._step import PartAction
+
+
+class FailedAction(NamedTuple):
+    """An action that raised an error when executed."""
+
+    action: PartAction
+    error: Exception
+
+
+class ExecutionResult:
+    """The outcome of the actions given to LifecycleManager.execute().
+
+    Actions of parts that depend on a part with a failed action are not
+    executed, and are listed as skipped.
+    """
+
+    def __init__(self) -> None:
+        self.succeeded: List[PartAction] = []
+        self.failed: List[FailedAction] = []
+        self.skipped: List[PartAction] = []
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+    def __repr__(self) -> str:
+        return (
+            f"ExecutionResult(succeeded={len(self.succeeded)}, "
+            f"failed={len(self.failed)}, skipped={len(self.skipped)})"
+        )
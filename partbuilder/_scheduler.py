@@ -0,0 +1,161 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Ordering of planned actions for parallel execution.
+
+Actions are handed out when the actions they depend on are done. Among the
+ready actions, the one heading the longest path of dependent actions is
+handed out first, so long chains of parts start as early as possible.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from partbuilder._durations import StepDurations
+from partbuilder._part import Part
+from partbuilder._step import (
+    PartAction,
+    Step,
+    dependency_prerequisite_step,
+    is_skip_action,
+    step_for_action,
+)
+
+# Estimated duration of a step that never ran
+DEFAULT_DURATION = 1.0
+
+
+class Scheduler:
+    """Hand out actions whose prerequisites are done, most critical first.
+
+    :param list actions: The planned actions, in sequential execution order.
+    :param list parts: The parts the actions refer to.
+    :param durations: Historical step durations used to weight paths. If
+        not provided, every step that runs weighs the same.
+    :param bool critical_path: If false, hand out ready actions in plan
+        order instead.
+    """
+
+    def __init__(
+        self,
+        actions: List[PartAction],
+        parts: List[Part],
+        *,
+        durations: Optional[StepDurations] = None,
+        critical_path: bool = True,
+    ):
+        self._actions = actions
+        self._index = {id(act): i for i, act in enumerate(actions)}
+        self._predecessors = _action_dependencies(actions, parts)
+
+        self._successors: List[List[int]] = [[] for _ in actions]
+        for i, preds in enumerate(self._predecessors):
+            for p in preds:
+                self._successors[p].append(i)
+
+        if critical_path:
+            weights = [_estimate(act, durations) for act in actions]
+            self._priorities = _path_lengths(weights, self._successors)
+        else:
+            self._priorities = [0.0] * len(actions)
+
+        self._pending = [len(preds) for preds in self._predecessors]
+        self._ready: List[Tuple[float, int]] = []
+        self._remaining = len(actions)
+        for i, count in enumerate(self._pending):
+            if not count:
+                heapq.heappush(self._ready, (-self._priorities[i], i))
+
+    @property
+    def finished(self) -> bool:
+        """Whether all actions are done."""
+        return not self._remaining
+
+    def priority(self, action: PartAction) -> float:
+        """The estimated duration of the longest path starting at action."""
+        return self._priorities[self._index[id(action)]]
+
+    def pop(self) -> Optional[PartAction]:
+        """Return the most critical ready action, or None if none is ready."""
+        if not self._ready:
+            return None
+        _, i = heapq.heappop(self._ready)
+        return self._actions[i]
+
+    def done(self, action: PartAction) -> None:
+        """Mark an action as done, making its dependents ready if possible."""
+        self._remaining -= 1
+        for s in self._successors[self._index[id(action)]]:
+            self._pending[s] -= 1
+            if not self._pending[s]:
+                heapq.heappush(self._ready, (-self._priorities[s], s))
+
+
+def _action_dependencies(
+    actions: List[PartAction], parts: List[Part]
+) -> List[List[int]]:
+    """Return the indices of the actions each action must wait for.
+
+    An action waits for the previous action of the same part, and for the
+    last action of each dependency up to the prerequisite step, as required
+    by the sequencer ordering guarantees.
+    """
+
+    after = {p.name: p.data.get("after", []) for p in parts}
+    latest: Dict[str, List[Tuple[Step, int]]] = {}
+    dependencies = []
+
+    for i, act in enumerate(actions):
+        step = step_for_action(act.action)
+        preds = set()
+
+        part_actions = latest.get(act.part_name)
+        if part_actions:
+            preds.add(part_actions[-1][1])
+
+        if step > Step.PULL:
+            prerequisite_step = dependency_prerequisite_step(step)
+            for dep in after.get(act.part_name, []):
+                dep_actions = [
+                    j for s, j in latest.get(dep, []) if s <= prerequisite_step
+                ]
+                if dep_actions:
+                    preds.add(dep_actions[-1])
+
+        dependencies.append(sorted(preds))
+        latest.setdefault(act.part_name, []).append((step, i))
+
+    return dependencies
+
+
+def _estimate(action: PartAction, durations: Optional[StepDurations]) -> float:
+    if is_skip_action(action.action):
+        return 0.0
+    if durations:
+        seconds = durations.get(action.part_name, step_for_action(action.action))
+        if seconds is not None:
+            return seconds
+    return DEFAULT_DURATION
+
+
+def _path_lengths(weights: List[float], successors: List[List[int]]) -> List[float]:
+    # Dependencies always come earlier in the plan, so a reverse pass sees
+    # every successor before its predecessors.
+    lengths = [0.0] * len(weights)
+    for i in reversed(range(len(weights))):
+        downstream = max((lengths[s] for s in successors[i]), default=0.0)
+        lengths[i] = weights[i] + downstream
+    return lengths
@@ -104,6 +104,28 @@ def skip_action_for_step(step: Step) -> Action:
     return acts[step]
 
 
+def step_for_action(action: Action) -> Step:
+    steps = {
+        Action.PULL: Step.PULL,
+        Action.BUILD: Step.BUILD,
+        Action.STAGE: Step.STAGE,
+        Action.PRIME: Step.PRIME,
+        Action.REPULL: Step.PULL,
+        Action.REBUILD: Step.BUILD,
+        Action.RESTAGE: Step.STAGE,
+        Action.REPRIME: Step.PRIME,
+        Action.SKIP_PULL: Step.PULL,
+        Action.SKIP_BUILD: Step.BUILD,
+        Action.SKIP_STAGE: Step.STAGE,
+        Action.SKIP_PRIME: Step.PRIME,
+    }
+    return steps[action]
+
+
+def is_skip_action(action: Action) -> bool:
+    return action >= Action.SKIP_PULL
+
+
 STEPS = [
     Step.PULL,
     Step.BUILD,
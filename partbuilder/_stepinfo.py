@@ -16,9 +16,12 @@
 
 import logging
 import os
-import platform
+from typing import Any, Dict, Optional
 
 from partbuilder import errors
+from partbuilder._part import Part
+from partbuilder._step import Step
+from partbuilder.utils import file_utils
 
 logger = logging.getLogger(__name__)
 
@@ -41,9 +44,8 @@ class StepInfo:
 
         self._parallel_build_count = parallel_build_count
         self._local_plugins_dir = local_plugins_dir
-
-        self.part = ""  # part name to be filled by the part handler
-        self.step = ""  # step name to be filled by the part handler
+        self.platform_id = platform_id
+        self.platform_version_id = platform_version_id
 
         if not work_dir:
             work_dir = os.getcwd()
@@ -52,14 +54,44 @@ class StepInfo:
         self.parts_dir = os.path.join(work_dir, "parts")
         self.stage_dir = os.path.join(work_dir, "stage")
         self.prime_dir = os.path.join(work_dir, "prime")
+        self.cache_dir = file_utils.cache_dir(work_dir)
 
+        self._custom_args = custom_args
         for key, value in custom_args.items():
             setattr(self, key, value)
 
+    def for_step(
+        self, *, part: Part, step: Step, parallel_build_count: Optional[int] = None
+    ) -> "PartStepInfo":
+        """Return the information for an action on the given part and step.
+
+        :param int parallel_build_count: The share of the project's
+            parallel build count granted to this action, if different.
+        """
+        return PartStepInfo(
+            self, part=part, step=step, parallel_build_count=parallel_build_count
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the arguments to create an equivalent StepInfo."""
+        return dict(
+            work_dir=self.work_dir,
+            target_arch=self.target_arch,
+            platform_id=self.platform_id,
+            platform_version_id=self.platform_version_id,
+            parallel_build_count=self.parallel_build_count,
+            local_plugins_dir=self.local_plugins_dir,
+            **self._custom_args,
+        )
+
     @property
     def arch_triplet(self) -> str:
         return self.__machine_info["triplet"]
 
+    @property
+    def target_arch(self) -> str:
+        return self.__target_machine
+
     @property
     def is_cross_compiling(self) -> bool:
         return self.__target_machine != self.__platform_arch
@@ -86,16 +118,114 @@ class StepInfo:
         self.__machine_info = _ARCH_TRANSLATIONS[self.__target_machine]
 
 
+class PartStepInfo:
+    """The information needed by part handlers to run a step of a part.
+
+    Project-level information is not copied: attributes not specific to
+    the part or step are looked up in the StepInfo this object was created
+    from. Instances are immutable and can be safely shared by concurrent
+    actions.
+    """
+
+    __slots__ = ("_step_info", "_part", "_step", "_parallel_build_count")
+
+    def __init__(
+        self,
+        step_info: StepInfo,
+        *,
+        part: Part,
+        step: Step,
+        parallel_build_count: Optional[int] = None,
+    ):
+        object.__setattr__(self, "_step_info", step_info)
+        object.__setattr__(self, "_part", part)
+        object.__setattr__(self, "_step", step)
+        object.__setattr__(self, "_parallel_build_count", parallel_build_count)
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for missing attributes: private ones, including unset
+        # slots while copying or unpickling, are not delegated
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._step_info, name)
+
+    def __reduce__(self):
+        return (
+            _part_step_info,
+            (self._step_info, self._part, self._step, self._parallel_build_count),
+        )
+
+    def __copy__(self) -> "PartStepInfo":
+        # instances are immutable
+        return self
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.part_name}:{self._step!r})"
+
+    @property
+    def step_info(self) -> StepInfo:
+        return self._step_info
+
+    @property
+    def part_name(self) -> str:
+        return self._part.name
+
+    @property
+    def step(self) -> Step:
+        return self._step
+
+    @property
+    def parallel_build_count(self) -> int:
+        if self._parallel_build_count is None:
+            return self._step_info.parallel_build_count
+        return self._parallel_build_count
+
+    @property
+    def part_dir(self) -> str:
+        return self._part.part_dir
+
+    @property
+    def part_src_dir(self) -> str:
+        return self._part.part_src_dir
+
+    @property
+    def part_build_dir(self) -> str:
+        return self._part.part_build_dir
+
+    @property
+    def part_install_dir(self) -> str:
+        return self._part.part_install_dir
+
+    @property
+    def part_state_dir(self) -> str:
+        return self._part.part_state_dir
+
+
+def _part_step_info(
+    step_info: StepInfo, part: Part, step: Step, parallel_build_count: Optional[int]
+) -> PartStepInfo:
+    return PartStepInfo(
+        step_info, part=part, step=step, parallel_build_count=parallel_build_count
+    )
+
+
 def _find_machine(target_arch):
-    machine = _ARCH_TRANSLATIONS.get(target_arch, None)
-    if not machine:
+    if target_arch not in _ARCH_TRANSLATIONS:
         raise errors.PartbuilderInvalidArchitecture(target_arch)
-    return machine
+    return target_arch
 
 
 def _get_platform_architecture() -> str:
     # TODO: handle Windows architectures
-    return platform.machine()
+    # os.uname() provides the same result as platform.machine() without
+    # importing the platform module
+    return os.uname().machine
 
 
 _ARCH_TRANSLATIONS = {
@@ -0,0 +1,217 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Any, Collection, Dict, Iterator, List, Optional, Set, Tuple
+
+from partbuilder import errors
+from partbuilder._resources import resources_problems
+
+# Bump when validation rules change, to invalidate cached validation results
+SCHEMA_VERSION = 2
+
+# Properties common to all parts. Plugin-specific properties must be
+# prefixed with the plugin name.
+PART_PROPERTIES = frozenset(
+    [
+        "after",
+        "build-attributes",
+        "build-packages",
+        "build-snaps",
+        "disable-parallel",
+        "filesets",
+        "organize",
+        "override-build",
+        "override-prime",
+        "override-pull",
+        "override-stage",
+        "parse-info",
+        "plugin",
+        "prime",
+        "resources",
+        "source",
+        "source-branch",
+        "source-checksum",
+        "source-commit",
+        "source-depth",
+        "source-subdir",
+        "source-tag",
+        "source-type",
+        "stage",
+        "stage-packages",
+    ]
+)
+
+
+class Validator:
+    """Validate a parts definition, reporting all problems found at once.
+
+    :param dict parts: The project data containing the parts definition.
+    :param list duplicate_keys: Duplicate keys found when parsing the
+        project file, as (key, line) tuples.
+    :param plugin_names: The names of existing plugins. If not provided,
+        plugin names are not checked.
+    """
+
+    def __init__(
+        self,
+        parts: Dict[str, Any],
+        *,
+        duplicate_keys: Optional[List[Tuple[Any, int]]] = None,
+        plugin_names: Optional[Collection[str]] = None,
+    ):
+        self._parts = parts
+        self._duplicate_keys = duplicate_keys or []
+        self._plugin_names = plugin_names
+
+    def validate(self) -> None:
+        problems = self.problems()
+        if problems:
+            raise errors.PartbuilderPartsValidationError(problems)
+
+    def problems(self) -> List[str]:
+        problems = [
+            f"Duplicate key {key!r} in line {line}."
+            for key, line in self._duplicate_keys
+        ]
+
+        parts_data = self._parts.get("parts") if self._parts else None
+        if not isinstance(parts_data, dict) or not parts_data:
+            problems.append("The parts definition must contain a 'parts' mapping.")
+            return problems
+
+        dependencies = {}  # type: Dict[str, List[str]]
+        for name, data in parts_data.items():
+            if not isinstance(name, str) or not name or name[0] == "." or "/" in name:
+                problems.append(f"Part name {name!r} is invalid.")
+                continue
+
+            if not isinstance(data, dict):
+                problems.append(f"Part {name!r} must be a mapping.")
+                continue
+
+            problems.extend(self._part_problems(name, data))
+
+            after = data.get("after", [])
+            if isinstance(after, list) and all(isinstance(a, str) for a in after):
+                dependencies[name] = after
+            else:
+                problems.append(f"Part {name!r}: 'after' must be a list of part names.")
+                dependencies[name] = []
+
+        for name, after in dependencies.items():
+            for dep in after:
+                if dep not in parts_data:
+                    problems.append(f"Part {name!r} depends on undefined part {dep!r}.")
+
+        for name in _dependency_cycles(dependencies):
+            problems.append(f"Part {name!r} belongs to a circular dependency chain.")
+
+        return problems
+
+    def _part_problems(self, name: str, data: Dict[str, Any]) -> List[str]:
+        problems = []
+
+        plugin = data.get("plugin")
+        if not plugin or not isinstance(plugin, str):
+            problems.append(f"Part {name!r} does not define a plugin.")
+            plugin = None
+        elif self._plugin_names is not None and plugin not in self._plugin_names:
+            problems.append(f"Part {name!r} uses unknown plugin {plugin!r}.")
+
+        if "resources" in data:
+            problems.extend(resources_problems(name, data["resources"]))
+
+        for key in data:
+            if key in PART_PROPERTIES:
+                continue
+            if plugin and isinstance(key, str) and key.startswith(plugin + "-"):
+                continue
+            problems.append(f"Part {name!r} has unknown property {key!r}.")
+
+        return problems
+
+
+def _dependency_cycles(dependencies: Dict[str, List[str]]) -> List[str]:
+    """Return the names of parts belonging to dependency cycles.
+
+    A part is in a cycle if its strongly connected component in the
+    dependency graph has other parts, or if it depends on itself.
+    """
+
+    cycles: List[str] = []
+    for component in _StronglyConnectedComponents(dependencies):
+        if len(component) > 1 or component[0] in dependencies[component[0]]:
+            cycles.extend(component)
+    return sorted(cycles)
+
+
+class _StronglyConnectedComponents:
+    """Iterate over the strongly connected components of a graph.
+
+    Components are found with Tarjan's algorithm, without recursion so that
+    long chains of parts don't exceed the recursion limit. Edges to nodes
+    not in the graph are ignored.
+
+    :param graph: The nodes each node has an edge to.
+    """
+
+    def __init__(self, graph: Dict[str, List[str]]):
+        self._graph = graph
+        self._index: Dict[str, int] = {}
+        self._lowlink: Dict[str, int] = {}
+        self._stack: List[str] = []
+        self._on_stack: Set[str] = set()
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for root in self._graph:
+            if root not in self._index:
+                yield from self._components_from(root)
+
+    def _components_from(self, root: str) -> Iterator[List[str]]:
+        # the nodes being visited, with their edges left to follow
+        path = [self._visit(root)]
+        while path:
+            node, edges = path[-1]
+            for n in edges:
+                if n not in self._graph:
+                    continue
+                if n not in self._index:
+                    path.append(self._visit(n))
+                    break
+                if n in self._on_stack:
+                    self._lowlink[node] = min(self._lowlink[node], self._index[n])
+            else:
+                path.pop()
+                if path:
+                    parent = path[-1][0]
+                    self._lowlink[parent] = min(
+                        self._lowlink[parent], self._lowlink[node]
+                    )
+                if self._lowlink[node] == self._index[node]:
+                    yield self._pop_component(node)
+
+    def _visit(self, node: str) -> Tuple[str, Iterator[str]]:
+        self._index[node] = self._lowlink[node] = len(self._index)
+        self._stack.append(node)
+        self._on_stack.add(node)
+        return node, iter(self._graph[node])
+
+    def _pop_component(self, node: str) -> List[str]:
+        component: List[str] = []
+        while not component or component[-1] != node:
+            component.append(self._stack.pop())
+            self._on_stack.discard(component[-1])
+        return component
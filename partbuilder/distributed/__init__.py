@@ -0,0 +1,28 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Execution of actions on remote workers.
+
+The coordinator sends each action as a self-contained job to an idle
+worker, respecting the dependencies between actions, and saves the state
+returned by the worker in the local work dir. Jobs and results travel over
+a Transport; SocketTransport accepts workers over Unix or TCP sockets.
+"""
+
+from ._coordinator import Coordinator  # noqa: F401
+from ._job import Job, JobResult  # noqa: F401
+from ._transport import SocketTransport, Transport, TransportEvent  # noqa: F401
+from ._worker import run_job, run_worker  # noqa: F401
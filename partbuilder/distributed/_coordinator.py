@@ -0,0 +1,221 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Distribution of planned actions to workers."""
+
+import collections
+import logging
+import time
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from partbuilder import errors, executor
+from partbuilder._durations import StepDurations
+from partbuilder._part import Part
+from partbuilder._scheduler import Scheduler
+from partbuilder._step import PartAction, is_skip_action, step_for_action
+from partbuilder._stepinfo import StepInfo
+from ._job import Job, JobResult
+from ._transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class Coordinator:
+    """Run actions on the workers reachable through a transport.
+
+    Each idle worker gets the most critical action whose dependencies are
+    done, so parts run on different workers still respect their `after`
+    ordering. Actions running on a lost worker are sent to another one.
+
+    :param float worker_timeout: How long to wait for a worker to become
+        available when none is connected.
+    """
+
+    def __init__(self, transport: Transport, *, worker_timeout: float = 60.0):
+        self._transport = transport
+        self._worker_timeout = worker_timeout
+        self._idle: List[str] = []
+        self._job_count = 0
+
+    def execute(
+        self,
+        actions: List[PartAction],
+        *,
+        parts: List[Part],
+        step_info: StepInfo,
+        durations: Optional[StepDurations] = None,
+        on_start: Optional[Callable[[PartAction], None]] = None,
+        on_done: Optional[Callable[[PartAction, JobResult], None]] = None,
+        on_failed: Optional[Callable[[PartAction, Exception], None]] = None,
+        skip: Optional[Callable[[PartAction], bool]] = None,
+    ) -> None:
+        """Run the actions on the workers, saving the returned state.
+
+        :param durations: Step durations used to prioritize actions.
+        :param on_start: Called before an action is sent to a worker.
+        :param on_done: Called after an action completed successfully.
+        :param on_failed: Called after an action failed. If not given, the
+            error is raised.
+        :param skip: Called before an action is sent to a worker, the action
+            is not executed if it returns True.
+        """
+        run = _Execution(
+            actions,
+            parts=parts,
+            step_info=step_info,
+            durations=durations,
+            on_start=on_start,
+            on_done=on_done,
+            on_failed=on_failed,
+            skip=skip,
+        )
+        no_workers_since: Optional[float] = None
+
+        while not run.scheduler.finished:
+            self._dispatch(run)
+            if run.scheduler.finished:
+                break
+
+            if run.running or self._idle:
+                no_workers_since = None
+            elif no_workers_since is None:
+                no_workers_since = time.monotonic()
+            elif time.monotonic() - no_workers_since > self._worker_timeout:
+                raise errors.PartbuilderNoWorkers(self._worker_timeout)
+
+            for event in self._transport.poll(timeout=1.0):
+                if event.kind == "joined":
+                    self._idle.append(event.worker)
+                elif event.kind == "lost":
+                    self._worker_lost(event.worker, run)
+                elif event.kind == "result" and event.result:
+                    self._job_done(event.worker, event.result, run)
+
+    def _dispatch(self, run: "_Execution") -> None:
+        """Send the ready actions to the idle workers."""
+        while True:
+            act = run.pending.popleft() if run.pending else run.scheduler.pop()
+            if not act:
+                return
+            if (run.skip and run.skip(act)) or is_skip_action(act.action):
+                run.scheduler.done(act)
+                continue
+            if not self._idle:
+                run.pending.appendleft(act)
+                return
+
+            worker = self._idle.pop()
+            if run.on_start and act not in run.started:
+                run.on_start(act)
+            run.started.add(act)
+            job = self._new_job(
+                act, part=run.parts[act.part_name], step_info=run.step_info
+            )
+            try:
+                self._transport.send(worker, job)
+            except ConnectionError:
+                logger.warning(f"Cannot send job to {worker}, rescheduling.")
+                run.pending.append(act)
+                continue
+            run.running[worker] = (act, job)
+
+    def _worker_lost(self, worker: str, run: "_Execution") -> None:
+        if worker in self._idle:
+            self._idle.remove(worker)
+        if worker in run.running:
+            act, _ = run.running.pop(worker)
+            logger.warning(f"Lost {worker} running {act!r}, rescheduling.")
+            run.pending.append(act)
+
+    def _job_done(self, worker: str, result: JobResult, run: "_Execution") -> None:
+        if worker not in run.running:
+            # the action was rescheduled when the worker was lost
+            logger.warning(f"Ignoring result of job {result.job_id} from {worker}.")
+            return
+
+        act, job = run.running.pop(worker)
+        self._idle.append(worker)
+        try:
+            self._save_result(
+                job,
+                result,
+                part=run.parts[act.part_name],
+                step_info=run.step_info,
+                worker=worker,
+            )
+        except errors.PartbuilderJobFailed as error:
+            if not run.on_failed:
+                raise
+            run.on_failed(act, error)
+        else:
+            if run.on_done:
+                run.on_done(act, result)
+        run.scheduler.done(act)
+
+    def _new_job(self, act: PartAction, *, part: Part, step_info: StepInfo) -> Job:
+        self._job_count += 1
+        return Job.for_action(self._job_count, act, part=part, step_info=step_info)
+
+    def _save_result(
+        self,
+        job: Job,
+        result: JobResult,
+        *,
+        part: Part,
+        step_info: StepInfo,
+        worker: str,
+    ) -> None:
+        if result.job_id != job.job_id:
+            raise errors.PartbuilderInternalError(
+                f"{worker} returned job {result.job_id}, expected {job.job_id}"
+            )
+        if not result.success:
+            step = step_for_action(job.action)
+            executor.clean_state(part, step, step_info)
+            raise errors.PartbuilderJobFailed(
+                part.name, step.name.lower(), worker, result.error or ""
+            )
+
+        for name, content in result.state.items():
+            executor.save_state_file(part, name, step_info, content)
+
+
+class _Execution:
+    """The progress of the actions run by Coordinator.execute."""
+
+    def __init__(
+        self,
+        actions: List[PartAction],
+        *,
+        parts: List[Part],
+        step_info: StepInfo,
+        durations: Optional[StepDurations],
+        on_start: Optional[Callable[[PartAction], None]],
+        on_done: Optional[Callable[[PartAction, JobResult], None]],
+        on_failed: Optional[Callable[[PartAction, Exception], None]],
+        skip: Optional[Callable[[PartAction], bool]],
+    ):
+        self.parts = {p.name: p for p in parts}
+        self.step_info = step_info
+        self.scheduler = Scheduler(actions, parts, durations=durations)
+        self.on_start = on_start
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.skip = skip
+        self.running: Dict[str, Tuple[PartAction, Job]] = {}
+        # actions to send again, oldest first
+        self.pending: Deque[PartAction] = collections.deque()
+        self.started: Set[PartAction] = set()
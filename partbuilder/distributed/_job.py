@@ -0,0 +1,76 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Jobs sent to workers and their results."""
+
+import json
+from typing import Any, Dict, NamedTuple, Optional
+
+from partbuilder._part import Part
+from partbuilder._step import Action, PartAction
+from partbuilder._stepinfo import StepInfo
+
+
+class Job(NamedTuple):
+    """An action with everything needed to run it on another host.
+
+    The step information must only contain JSON-serializable values.
+    """
+
+    job_id: int
+    part_name: str
+    action: Action
+    part_data: Dict[str, Any]
+    step_info: Dict[str, Any]
+
+    @classmethod
+    def for_action(
+        cls, job_id: int, action: PartAction, *, part: Part, step_info: StepInfo
+    ) -> "Job":
+        return cls(job_id, part.name, action.action, part.data, step_info.as_dict())
+
+    def to_json(self) -> str:
+        data = self._asdict()
+        data["action"] = int(self.action)
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, data: str) -> "Job":
+        job = json.loads(data)
+        job["action"] = Action(job["action"])
+        return cls(**job)
+
+
+class JobResult(NamedTuple):
+    """The outcome of a job.
+
+    :param dict state: The state files written by the step, by name.
+    """
+
+    job_id: int
+    success: bool
+    error: Optional[str] = None
+    state: Dict[str, str] = {}
+    wall: float = 0.0
+    cpu: float = 0.0
+    max_rss: Optional[int] = None
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, data: str) -> "JobResult":
+        return cls(**json.loads(data))
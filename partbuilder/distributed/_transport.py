@@ -0,0 +1,191 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Transports carrying jobs to workers and results back."""
+
+import abc
+import logging
+import os
+import selectors
+import socket
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from ._job import Job, JobResult
+
+logger = logging.getLogger(__name__)
+
+Address = Union[str, Tuple[str, int]]
+
+# Messages are prefixed with their length as a 32-bit big endian integer
+_HEADER = struct.Struct(">I")
+
+
+class TransportEvent(NamedTuple):
+    """Something that happened to a worker.
+
+    :param str kind: "joined" when a worker becomes available, "result" when
+        it sends a job result, or "lost" when it's no longer reachable.
+    """
+
+    kind: str
+    worker: str
+    result: Optional[JobResult] = None
+
+
+class Transport(abc.ABC):
+    """The coordinator side of the connection to the workers."""
+
+    @abc.abstractmethod
+    def send(self, worker: str, job: Job) -> None:
+        """Send a job to a worker.
+
+        :raises ConnectionError: If the worker is not reachable.
+        """
+
+    @abc.abstractmethod
+    def poll(self, timeout: float) -> List[TransportEvent]:
+        """Wait up to timeout seconds for worker events."""
+
+    def close(self) -> None:
+        """Disconnect from all workers."""
+
+
+class SocketTransport(Transport):
+    """Accept workers connecting to a Unix socket path or a TCP address.
+
+    Each connection is a worker. A worker is lost when its connection is
+    closed.
+    """
+
+    def __init__(self, address: Address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        self._server.bind(address)
+        self._server.listen()
+        self._server.setblocking(False)
+        self.address: Address = self._server.getsockname()
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._workers: Dict[str, socket.socket] = {}
+        self._buffers: Dict[str, bytes] = {}
+        self._count = 0
+
+    def send(self, worker: str, job: Job) -> None:
+        conn = self._workers.get(worker)
+        if not conn:
+            raise ConnectionError(f"worker {worker!r} is not connected")
+
+        conn.setblocking(True)
+        try:
+            send_message(conn, job.to_json())
+        finally:
+            conn.setblocking(False)
+
+    def poll(self, timeout: float) -> List[TransportEvent]:
+        events = []
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._server:
+                events.extend(self._accept())
+            else:
+                events.extend(self._receive(key.data))
+        return events
+
+    def close(self) -> None:
+        for worker in list(self._workers):
+            self._disconnect(worker)
+        self._selector.close()
+        self._server.close()
+        if isinstance(self.address, str):
+            os.unlink(self.address)
+
+    def _accept(self) -> List[TransportEvent]:
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return []
+
+        self._count += 1
+        worker = f"worker-{self._count}"
+        conn.setblocking(False)
+        self._workers[worker] = conn
+        self._buffers[worker] = b""
+        self._selector.register(conn, selectors.EVENT_READ, data=worker)
+        logger.debug(f"{worker} joined")
+        return [TransportEvent("joined", worker)]
+
+    def _receive(self, worker: str) -> List[TransportEvent]:
+        try:
+            data = self._workers[worker].recv(65536)
+        except BlockingIOError:
+            return []
+        except OSError:
+            data = b""
+
+        if not data:
+            self._disconnect(worker)
+            return [TransportEvent("lost", worker)]
+
+        buf = self._buffers[worker] + data
+        events = []
+        while len(buf) >= _HEADER.size:
+            (size,) = _HEADER.unpack_from(buf)
+            if len(buf) < _HEADER.size + size:
+                break
+            message = buf[_HEADER.size : _HEADER.size + size].decode()
+            buf = buf[_HEADER.size + size :]
+            result = JobResult.from_json(message)
+            events.append(TransportEvent("result", worker, result))
+
+        self._buffers[worker] = buf
+        return events
+
+    def _disconnect(self, worker: str) -> None:
+        conn = self._workers.pop(worker)
+        del self._buffers[worker]
+        self._selector.unregister(conn)
+        conn.close()
+        logger.debug(f"{worker} disconnected")
+
+
+def send_message(sock: socket.socket, message: str) -> None:
+    data = message.encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock: socket.socket) -> Optional[str]:
+    """Read a message, or return None if the connection was closed."""
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+
+    (size,) = _HEADER.unpack(header)
+    data = _receive_exactly(sock, size)
+    if data is None:
+        return None
+    return data.decode()
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,78 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""The worker side of distributed execution."""
+
+import logging
+import os
+import socket
+
+from partbuilder import executor
+from partbuilder._durations import UsageMeter
+from partbuilder._part import Part
+from partbuilder._step import step_for_action
+from partbuilder._stepinfo import StepInfo
+from ._job import Job, JobResult
+from ._transport import Address, receive_message, send_message
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(job: Job, *, work_dir: str) -> JobResult:
+    """Run a job in the given work dir and return its result."""
+    step_info_args = dict(job.step_info, work_dir=work_dir)
+    step_info = StepInfo(**step_info_args)
+    part = Part(job.part_name, job.part_data, work_dir=work_dir)
+
+    meter = UsageMeter()
+    try:
+        executor.run_action(job.action, part=part, step_info=step_info)
+    except Exception as err:
+        logger.exception(f"job {job.job_id} failed")
+        return JobResult(job.job_id, success=False, error=str(err))
+    usage = meter.stop()
+
+    state = {}
+    state_name = step_for_action(job.action).name.lower()
+    state_file = os.path.join(part.part_state_dir, state_name)
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state[state_name] = f.read()
+
+    return JobResult(
+        job.job_id,
+        success=True,
+        state=state,
+        wall=usage.wall,
+        cpu=usage.cpu,
+        max_rss=usage.max_rss,
+    )
+
+
+def run_worker(address: Address, *, work_dir: str) -> None:
+    """Connect to a coordinator and run jobs until it disconnects."""
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        while True:
+            message = receive_message(sock)
+            if message is None:
+                return
+
+            job = Job.from_json(message)
+            logger.debug(f"run job {job.job_id}: {job.part_name}:{job.action!r}")
+            result = run_job(job, work_dir=work_dir)
+            send_message(sock, result.to_json())
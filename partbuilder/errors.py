@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import List, Optional
 
 
 class PartbuilderException(Exception, ABC):
@@ -94,3 +94,142 @@ class PartbuilderInvalidArchitecture(PartbuilderException):
 
     def get_resolution(self) -> str:
         return "Make sure the requested architecture is supported."
+
+
+class PartbuilderUndefinedPlugin(PartbuilderException):
+    def __init__(self, part_name: str):
+        self._part_name = part_name
+
+    def get_brief(self) -> str:
+        return f'Part "{self._part_name}" does not define a plugin.'
+
+    def get_resolution(self) -> str:
+        return "Add a plugin property to the part definition."
+
+
+class PartbuilderPluginNotFound(PartbuilderException):
+    def __init__(self, plugin_name: str):
+        self._plugin_name = plugin_name
+
+    def get_brief(self) -> str:
+        return f'Plugin "{self._plugin_name}" was not found.'
+
+    def get_resolution(self) -> str:
+        return "Check for typos in the plugin name or in the local plugins directory."
+
+
+class PartbuilderInvalidPlugin(PartbuilderException):
+    def __init__(self, plugin_name: str):
+        self._plugin_name = plugin_name
+
+    def get_brief(self) -> str:
+        return f'Plugin "{self._plugin_name}" does not define a plugin class.'
+
+    def get_resolution(self) -> str:
+        return "Make sure the plugin module contains a subclass of Plugin."
+
+
+class PartbuilderPartsValidationError(PartbuilderException):
+    def __init__(self, problems: List[str]):
+        self._problems = problems
+
+    def get_brief(self) -> str:
+        count = len(self._problems)
+        if count == 1:
+            return f"Invalid parts definition: {self._problems[0]}"
+        return f"Invalid parts definition: {count} problems found."
+
+    def get_details(self) -> Optional[str]:
+        return "\n".join(self._problems)
+
+    def get_resolution(self) -> str:
+        return "Review the parts definition and fix the reported problems."
+
+
+class PartbuilderJobFailed(PartbuilderException):
+    def __init__(self, part_name: str, step_name: str, worker: str, message: str):
+        self._part_name = part_name
+        self._step_name = step_name
+        self._worker = worker
+        self._message = message
+
+    def get_brief(self) -> str:
+        return (
+            f'Failed to run the {self._step_name} step of part "{self._part_name}" '
+            f'on worker "{self._worker}".'
+        )
+
+    def get_details(self) -> Optional[str]:
+        return self._message
+
+    def get_resolution(self) -> str:
+        return "Check the worker logs for more information."
+
+
+class PartbuilderNoWorkers(PartbuilderException):
+    def __init__(self, timeout: float):
+        self._timeout = timeout
+
+    def get_brief(self) -> str:
+        return f"No workers available after waiting {self._timeout:.0f} seconds."
+
+    def get_resolution(self) -> str:
+        return "Make sure build workers are running and can reach the coordinator."
+
+
+class PartbuilderFilesetNotFound(PartbuilderException):
+    def __init__(self, part_name: str, fileset_name: str):
+        self._part_name = part_name
+        self._fileset_name = fileset_name
+
+    def get_brief(self) -> str:
+        return (
+            f'Part "{self._part_name}" refers to undefined fileset '
+            f'"{self._fileset_name}".'
+        )
+
+    def get_resolution(self) -> str:
+        return "Define the fileset in the part's filesets property."
+
+
+class PartbuilderInvalidFileset(PartbuilderException):
+    def __init__(self, part_name: str, pattern: str):
+        self._part_name = part_name
+        self._pattern = pattern
+
+    def get_brief(self) -> str:
+        return (
+            f'Part "{self._part_name}" has an absolute fileset path '
+            f'"{self._pattern}".'
+        )
+
+    def get_resolution(self) -> str:
+        return "Use paths relative to the part's install directory."
+
+
+class PartbuilderOrganizeConflict(PartbuilderException):
+    def __init__(self, part_name: str, source: str, destination: str, reason: str):
+        self._part_name = part_name
+        self._source = source
+        self._destination = destination
+        self._reason = reason
+
+    def get_brief(self) -> str:
+        return (
+            f'Part "{self._part_name}" cannot organize "{self._source}" to '
+            f'"{self._destination}": {self._reason}.'
+        )
+
+    def get_resolution(self) -> str:
+        return "Review the part's organize property."
+
+
+class PartbuilderSourceNotFound(PartbuilderException):
+    def __init__(self, source: str):
+        self._source = source
+
+    def get_brief(self) -> str:
+        return f'Source directory "{self._source}" was not found.'
+
+    def get_resolution(self) -> str:
+        return "Check the part's source property."
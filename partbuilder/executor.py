@@ -1,53 +1,272 @@
+"""Execution of the lifecycle steps of a part.
 
+Files are not migrated to the stage and prime directories yet: the stage and
+prime steps only record manifests of the install directory entries selected
+by the part's filesets, and the files are read from the install directory.
+"""
+
+import contextlib
+import hashlib
 import logging
 import os.path
+import stat
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 
+from partbuilder import (
+    _elf,
+    _filesets,
+    _organize,
+    _plan_cache,
+    errors,
+    plugins,
+    sources,
+)
+from partbuilder.utils import yaml_utils
 from ._part import Part
-from ._step import Action
-from ._stepinfo import StepInfo
+from ._step import (
+    Action,
+    Step,
+    dependency_prerequisite_step,
+    is_skip_action,
+    step_for_action,
+)
+from ._stepinfo import PartStepInfo, StepInfo
+from .sequencer.states import MANIFEST_SUFFIX, Manifest, write_manifest
 
 logger = logging.getLogger(__name__)
 
 
-def run_action(action: Action, *, part: Part, step_info: StepInfo):
+def run_action(
+    action: Action,
+    *,
+    part: Part,
+    step_info: StepInfo,
+    parallel_build_count: Optional[int] = None,
+    dependencies: Sequence[Part] = (),
+):
+    """Run an action on a part.
+
+    :param int parallel_build_count: The share of the project's parallel
+        build count granted to this action, if running concurrently.
+    :param dependencies: The parts this part depends on, recursively. The
+        output digests of their prerequisite steps are recorded in the state
+        file, so the step only becomes dirty if a dependency's output changes.
+    """
     logger.debug(f"execute action {part.name}:{action!r}")
 
-    # TODO: load plugin for part, instantiate part handler, etc.
+    if is_skip_action(action):
+        return
 
-    if action == Action.PULL:
-        _run_pull(part, step_info)
+    # TODO: instantiate part handler, etc.
+    step = step_for_action(action)
+    part_step_info = step_info.for_step(
+        part=part, step=step, parallel_build_count=parallel_build_count
+    )
+    plugin = _load_plugin(part, part_step_info)
 
-    if action == Action.BUILD:
-        _run_build(part, step_info)
+    state = {}  # type: Dict[str, Any]
+    digests = _dependency_digests(step, dependencies)
+    if digests:
+        state["dependency_digests"] = digests
 
-    if action == Action.STAGE:
-        _run_stage(part, step_info)
+    # steps run again the same way as the first time
+    if step == Step.PULL:
+        _run_pull(part, part_step_info)
 
-    if action == Action.PRIME:
-        _run_prime(part, step_info)
+    if step == Step.BUILD:
+        _run_build(part, step_info, plugin=plugin, state=state)
 
+    if step == Step.STAGE:
+        _run_stage(part, step_info, state=state)
 
+    if step == Step.PRIME:
+        _run_prime(part, part_step_info, state=state)
 
-def _run_pull(part: Part, step_info: StepInfo):
-    _save_state_file(part, "pull")
-        
 
-def _run_build(part: Part, step_info: StepInfo):
-    _save_state_file(part, "build")
+def step_has_run(part: Part, step: Step) -> bool:
+    """Whether the state file for a step of a part exists."""
+    return os.path.exists(os.path.join(part.part_state_dir, step.name.lower()))
+
+
+def clean_state(part: Part, step: Step, step_info: StepInfo) -> None:
+    """Remove the state of a step and the later steps of a part.
+
+    The step then runs again the next time, and so do the later steps, which
+    could otherwise be considered run up to the latest step with a state.
+    """
+    _plan_cache.bump_state_generation(step_info.cache_dir)
+
+    for name in [step.name.lower()] + [s.name.lower() for s in step.next_steps()]:
+        state_file = os.path.join(part.part_state_dir, name)
+        for path in [state_file, state_file + MANIFEST_SUFFIX]:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+
+def _load_plugin(part: Part, step_info: PartStepInfo) -> plugins.Plugin:
+    plugin_name = part.data.get("plugin")
+    if not plugin_name:
+        raise errors.PartbuilderUndefinedPlugin(part.name)
+
+    plugin_class = plugins.get_plugin_class(
+        plugin_name, local_plugins_dir=step_info.local_plugins_dir
+    )
+    return plugin_class(options=part.data, step_info=step_info)
+
+
+def _run_pull(part: Part, step_info: PartStepInfo):
+    source = part.data.get("source")
+    if source:
+        source_type = sources.get_source_type(source, part.data.get("source-type", ""))
+        handler = sources.get_source_handler(source_type)
+        if handler:
+            handler(
+                os.path.join(step_info.work_dir, source),
+                part.part_src_dir,
+                cache_dir=step_info.cache_dir,
+                ignore=[step_info.parts_dir, step_info.stage_dir, step_info.prime_dir],
+                workers=step_info.parallel_build_count,
+            ).pull()
+        else:
+            logger.warning(
+                f'Part "{part.name}": {source_type} sources are not supported yet.'
+            )
+
+    save_state_file(part, "pull", step_info.step_info)
         
 
-def _run_stage(part: Part, step_info: StepInfo):
-    _save_state_file(part, "stage")
+def _run_build(
+    part: Part, step_info: StepInfo, *, plugin: plugins.Plugin, state: Dict[str, Any]
+):
+    for cmd in plugin.get_build_commands():
+        logger.debug(f"build command: {cmd}")
+
+    organize = part.data.get("organize")
+    if organize and os.path.isdir(part.part_install_dir):
+        _organize.organize(part.name, part.part_install_dir, organize)
+
+    save_state_file(part, "build", step_info, _state_content(state))
         
 
-def _run_prime(part: Part, step_info: StepInfo):
-    _save_state_file(part, "prime")
+def _run_stage(part: Part, step_info: StepInfo, *, state: Dict[str, Any]):
+    matcher = _fileset_matcher(part, "stage")
+    if os.path.isdir(part.part_install_dir):
+        files, dirs = matcher.walk(part.part_install_dir)
+    else:
+        files, dirs = [], []
+    digest = _tree_digest(part.part_install_dir, files=files, directories=dirs)
+    _save_manifest(part, "stage", files=files, directories=dirs, digest=digest)
+    save_state_file(part, "stage", step_info, _state_content(state))
         
 
-def _save_state_file(part: Part, name: str) -> None:
+def _run_prime(part: Part, step_info: PartStepInfo, *, state: Dict[str, Any]):
+    stage_manifest = _manifest_file(part, "stage")
+    if os.path.exists(stage_manifest):
+        manifest = Manifest(stage_manifest)
+        files, dirs = _fileset_matcher(part, "prime").filter(
+            manifest.files, manifest.directories
+        )
+        if len(files) == manifest.file_count and len(dirs) == manifest.directory_count:
+            digest = manifest.digest
+        else:
+            digest = _tree_digest(part.part_install_dir, files=files, directories=dirs)
+        _save_manifest(part, "prime", files=files, directories=dirs, digest=digest)
+
+        elf_files = _elf.scan_elf_files(
+            part.part_install_dir,
+            files,
+            cache_dir=step_info.cache_dir,
+            workers=step_info.parallel_build_count,
+        )
+        dependency_paths = _elf.dependency_paths(files, elf_files)
+        if dependency_paths:
+            state["dependency_paths"] = sorted(dependency_paths)
+
+    save_state_file(part, "prime", step_info.step_info, _state_content(state))
+
+
+def _dependency_digests(step: Step, dependencies: Sequence[Part]) -> Dict[str, str]:
+    """Return the output digests of the dependencies' prerequisite steps."""
+    if step == Step.PULL or not dependencies:
+        return {}
+
+    prerequisite_step = dependency_prerequisite_step(step)
+    digests = {}  # type: Dict[str, str]
+    for dep in dependencies:
+        manifest_file = _manifest_file(dep, prerequisite_step.name.lower())
+        if os.path.exists(manifest_file):
+            digests[dep.name] = Manifest(manifest_file).digest.hex()
+
+    return digests
+
+
+def _state_content(state: Dict[str, Any]) -> Optional[str]:
+    return yaml_utils.dump(state) if state else None
+
+
+def _fileset_matcher(part: Part, name: str) -> _filesets.FilesetMatcher:
+    """Return the compiled `stage` or `prime` fileset of a part."""
+    patterns = _filesets.expand_filesets(
+        part.name, part.data.get(name) or ["*"], part.data.get("filesets") or {}
+    )
+    return _filesets.compile_fileset(patterns)
+
+
+def _tree_digest(root: str, *, files: List[str], directories: List[str]) -> bytes:
+    """Compute a digest of the contents of a directory tree.
+
+    The digest covers the paths, types and permissions of all entries, the
+    content of regular files and the target of symbolic links, but not the
+    timestamps: rebuilding a part with the same result gives the same digest.
+    """
+    tree_hash = hashlib.sha256()
+    for path in directories + files:
+        file_path = os.path.join(root, path)
+        st = os.lstat(file_path)
+        if stat.S_ISLNK(st.st_mode):
+            target = os.readlink(file_path)
+            tree_hash.update(f"l {path}\0{target}\0".encode())
+            continue
+
+        if not stat.S_ISREG(st.st_mode):
+            tree_hash.update(f"{st.st_mode:o} {path}\0".encode())
+            continue
+
+        tree_hash.update(f"f {stat.S_IMODE(st.st_mode):o} {path}\0".encode())
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                file_hash.update(chunk)
+        tree_hash.update(file_hash.digest())
+
+    return tree_hash.digest()
+
+
+def _manifest_file(part: Part, name: str) -> str:
+    return os.path.join(part.part_state_dir, name + MANIFEST_SUFFIX)
+
+
+def _save_manifest(
+    part: Part, name: str, *, files: List[str], directories: List[str], digest: bytes
+) -> None:
+    os.makedirs(part.part_state_dir, exist_ok=True)
+    write_manifest(
+        _manifest_file(part, name), files=files, directories=directories, digest=digest
+    )
+
+
+def save_state_file(
+    part: Part, name: str, step_info: StepInfo, content: Optional[str] = None
+) -> None:
+    # invalidate cached plans before the state changes
+    _plan_cache.bump_state_generation(step_info.cache_dir)
+
     if not os.path.exists(part.part_state_dir):
         os.makedirs(part.part_state_dir)
 
     state_file = os.path.join(part.part_state_dir, name)
-    Path(state_file).touch()
+    if content is None:
+        Path(state_file).touch()
+    else:
+        Path(state_file).write_text(content)
@@ -0,0 +1,44 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import abc
+from typing import Any, Dict, List, Set
+
+from partbuilder._stepinfo import PartStepInfo
+
+
+class Plugin(abc.ABC):
+    """The base class for part plugins.
+
+    :param dict options: The part properties.
+    :param PartStepInfo step_info: The information for the step being run.
+    """
+
+    def __init__(self, *, options: Dict[str, Any], step_info: PartStepInfo) -> None:
+        self.options = options
+        self.step_info = step_info
+
+    def get_build_packages(self) -> Set[str]:
+        """Return a set of required packages to install in the build environment."""
+        return set()
+
+    def get_build_environment(self) -> Dict[str, str]:
+        """Return a dictionary with the environment to use in the build step."""
+        return {}
+
+    @abc.abstractmethod
+    def get_build_commands(self) -> List[str]:
+        """Return a list of commands to run during the build step."""
@@ -0,0 +1,179 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Plugin discovery and loading.
+
+Built-in plugins are the public modules in this package, and local plugins
+are the python files in the project's local plugins directory. Both are
+discovered by listing module names only; a plugin module is imported the
+first time a part uses it, and the plugin class is cached by name.
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import logging
+import os
+import pkgutil
+import sys
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple, Type
+
+from partbuilder import errors
+from ._plugin import Plugin
+
+logger = logging.getLogger(__name__)
+
+# plugins explicitly registered by the application
+_registered_plugins: Dict[str, Type[Plugin]] = {}
+
+# plugin classes already loaded, keyed by local plugins dir and plugin name
+_plugin_classes: Dict[Tuple[str, str], Type[Plugin]] = {}
+
+# plugin name to module name for built-in plugins
+_builtin_plugins: Optional[Dict[str, str]] = None
+
+# plugin name to module path for each local plugins dir
+_local_plugins: Dict[str, Dict[str, str]] = {}
+
+
+def register_plugin(plugins: Dict[str, Type[Plugin]]) -> None:
+    """Add or replace plugins, taking precedence over built-in and local ones.
+
+    :param dict plugins: A dictionary mapping plugin names to plugin classes.
+    """
+    _registered_plugins.update(plugins)
+    for name in plugins:
+        for key in [k for k in _plugin_classes if k[1] == name]:
+            del _plugin_classes[key]
+
+
+def get_plugin_class(name: str, *, local_plugins_dir: str = "") -> Type[Plugin]:
+    """Obtain the class implementing a plugin, importing it if needed.
+
+    :param str name: The plugin name.
+    :param str local_plugins_dir: The directory containing local plugins.
+    """
+    key = (local_plugins_dir, name)
+    plugin_class = _plugin_classes.get(key)
+    if plugin_class:
+        return plugin_class
+
+    if name in _registered_plugins:
+        plugin_class = _registered_plugins[name]
+    elif name in local_plugins(local_plugins_dir):
+        module = _import_local_plugin(name, local_plugins(local_plugins_dir)[name])
+        plugin_class = _plugin_class_from_module(name, module)
+    elif name in builtin_plugins():
+        module = importlib.import_module(builtin_plugins()[name])
+        plugin_class = _plugin_class_from_module(name, module)
+    else:
+        raise errors.PartbuilderPluginNotFound(name)
+
+    _plugin_classes[key] = plugin_class
+    return plugin_class
+
+
+def available_plugins(*, local_plugins_dir: str = "") -> List[str]:
+    """Return the names of all plugins, without importing them."""
+    names = set(_registered_plugins)
+    names.update(local_plugins(local_plugins_dir))
+    names.update(builtin_plugins())
+    return sorted(names)
+
+
+def builtin_plugins() -> Dict[str, str]:
+    """Return a mapping of built-in plugin names to module names."""
+    global _builtin_plugins
+
+    if _builtin_plugins is None:
+        package = __name__.rpartition(".")[0]
+        package_path = [os.path.dirname(__file__)]
+        _builtin_plugins = {
+            _plugin_name(m.name): f"{package}.{m.name}"
+            for m in pkgutil.iter_modules(package_path)
+            if not m.name.startswith("_")
+        }
+
+    return _builtin_plugins
+
+
+def local_plugins(local_plugins_dir: str) -> Dict[str, str]:
+    """Return a mapping of local plugin names to module paths."""
+    if not local_plugins_dir:
+        return {}
+
+    plugins = _local_plugins.get(local_plugins_dir)
+    if plugins is None:
+        plugins = {}
+        try:
+            with os.scandir(local_plugins_dir) as entries:
+                for entry in entries:
+                    module_name, ext = os.path.splitext(entry.name)
+                    if ext == ".py" and not module_name.startswith("_"):
+                        plugins[_plugin_name(module_name)] = entry.path
+        except FileNotFoundError:
+            logger.debug(f"local plugins dir {local_plugins_dir!r} not found")
+        _local_plugins[local_plugins_dir] = plugins
+
+    return plugins
+
+
+def clear_cache() -> None:
+    """Forget discovered plugins and loaded plugin classes."""
+    global _builtin_plugins
+
+    _builtin_plugins = None
+    _local_plugins.clear()
+    _plugin_classes.clear()
+
+
+def _plugin_name(module_name: str) -> str:
+    return module_name.replace("_", "-")
+
+
+def _import_local_plugin(name: str, path: str) -> ModuleType:
+    logger.debug(f"load local plugin {name!r} from {path!r}")
+    # plugins of the same name may be loaded from several directories
+    plugins_dir = os.fsencode(os.path.dirname(os.path.abspath(path)))
+    digest = hashlib.sha1(plugins_dir).hexdigest()[:16]
+    module_name = f"partbuilder.plugins._local_{digest}_{name.replace('-', '_')}"
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if spec is None or spec.loader is None:
+        raise errors.PartbuilderPluginNotFound(name)
+
+    module = importlib.util.module_from_spec(spec)
+    # registered before running, as in a regular import
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+def _plugin_class_from_module(name: str, module: ModuleType) -> Type[Plugin]:
+    for _, obj in inspect.getmembers(module, inspect.isclass):
+        if (
+            issubclass(obj, Plugin)
+            and obj.__module__ == module.__name__
+            and not inspect.isabstract(obj)
+        ):
+            return obj
+
+    raise errors.PartbuilderInvalidPlugin(name)
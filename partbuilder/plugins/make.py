@@ -0,0 +1,43 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""The make plugin is useful for building make-based parts.
+
+This plugin uses the common plugin keywords as well as those for "sources".
+Additionally, this plugin uses the following plugin-specific keywords:
+
+    - make-parameters:
+      (list of strings)
+      Pass the given parameters to the make command.
+"""
+
+from typing import List, Set
+
+from ._plugin import Plugin
+
+
+class MakePlugin(Plugin):
+    def get_build_packages(self) -> Set[str]:
+        return {"gcc", "make"}
+
+    def get_build_commands(self) -> List[str]:
+        make_cmd = ["make", f"-j{self.step_info.parallel_build_count}"]
+        make_cmd.extend(self.options.get("make-parameters", []))
+
+        return [
+            " ".join(make_cmd),
+            'make install DESTDIR="{}"'.format(self.step_info.part_install_dir),
+        ]
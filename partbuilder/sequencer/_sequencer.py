@@ -15,11 +15,20 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-from typing import List, Optional
+from typing import Iterator, List, Optional, Set
 
 from .state_manager import StateManager, DirtyReport, OutdatedReport
 from .states import PartState
-from partbuilder._step import Action, dependency_prerequisite_step, PartAction, Step, action_for_step, rerun_action_for_step, skip_action_for_step
+from partbuilder import errors
+from partbuilder._step import (
+    Action,
+    dependency_prerequisite_step,
+    PartAction,
+    Step,
+    action_for_step,
+    rerun_action_for_step,
+    skip_action_for_step,
+)
 from partbuilder._part import get_dependencies, Part, sort_parts
 
 logger = logging.getLogger(__name__)
@@ -29,20 +38,48 @@ class Sequencer:
     def __init__(self, parts: List[Part]):
         self._parts = sort_parts(parts)
         self._sm = StateManager(parts)
-        self._actions = []  # type: List[PartAction]
 
     def actions(
         self, target_step: Step, part_names: List[str] = []
     ) -> List[PartAction]:
         """Determine the list of steps to execute for each part."""
 
-        self._actions = []
-        self._add_all_actions(target_step, part_names)
-        return self._actions
+        return list(self.iter_actions(target_step, part_names))
 
-
-    def _add_all_actions(self, target_step: Step, part_names: List[str] = [], reason: Optional[str]=None) -> None:
-        print(f"ADD ACTIONS REASON {reason}")
+    def iter_actions(
+        self, target_step: Step, part_names: List[str] = []
+    ) -> Iterator[PartAction]:
+        """Yield the steps to execute for each part as soon as they're decided.
+
+        Planning is incremental: each action is decided when the previous one
+        is consumed, so the caller can execute actions while later parts are
+        still being planned. Actions are yielded in an order in which they
+        can be executed sequentially:
+
+        - The actions for a part are yielded in lifecycle order, i.e. an
+          action for a step is only yielded after the actions for all earlier
+          steps of the same part, unless those steps already ran.
+
+        - An action for a step after PULL is only yielded after the actions
+          bringing each of the part's dependencies to the prerequisite step
+          (STAGE, or PRIME for the prime step), unless those already ran.
+
+        - Actions are never retracted or reordered once yielded.
+
+        These guarantees are checked as actions are planned, and a violation
+        raises PartbuilderInternalError. The sequencer state is updated as the
+        plan advances, so only one plan can be consumed at a time.
+        """
+
+        yield from self._add_all_actions(target_step, part_names)
+
+    def _add_all_actions(
+        self,
+        target_step: Step,
+        part_names: List[str] = [],
+        reason: Optional[str] = None,
+    ) -> Iterator[PartAction]:
+        logger.debug(f"add all actions, reason: {reason}")
         if part_names:
             selected_parts = [p for p in self._parts if p.name in part_names]
         else:
@@ -53,17 +90,23 @@ class Sequencer:
 
             for p in selected_parts:
                 logger.debug(f"process {p.name}:Step.{current_step.name}")
-                self._add_step_actions(current_step, target_step, p, part_names, reason=reason)
-
+                yield from self._add_step_actions(
+                    current_step, target_step, p, part_names, reason=reason
+                )
 
     def _add_step_actions(
-        self, current_step: Step, target_step: Step, part: Part, part_names: List[str], reason: Optional[str]=None
-    ) -> None:
+        self,
+        current_step: Step,
+        target_step: Step,
+        part: Part,
+        part_names: List[str],
+        reason: Optional[str] = None,
+    ) -> Iterator[PartAction]:
         """Verify if this step should be executed."""
 
         # check if step already ran, if not then run it
         if not self._sm.has_step_run(part, current_step):
-            self._run_step(part, current_step, reason=reason)
+            yield from self._run_step(part, current_step, reason=reason)
             return
 
         # If the step has already run:
@@ -72,7 +115,7 @@ class Sequencer:
         #    explicitly listed, run it again.
 
         if part_names and current_step == target_step and part.name in part_names:
-            self._rerun_step(part, current_step, reason="requested step")
+            yield from self._rerun_step(part, current_step, reason="requested step")
             return
 
         # 2. If the step is dirty, run it again. A step is considered dirty if
@@ -82,7 +125,7 @@ class Sequencer:
         dirty_report = self._sm.dirty_report(part, current_step)
         if dirty_report:
             logger.debug(f"{part.name}:{current_step!r} is dirty: {dirty_report.summary()}")
-            self._rerun_step(part, current_step, reason=dirty_report.summary())
+            yield from self._rerun_step(part, current_step, reason=dirty_report.summary())
             return
 
         # 3. If the step is outdated, run it again (without cleaning if possible).
@@ -92,29 +135,58 @@ class Sequencer:
         outdated_report = self._sm.outdated_report(part, current_step)
         if outdated_report:
             logger.debug(f"{part.name}:{current_step!r} is outdated")
-            if step == PULL or step == BUILD:
-                self._update_step(part, step, reason=outdated_report.summary())
+            if current_step in (Step.PULL, Step.BUILD):
+                self._update_step(
+                    part, current_step, reason=outdated_report.get_summary()
+                )
             else:
-                self._rerun_step(part, step, reason=outdated_report.summary())
+                yield from self._rerun_step(
+                    part, current_step, reason=outdated_report.get_summary()
+                )
 
             return
 
         # 4. Otherwise just skip it
-        self._add_action(part, skip_action_for_step(current_step), reason="already ran")
-
+        yield self._new_action(
+            part, skip_action_for_step(current_step), reason="already ran"
+        )
 
-    def _prepare_step(self, part: Part, step: Step) -> None:
+    def _prepare_step(self, part: Part, step: Step) -> Iterator[PartAction]:
         all_deps = get_dependencies(part.name, parts=self._parts)
         if step > Step.PULL:  # With v2 plugins we don't need to stage dependencies before PULL
             prerequisite_step = dependency_prerequisite_step(step)
             deps = { p for p in all_deps if self._sm.should_step_run(p, prerequisite_step) }
 
             for d in deps:
-                self._add_all_actions(target_step=prerequisite_step, part_names=[d.name], reason=f"required by {part.name!r}")
+                yield from self._add_all_actions(target_step=prerequisite_step, part_names=[d.name], reason=f"required by {part.name!r}")
 
+        self._check_prerequisites(part, step, all_deps)
 
-    def _run_step(self, part: Part, step: Step, *, reason: Optional[str]=None, rerun: bool=False) -> None:
-        self._prepare_step(part, step)
+    def _check_prerequisites(self, part: Part, step: Step, deps: Set[Part]) -> None:
+        """Enforce the ordering guarantees before yielding an action."""
+
+        for s in step.previous_steps():
+            if not self._sm.has_step_run(part, s):
+                raise errors.PartbuilderInternalError(
+                    f"{part.name}:{step!r} planned before {part.name}:{s!r}"
+                )
+
+        if step > Step.PULL:
+            prerequisite_step = dependency_prerequisite_step(step)
+            for name in self._sm.parts_not_run(prerequisite_step, deps):
+                raise errors.PartbuilderInternalError(
+                    f"{part.name}:{step!r} planned before {name}:{prerequisite_step!r}"
+                )
+
+    def _run_step(
+        self,
+        part: Part,
+        step: Step,
+        *,
+        reason: Optional[str] = None,
+        rerun: bool = False,
+    ) -> Iterator[PartAction]:
+        yield from self._prepare_step(part, step)
 
         state = None
 
@@ -131,15 +203,16 @@ class Sequencer:
             # TODO: build and update ephemeral build state
             pass
 
-        if rerun:
-            self._add_action(part, rerun_action_for_step(step), reason=reason, state=state)
-        else:
-            self._add_action(part, action_for_step(step), reason=reason, state=state)
-
         self._sm.add_step_run(part, step)
 
+        if rerun:
+            yield self._new_action(part, rerun_action_for_step(step), reason=reason, state=state)
+        else:
+            yield self._new_action(part, action_for_step(step), reason=reason, state=state)
 
-    def _rerun_step(self, part: Part, step: Step, *, reason: Optional[str]=None) -> None:
+    def _rerun_step(
+        self, part: Part, step: Step, *, reason: Optional[str] = None
+    ) -> Iterator[PartAction]:
         logger.debug(f"rerun step {part.name}:{step!r}")
         # First clean the step, then run it again
         self._sm.clean_part(part, step)
@@ -147,17 +220,20 @@ class Sequencer:
         # Uncache this and later steps since we just cleaned them: their status
         # has changed
         # FIXME: remove from ephemeral cache
-        for current_step in [step] + step.next_steps():
-            self._sm.clear_step(part, current_step)
+        self._sm.clear_steps([part], step)
 
-        self._run_step(part, step, reason=reason, rerun=True)
+        yield from self._run_step(part, step, reason=reason, rerun=True)
 
-    def _update_step(self, part: Part, step: Step):
+    def _update_step(self, part: Part, step: Step, *, reason: Optional[str] = None):
         pass
 
-
-
-    def _add_action(self, part: Part, action: Action, *, reason: Optional[str]=None, state: Optional[PartState]=None) -> None:
+    def _new_action(
+        self,
+        part: Part,
+        action: Action,
+        *,
+        reason: Optional[str] = None,
+        state: Optional[PartState] = None,
+    ) -> PartAction:
         logger.debug(f"add action {part.name}:{action!r}")
-        self._actions.append(PartAction(part.name, action, reason=reason, state=state))
-
+        return PartAction(part.name, action, reason=reason, state=state)
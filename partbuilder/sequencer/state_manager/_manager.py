@@ -17,10 +17,10 @@
 import collections
 import contextlib
 import logging
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from partbuilder import errors
-from partbuilder._part import Part, get_dependencies
+from partbuilder._part import Part
 from partbuilder._step import (
     STEPS,
     Step,
@@ -28,7 +28,8 @@ from partbuilder._step import (
 )
 from ._dirty_report import DirtyReport
 from ._outdated_report import OutdatedReport
-from ..states import load_state, PartState
+from ._step_table import StepStatus, StepTable
+from ..states import load_state, Manifest, PartState
 
 # report types
 _DirtyReport = Dict[str, Dict[Step, Optional[DirtyReport]]]
@@ -144,9 +145,23 @@ class StateManager:
         """
         self._parts = parts
         self._eph_states = _EphemeralStates(parts)
-        self._steps_run: Dict[str, Set[Step]] = dict()
+        self._table = StepTable([p.name for p in parts])
         self._outdated_reports: _OutdatedReport = collections.defaultdict(dict)
         self._dirty_reports: _DirtyReport = collections.defaultdict(dict)
+        self._should_run: Dict[Tuple[str, Step], bool] = dict()
+
+        self._parts_by_name = {p.name: p for p in parts}
+        # the steps whose cached dirty report read the state of a part
+        self._readers: Dict[str, Set[Tuple[str, Step]]] = collections.defaultdict(
+            set
+        )
+
+        # steps up to the latest step with a state are considered run
+        for part in parts:
+            latest_step = self._latest_step_for_part(part)
+            if latest_step:
+                for step in STEPS[: STEPS.index(latest_step) + 1]:
+                    self._table.set(StepStatus.RUN, step, [part.name])
 
     def state(self, part: Part, step: Step) -> Optional[PartState]:
         return self._eph_states.state(part_name=part.name, step=step)
@@ -154,6 +169,14 @@ class StateManager:
     def set_state(self, part: Part, step: Step, *, state: PartState) -> None:
         self._eph_states.add(part_name=part.name, step=step, state=state)
 
+    def manifest(self, part: Part, step: Step) -> Optional[Manifest]:
+        """Return the manifest of the files handled by a step, if any.
+
+        Counts, digest and timestamp can be checked without reading the
+        file lists.
+        """
+        return getattr(self.state(part, step), "manifest", None)
+
     def should_step_run(self, part: Part, step: Step) -> bool:
         """Determine if a given step of a given part should run.
 
@@ -168,7 +191,18 @@ class StateManager:
             3. Is outdated
             4. Either (1), (2), or (3) apply to any earlier steps in the part's
                lifecycle
+
+        The result is cached until the part or one of its dependencies change.
         """
+        key = (part.name, step)
+        should_run = self._should_run.get(key)
+        if should_run is None:
+            should_run = self._should_step_run(part, step)
+            self._should_run[key] = should_run
+
+        return should_run
+
+    def _should_step_run(self, part: Part, step: Step) -> bool:
         if (
             not self.has_step_run(part, step)
             or self.outdated_report(part, step) is not None
@@ -188,8 +222,8 @@ class StateManager:
         :param Part part: Part in question.
         :param Step step: Step in question.
         """
-        self._ensure_steps_run(part)
-        self._steps_run[part.name].add(step)
+        self._table.set(StepStatus.RUN, step, [part.name])
+        self._invalidate(part.name, step)
 
     def has_step_run(self, part: Part, step: Step) -> bool:
         """Determine if a given step of a given part has already run.
@@ -199,8 +233,40 @@ class StateManager:
         :return: Whether or not the step has run.
         :rtype: bool
         """
-        self._ensure_steps_run(part)
-        return step in self._steps_run[part.name]
+        return self._table.test(StepStatus.RUN, step, part.name)
+
+    def parts_not_run(self, step: Step, parts: Iterable[Part]) -> List[str]:
+        """Return the names of the given parts that didn't run a step.
+
+        :param Step step: Step in question.
+        :param parts: The parts to check.
+        """
+        names = [p.name for p in parts]
+        return self._table.parts_without(StepStatus.RUN, step, names)
+
+    def parts_outdated(self, step: Step, parts: Iterable[Part]) -> List[str]:
+        """Return the names of the given parts with an outdated step.
+
+        :param Step step: Step in question.
+        :param parts: The parts to check.
+        """
+        parts = list(parts)
+        for part in parts:
+            self._ensure_outdated_report(part, step)
+        names = [p.name for p in parts]
+        return self._table.parts_with(StepStatus.OUTDATED, step, names)
+
+    def parts_dirty(self, step: Step, parts: Iterable[Part]) -> List[str]:
+        """Return the names of the given parts with a dirty step.
+
+        :param Step step: Step in question.
+        :param parts: The parts to check.
+        """
+        parts = list(parts)
+        for part in parts:
+            self._ensure_dirty_report(part, step)
+        names = [p.name for p in parts]
+        return self._table.parts_with(StepStatus.DIRTY, step, names)
 
     def outdated_report(self, part: Part, step: Step):
         """Obtain the outdated report for a given step of the given part.
@@ -232,25 +298,85 @@ class StateManager:
 
         This function does nothing if the step wasn't cached.
         """
-        if part.name in self._steps_run:
-            _remove_item_from_set(self._steps_run[part.name], step)
-            if not self._steps_run[part.name]:
-                _remove_key_from_dict(self._steps_run, part.name)
-        _remove_key_from_dict(self._outdated_reports[part.name], step)
-        if not self._outdated_reports[part.name]:
-            _remove_key_from_dict(self._outdated_reports, part.name)
-        _remove_key_from_dict(self._dirty_reports[part.name], step)
-        if not self._dirty_reports[part.name]:
-            _remove_key_from_dict(self._dirty_reports, part.name)
-
-    def _ensure_steps_run(self, part: Part) -> None:
-        if part.name not in self._steps_run:
-            self._steps_run[part.name] = self._get_steps_run(part)
+        for flag in StepStatus:
+            self._table.clear(flag, step, [part.name])
+        self._forget_reports(part.name, [step])
+        self._invalidate(part.name, step)
+
+    def clear_steps(self, parts: Iterable[Part], step: Step) -> None:
+        """Clear the given and later steps of the given parts from the cache.
+
+        :param parts: Parts in question.
+        :param Step step: The first step to clear.
+        """
+        names = [p.name for p in parts]
+        self._table.clear_from(step, names)
+        steps = [s for s in STEPS if s >= step]
+        for name in names:
+            self._forget_reports(name, steps)
+            self._invalidate(name, step)
+
+    def _invalidate(self, part_name: str, step: Step) -> None:
+        """Forget whether steps should run after a step of a part changed.
+
+        The given and later steps of the part are affected, as well as the
+        cached dirty reports that read the changed steps of the part, and
+        in turn what was computed from them. Parts with nothing cached from
+        the changed part are not visited.
+        """
+        stack = [(part_name, step)]
+        while stack:
+            name, changed_step = stack.pop()
+            for s in STEPS:
+                if s >= changed_step:
+                    self._should_run.pop((name, s), None)
+
+            readers = self._readers.get(name)
+            if not readers:
+                continue
+
+            stale = {
+                (reader, s)
+                for reader, s in readers
+                if dependency_prerequisite_step(s) >= changed_step
+            }
+            readers -= stale
+            for reader, reader_step in stale:
+                # later steps build on the earlier steps of the same part
+                steps = [s for s in STEPS if s >= reader_step]
+                for s in steps:
+                    self._table.clear(StepStatus.DIRTY, s, [reader])
+                    self._table.clear(StepStatus.OUTDATED, s, [reader])
+                # the reports were computed from the dependency's former state
+                self._forget_reports(reader, steps)
+                stack.append((reader, reader_step))
+
+    def _dependencies(self, part: Part) -> List[Part]:
+        """Return the parts the given part comes after, directly or not."""
+        names = list(part.data.get("after", []))
+        seen = set(names)
+        # names grows as the dependencies are visited
+        for name in names:
+            dependency = self._parts_by_name[name]
+            for n in dependency.data.get("after", []):
+                if n not in seen:
+                    seen.add(n)
+                    names.append(n)
+        return [self._parts_by_name[n] for n in names]
+
+    def _forget_reports(self, part_name: str, steps: List[Step]) -> None:
+        for reports in (self._outdated_reports, self._dirty_reports):
+            for step in steps:
+                _remove_key_from_dict(reports[part_name], step)
+            if not reports[part_name]:
+                _remove_key_from_dict(reports, part_name)
 
     def _ensure_outdated_report(self, part: Part, step: Step) -> None:
         if step not in self._outdated_reports[part.name]:
             # self._outdated_reports[part.name][step] = part.get_outdated_report(step)
             self._outdated_reports[part.name][step] = self._eph_states.outdated_report_for_part(part_name=part.name, step=step)
+            if self._outdated_reports[part.name][step]:
+                self._table.set(StepStatus.OUTDATED, step, [part.name])
 
     def _ensure_dirty_report(self, part: Part, step: Step) -> None:
         # If we already have a dirty report, bail
@@ -265,6 +391,7 @@ class StateManager:
         dr = self._eph_states.dirty_report_for_part(part_name=part.name, step=step)
         self._dirty_reports[part.name][step] = dr
         if dr:
+            self._table.set(StepStatus.DIRTY, step, [part.name])
             return
 
         # The dirty report from the PluginHandler only takes into account
@@ -272,7 +399,7 @@ class StateManager:
         # we need to expand it here to also take its dependencies (if any) into
         # account
         prerequisite_step = dependency_prerequisite_step(step)
-        dependencies = get_dependencies(part.name, parts=self._parts, recursive=True)
+        dependencies = self._dependencies(part)
 
         changed_dependencies: List[Dependency] = []
 
@@ -287,10 +414,12 @@ class StateManager:
             # try:
                 # prerequisite_timestamp = dependency.step_timestamp(prerequisite_step)
 
+            self._readers[dependency.name].add((part.name, step))
             prerequisite_state = self._eph_states.state(part_name=dependency.name, step=prerequisite_step)
             if prerequisite_state and this_state:
-                prerequisite_timestamp = prerequisite_state.timestamp
-                dependency_changed = this_state.timestamp < prerequisite_timestamp
+                dependency_changed = _dependency_changed(
+                    this_state, dependency.name, prerequisite_state
+                )
             else: 
                 dependency_changed = False
 
@@ -311,21 +440,8 @@ class StateManager:
                 changed_dependencies=changed_dependencies
             )
 
-    def _get_steps_run(self, part: Part) -> Set[Step]:
-        steps_run = set()  # type: Set[Step]
-        for step in STEPS:
-            if not self._should_step_run_for_part(step=step, part=part):
-                steps_run.add(step)
-
-        return steps_run
-
-    def _should_step_run_for_part(self, *, part: Part, step: Step) -> bool:
-        """Return true if the given step hasn't run (or has been cleaned)."""
-
-        latest_step = self._latest_step_for_part(part)
-        if not latest_step:
-            return True
-        return step > latest_step
+        if self._dirty_reports[part.name][step]:
+            self._table.set(StepStatus.DIRTY, step, [part.name])
 
     def _latest_step_for_part(self, part: Part) -> Optional[Step]:
         for step in reversed(STEPS):
@@ -346,17 +462,30 @@ class StateManager:
             if step <= s:
                 if not self.is_state_clean_for_part(part=part, step=s):
                     self._mark_step_clean_for_part(part=part, step=s)
+        self._invalidate(part.name, step)
 
     def _mark_step_clean_for_part(self, part: Part, step: Step):
         # remove state from ephemeral cache
         self._eph_states.remove(part_name=part.name, step=step)
 
 
-def _remove_key_from_dict(c: Dict[Any, Any], key: Any) -> None:
-    with contextlib.suppress(KeyError):
-        del c[key]
+def _dependency_changed(
+    state: Any, dependency_name: str, prerequisite_state: Any
+) -> bool:
+    """Whether a dependency's prerequisite step changed since the step ran.
+
+    If the step recorded the digest of the dependency's output, the step is
+    only outdated if the output changed. Otherwise, the step is outdated if
+    the dependency ran more recently.
+    """
+    digests = getattr(state, "dependency_digests", None) or {}
+    manifest = getattr(prerequisite_state, "manifest", None)
+    if dependency_name in digests and manifest is not None:
+        return manifest.digest.hex() != digests[dependency_name]
+
+    return state.timestamp < prerequisite_state.timestamp
 
 
-def _remove_item_from_set(c: Set[Any], key: Any) -> None:
+def _remove_key_from_dict(c: Dict[Any, Any], key: Any) -> None:
     with contextlib.suppress(KeyError):
-        c.remove(key)
+        del c[key]
@@ -0,0 +1,109 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import array
+import enum
+from typing import Iterable, List, Optional, Sequence
+
+from partbuilder._step import STEPS, Step
+
+
+@enum.unique
+class StepStatus(enum.Enum):
+    RUN = 1
+    DIRTY = 2
+    OUTDATED = 3
+
+
+# the bit of each flag of each step in a part's bitmask
+_BITS = {
+    (flag, step): 1 << (i * len(STEPS) + j)
+    for i, flag in enumerate(StepStatus)
+    for j, step in enumerate(STEPS)
+}
+
+
+class StepTable:
+    """Step status flags of all parts, stored as small bitmasks.
+
+    Each part has a bitmask holding all flags of all its steps, stored in
+    an array indexed by the part ordinal. Flags of a single part are read
+    and updated in constant time, and queries on many parts are done in a
+    single pass over the array.
+
+    :param part_names: The names of all parts, in ordinal order.
+    """
+
+    def __init__(self, part_names: Sequence[str]):
+        self._names = list(part_names)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._flags = array.array("H", [0]) * len(self._names)
+
+    def test(self, flag: StepStatus, step: Step, part_name: str) -> bool:
+        return bool(self._flags[self._index[part_name]] & _BITS[flag, step])
+
+    def set(self, flag: StepStatus, step: Step, part_names: Iterable[str]) -> None:
+        bit = _BITS[flag, step]
+        for name in part_names:
+            self._flags[self._index[name]] |= bit
+
+    def clear(self, flag: StepStatus, step: Step, part_names: Iterable[str]) -> None:
+        self._clear_bits(_BITS[flag, step], part_names)
+
+    def clear_from(self, step: Step, part_names: Iterable[str]) -> None:
+        """Clear all flags of the given and later steps of the given parts."""
+        bits = 0
+        for (_, s), bit in _BITS.items():
+            if s >= step:
+                bits |= bit
+        self._clear_bits(bits, part_names)
+
+    def parts_with(
+        self,
+        flag: StepStatus,
+        step: Step,
+        part_names: Optional[Iterable[str]] = None,
+    ) -> List[str]:
+        """Return the names of the given parts, or all, with the flag set."""
+        return self._select(_BITS[flag, step], part_names, value=True)
+
+    def parts_without(
+        self,
+        flag: StepStatus,
+        step: Step,
+        part_names: Optional[Iterable[str]] = None,
+    ) -> List[str]:
+        """Return the names of the given parts, or all, with the flag not set."""
+        return self._select(_BITS[flag, step], part_names, value=False)
+
+    def _clear_bits(self, bits: int, part_names: Iterable[str]) -> None:
+        keep = ~bits & 0xFFFF
+        for name in part_names:
+            self._flags[self._index[name]] &= keep
+
+    def _select(
+        self, bit: int, part_names: Optional[Iterable[str]], *, value: bool
+    ) -> List[str]:
+        flags = self._flags
+        if part_names is None:
+            return [
+                name
+                for name, mask in zip(self._names, flags)
+                if bool(mask & bit) is value
+            ]
+
+        index = self._index
+        return [name for name in part_names if bool(flags[index[name]] & bit) is value]
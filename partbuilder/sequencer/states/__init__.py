@@ -17,6 +17,7 @@
 from ._state import PartState  # noqa
 
 from ._state import load_state  # noqa
+from ._manifest import MANIFEST_SUFFIX, Manifest, write_manifest  # noqa
 from ._build_state import BuildState  # noqa
 from ._global_state import GlobalState  # noqa
 from ._prime_state import PrimeState  # noqa
@@ -0,0 +1,139 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Binary manifests of the files and directories handled by a step.
+
+A manifest has a fixed size header followed by the file and directory
+lists, each entry a NUL-terminated path in the filesystem encoding:
+
+    magic     4 bytes   b"PBMF"
+    version   uint16
+    reserved  uint16
+    timestamp float64   when the manifest was written
+    files     uint32    number of files
+    dirs      uint32    number of directories
+    files_len uint64    size of the file list in bytes
+    dirs_len  uint64    size of the directory list in bytes
+    digest    32 bytes  digest of the step output
+
+All integers are little endian. The header values are available without
+reading the lists, which are only read and decoded when requested.
+"""
+
+import os
+import struct
+import time
+from typing import Iterable, List, Optional
+
+MANIFEST_SUFFIX = ".manifest"
+MANIFEST_MAGIC = b"PBMF"
+MANIFEST_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHdIIQQ32s")
+
+
+class Manifest:
+    """A manifest file.
+
+    The header is read on first access and kept. Manifests hold no open
+    files or maps, so states can keep them without being closed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._header: Optional[tuple] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.path == self.path
+
+    @property
+    def timestamp(self) -> float:
+        return self._get_header()[3]
+
+    @property
+    def file_count(self) -> int:
+        return self._get_header()[4]
+
+    @property
+    def directory_count(self) -> int:
+        return self._get_header()[5]
+
+    @property
+    def digest(self) -> bytes:
+        return self._get_header()[8]
+
+    @property
+    def files(self) -> List[str]:
+        start = _HEADER.size
+        return self._entries(start, self._get_header()[6])
+
+    @property
+    def directories(self) -> List[str]:
+        start = _HEADER.size + self._get_header()[6]
+        return self._entries(start, self._get_header()[7])
+
+    def _get_header(self) -> tuple:
+        if self._header is None:
+            with open(self.path, "rb") as f:
+                data = f.read(_HEADER.size)
+            if len(data) < _HEADER.size:
+                raise ValueError(f"{self.path!r} is not a valid manifest")
+            self._header = _HEADER.unpack(data)
+            magic, version = self._header[:2]
+            if magic != MANIFEST_MAGIC or version != MANIFEST_VERSION:
+                raise ValueError(f"{self.path!r} is not a valid manifest")
+        return self._header
+
+    def _entries(self, start: int, size: int) -> List[str]:
+        if not size:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(size)
+        return [os.fsdecode(entry) for entry in data[:-1].split(b"\0")]
+
+
+def write_manifest(
+    path: str,
+    *,
+    files: Iterable[str],
+    directories: Iterable[str],
+    digest: bytes = b"",
+) -> None:
+    """Write a manifest atomically."""
+    files_data = b"".join(os.fsencode(f) + b"\0" for f in files)
+    dirs_data = b"".join(os.fsencode(d) + b"\0" for d in directories)
+    header = _HEADER.pack(
+        MANIFEST_MAGIC,
+        MANIFEST_VERSION,
+        0,
+        time.time(),
+        files_data.count(b"\0"),
+        dirs_data.count(b"\0"),
+        len(files_data),
+        len(dirs_data),
+        digest,
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(files_data)
+        f.write(dirs_data)
+    os.replace(tmp_path, path)
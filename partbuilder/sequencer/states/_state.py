@@ -20,6 +20,7 @@ from typing import Any, Dict
 from partbuilder._part import Part
 from partbuilder._step import Step
 from partbuilder.utils import yaml_utils, file_utils
+from ._manifest import MANIFEST_SUFFIX, Manifest
 
 
 class State(yaml_utils.YAMLObject):
@@ -106,6 +107,11 @@ def load_state(part: Part, step: Step) -> State:
 
         state["timestamp"] = file_utils.timestamp(state_file)
 
+        # file lists are only read from the manifest when needed
+        manifest_file = state_file + MANIFEST_SUFFIX
+        if os.path.isfile(manifest_file):
+            state["manifest"] = Manifest(manifest_file)
+
     return State(state)
 
 
@@ -0,0 +1,294 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Incremental pull of local source directories.
+
+The source and destination trees are listed, and only the differences are
+applied: entries gone from the source are deleted, and new or changed files
+are linked or copied. A file is unchanged if it has the same inode, or the
+same size and modification time, as its source. Files with the same size but
+different timestamps are compared by content hash, using the file cache.
+
+Files are hard linked when possible, otherwise cloned where the filesystem
+supports it, and copied as a last resort, in parallel.
+"""
+
+import contextlib
+import logging
+import os
+import shutil
+import stat
+from typing import Callable, Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from partbuilder import errors
+from partbuilder._file_cache import FileCache
+from partbuilder.utils import file_utils
+
+logger = logging.getLogger(__name__)
+
+# ioctl cloning a file on Linux filesystems supporting reflinks
+_FICLONE = 0x40049409
+
+_TMP_SUFFIX = ".partbuilder-pull"
+
+
+class SyncResult(NamedTuple):
+    """The changes made by a pull."""
+
+    copied: int  # files and symbolic links linked or copied
+    deleted: int  # entries removed from the destination
+    unchanged: int  # files and symbolic links already up to date
+
+
+class LocalSource:
+    """A directory on the local filesystem.
+
+    :param str source: The source directory.
+    :param str source_dir: The directory the source is pulled to.
+    :param str cache_dir: The partbuilder cache directory.
+    :param ignore: Directories not to pull, such as the work dir's ones if
+        the source contains them.
+    :param int workers: The number of files copied concurrently.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        source_dir: str,
+        *,
+        cache_dir: str,
+        ignore: Sequence[str] = (),
+        workers: int = 1,
+    ):
+        self.source = source
+        self.source_dir = source_dir
+        self._cache_dir = cache_dir
+        self._ignore = ignore
+        self._workers = workers
+
+    def pull(self) -> SyncResult:
+        if not os.path.isdir(self.source):
+            raise errors.PartbuilderSourceNotFound(self.source)
+
+        os.makedirs(self.source_dir, exist_ok=True)
+        ignored = {_inode(os.stat(p)) for p in self._ignore if os.path.isdir(p)}
+        ignored.add(_inode(os.stat(self.source_dir)))
+        src = _scan(self.source, ignored)
+        dst = _scan(self.source_dir, set())
+
+        deleted = self._delete(src, dst)
+        to_copy, to_compare, copied, unchanged = self._classify(src, dst)
+
+        identical = self._identical(to_compare, src, dst)
+        for rel in identical:
+            st = src[rel]
+            dst_path = os.path.join(self.source_dir, rel)
+            os.utime(dst_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        unchanged += len(identical)
+        to_copy.extend(rel for rel in to_compare if rel not in identical)
+
+        self._copy(to_copy)
+        copied += len(to_copy)
+
+        # permissions are applied last, directories may be read-only
+        self._set_modes(src, dst, skip=set(to_copy))
+
+        logger.debug(
+            f"pulled {self.source!r}: {copied} copied, {deleted} deleted, "
+            f"{unchanged} unchanged"
+        )
+        return SyncResult(copied, deleted, unchanged)
+
+    def _classify(
+        self, src: Dict[str, os.stat_result], dst: Dict[str, os.stat_result]
+    ) -> Tuple[List[str], List[str], int, int]:
+        """Create directories and symbolic links, and sort the files.
+
+        :return: The files to copy, the files to compare by content, and the
+            number of symbolic links copied and entries unchanged.
+        """
+        to_copy = []  # type: List[str]
+        to_compare = []  # type: List[str]
+        copied = unchanged = 0
+        for rel, st in sorted(src.items()):
+            src_path = os.path.join(self.source, rel)
+            dst_path = os.path.join(self.source_dir, rel)
+            dst_st = dst.get(rel)
+            if stat.S_ISDIR(st.st_mode):
+                if dst_st is None:
+                    os.mkdir(dst_path)
+            elif stat.S_ISLNK(st.st_mode):
+                target = os.readlink(src_path)
+                if dst_st is not None and os.readlink(dst_path) == target:
+                    unchanged += 1
+                else:
+                    _replace(dst_path, lambda tmp: os.symlink(target, tmp))
+                    copied += 1
+            elif stat.S_ISREG(st.st_mode):
+                if dst_st is None or dst_st.st_size != st.st_size:
+                    to_copy.append(rel)
+                elif _inode(dst_st) == _inode(st) or _same_mtime(dst_st, st):
+                    unchanged += 1
+                else:
+                    to_compare.append(rel)
+            else:
+                logger.debug(f"{src_path}: special file not pulled")
+        return to_copy, to_compare, copied, unchanged
+
+    def _set_modes(
+        self,
+        src: Dict[str, os.stat_result],
+        dst: Dict[str, os.stat_result],
+        *,
+        skip: Set[str],
+    ) -> None:
+        """Apply the source permissions to the entries not copied."""
+        for rel, st in src.items():
+            if stat.S_ISLNK(st.st_mode) or rel in skip:
+                continue
+            mode = stat.S_IMODE(st.st_mode)
+            dst_st = dst.get(rel)
+            if dst_st is None or stat.S_IMODE(dst_st.st_mode) != mode:
+                os.chmod(os.path.join(self.source_dir, rel), mode)
+
+    def _delete(
+        self, src: Dict[str, os.stat_result], dst: Dict[str, os.stat_result]
+    ) -> int:
+        """Remove entries not in the source, or of a different type."""
+        deleted = 0
+        # children are listed before their parents
+        for rel in sorted(dst, reverse=True):
+            src_st = src.get(rel)
+            dst_st = dst[rel]
+            if src_st is not None and _same_type(src_st, dst_st):
+                continue
+
+            path = os.path.join(self.source_dir, rel)
+            if stat.S_ISDIR(dst_st.st_mode):
+                os.rmdir(path)
+            else:
+                os.unlink(path)
+            del dst[rel]
+            deleted += 1
+        return deleted
+
+    def _identical(
+        self,
+        paths: List[str],
+        src: Dict[str, os.stat_result],
+        dst: Dict[str, os.stat_result],
+    ) -> Set[str]:
+        """Return the files with the same content in source and destination."""
+        if not paths:
+            return set()
+
+        stats = {}  # type: Dict[str, os.stat_result]
+        for rel in paths:
+            stats[os.path.join(self.source, rel)] = src[rel]
+            stats[os.path.join(self.source_dir, rel)] = dst[rel]
+        hashes = FileCache(self._cache_dir, "sha256").values(
+            stats,
+            lambda path: file_utils.calculate_hash(path, algorithm="sha256"),
+            workers=self._workers,
+        )
+        return {
+            rel
+            for rel in paths
+            if hashes[os.path.join(self.source, rel)]
+            == hashes[os.path.join(self.source_dir, rel)]
+        }
+
+    def _copy(self, paths: List[str]) -> None:
+        pairs = [
+            (os.path.join(self.source, rel), os.path.join(self.source_dir, rel))
+            for rel in paths
+        ]
+        if self._workers > 1 and len(pairs) > 1:
+            import concurrent.futures
+
+            with concurrent.futures.ThreadPoolExecutor(self._workers) as pool:
+                # consume the results to raise errors
+                list(pool.map(lambda pair: _link_or_copy(*pair), pairs))
+        else:
+            for src_path, dst_path in pairs:
+                _link_or_copy(src_path, dst_path)
+
+
+def _scan(root: str, ignored: Set[Tuple[int, int]]) -> Dict[str, os.stat_result]:
+    """Return the stat results of the entries under root, by relative path."""
+    entries = {}  # type: Dict[str, os.stat_result]
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        with os.scandir(os.path.join(root, rel)) as it:
+            for entry in it:
+                path = rel + entry.name
+                st = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(st.st_mode):
+                    if _inode(st) in ignored:
+                        continue
+                    stack.append(path + "/")
+                elif entry.name.endswith(_TMP_SUFFIX):
+                    continue
+                entries[path] = st
+    return entries
+
+
+def _inode(st: os.stat_result) -> Tuple[int, int]:
+    return st.st_dev, st.st_ino
+
+
+def _same_type(st: os.stat_result, other: os.stat_result) -> bool:
+    return stat.S_IFMT(st.st_mode) == stat.S_IFMT(other.st_mode)
+
+
+def _same_mtime(st: os.stat_result, other: os.stat_result) -> bool:
+    return st.st_mtime_ns == other.st_mtime_ns
+
+
+def _link_or_copy(src_path: str, dst_path: str) -> None:
+    def create(tmp_path: str) -> None:
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            if not _reflink(src_path, tmp_path):
+                shutil.copy2(src_path, tmp_path)
+
+    _replace(dst_path, create)
+
+
+def _reflink(src_path: str, dst_path: str) -> bool:
+    import fcntl
+
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    except OSError:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(dst_path)
+        return False
+
+    shutil.copystat(src_path, dst_path)
+    return True
+
+
+def _replace(path: str, create: Callable[[str], None]) -> None:
+    """Atomically replace path with an entry made by create(tmp_path)."""
+    tmp_path = path + _TMP_SUFFIX
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(tmp_path)
+    create(tmp_path)
+    os.replace(tmp_path, path)
@@ -0,0 +1,58 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Selection of the handler fetching a part's source.
+
+Only local directories are handled for now.
+"""
+
+from typing import Dict, Optional, Type
+
+from ._local import LocalSource
+
+_SOURCE_HANDLERS: Dict[str, Type[LocalSource]] = {"local": LocalSource}
+
+_ARCHIVE_TYPES = [
+    (".tar", "tar"),
+    (".tar.gz", "tar"),
+    (".tgz", "tar"),
+    (".tar.bz2", "tar"),
+    (".tar.xz", "tar"),
+    (".zip", "zip"),
+    (".deb", "deb"),
+    (".rpm", "rpm"),
+    (".7z", "7z"),
+]
+
+
+def get_source_type(source: str, source_type: str = "") -> str:
+    """Return the type of a source, guessed from the source if not given."""
+    if source_type:
+        return source_type
+
+    if source.startswith("git@") or source.endswith(".git"):
+        return "git"
+    for suffix, archive_type in _ARCHIVE_TYPES:
+        if source.endswith(suffix):
+            return archive_type
+    if "://" in source:
+        return "url"
+    return "local"
+
+
+def get_source_handler(source_type: str) -> Optional[Type[LocalSource]]:
+    """Return the class handling a source type, if supported."""
+    return _SOURCE_HANDLERS.get(source_type)
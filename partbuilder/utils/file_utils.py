@@ -1,8 +1,25 @@
 # -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
 
+import hashlib
 import os
 
 
 def timestamp(filename: str):
    return os.stat(filename).st_mtime
 
+
+def cache_dir(work_dir: str) -> str:
+    """Return the directory where partbuilder keeps its caches."""
+    return os.path.join(work_dir, "parts", ".cache")
+
+
+def calculate_hash(path: str, *, algorithm: str) -> str:
+    """Calculate the hash for path with algorithm."""
+    # This will raise an AttributeError if algorithm is unsupported
+    hasher = getattr(hashlib, algorithm)()
+
+    blocksize = 2 ** 20
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
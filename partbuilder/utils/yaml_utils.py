@@ -2,7 +2,7 @@
 
 import collections
 import yaml
-from typing import Any, TextIO
+from typing import Any, List, Optional, TextIO, Tuple
 
 
 try:
@@ -19,6 +19,13 @@ def load(stream: TextIO) -> Any:
     return yaml.load(stream, Loader=_SafeOrderedLoader)
 
 
+def dump(data: Any, *, stream: Optional[TextIO] = None) -> Optional[str]:
+    """Safely dump YAML in ordered manner."""
+    return yaml.dump(
+        data, stream=stream, Dumper=_SafeOrderedDumper, default_flow_style=False
+    )
+
+
 class _SafeOrderedLoader(CSafeLoader):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -27,6 +34,29 @@ class _SafeOrderedLoader(CSafeLoader):
         )
 
 
+def load_with_duplicate_keys(stream: TextIO) -> Tuple[Any, List[Tuple[Any, int]]]:
+    """Safely load YAML in ordered manner, also returning duplicate keys.
+
+    Duplicate mapping keys are not an error when loading, the last value
+    wins. They are returned as a list of (key, line number) tuples.
+    """
+    loader = _DuplicateKeysLoader(stream)
+    try:
+        return loader.get_single_data(), loader.duplicate_keys
+    finally:
+        loader.dispose()
+
+
+class _DuplicateKeysLoader(_SafeOrderedLoader):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.duplicate_keys = []  # type: List[Tuple[Any, int]]
+        self.add_constructor(
+            yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+            _dict_constructor_with_duplicates,
+        )
+
+
 class _SafeOrderedDumper(CSafeDumper):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -50,6 +80,18 @@ def _dict_constructor(loader, node):
         )
 
 
+def _dict_constructor_with_duplicates(loader, node):
+    value = _dict_constructor(loader, node)
+    if len(value) < len(node.value):
+        seen = set()
+        for key_node, _ in node.value:
+            key = loader.construct_object(key_node)
+            if key in seen:
+                loader.duplicate_keys.append((key, key_node.start_mark.line + 1))
+            seen.add(key)
+    return value
+
+
 def _dict_representer(dumper, data):
     return dumper.represent_dict(data.items())
 
@@ -22,6 +22,7 @@ usage() {
     echo "    ./runtests.sh static"
     echo "    ./runtests.sh tests/unit[/<test-suite>]"
     echo "    ./runtests.sh spread"
+    echo "    ./runtests.sh benchmarks [lifecycle|schedule|startup] [<benchmark-options>]"
 }
 
 run_static_tests() {
@@ -49,6 +50,16 @@ run_unit_tests(){
     python3 -m unittest discover -b -v -s "$test_suite" -t .
 }
 
+run_benchmarks(){
+    benchmark="lifecycle"
+    if [[ "$#" -gt 0 ]] && [[ "$1" != -* ]]; then
+        benchmark="$1"
+        shift
+    fi
+
+    python3 -m "tests.benchmarks.bench_$benchmark" "$@"
+}
+
 run_spread(){
     TMP_SPREAD="$(mktemp -d)"
     curl -s https://niemeyer.s3.amazonaws.com/spread-amd64.tar.gz | tar xzv -C "$TMP_SPREAD"
@@ -72,6 +83,8 @@ if [[ "$test_suite" == "static" ]]; then
     run_static_tests
 elif [[ "$test_suite" == "spread" ]]; then
     run_spread "$@"
+elif [[ "$test_suite" == "benchmarks" ]]; then
+    run_benchmarks "$@"
 elif [[ "$test_suite" == "-h" ]] || [[ "$test_suite" == "help" ]]; then
     usage
     exit 0
@@ -0,0 +1,131 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Generators for synthetic parts definitions used in benchmarks."""
+
+import os
+import random
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from partbuilder._step import STEPS, Step
+
+SHAPES = ["chain", "fan", "diamond", "random"]
+
+
+def part_name(index: int) -> str:
+    return f"part-{index:05d}"
+
+
+def chain(count: int, *, seed: int = 0) -> Dict[str, Any]:
+    """Each part depends on the previous one."""
+
+    parts = {}
+    for i in range(count):
+        data = {"plugin": "nil"}  # type: Dict[str, Any]
+        if i > 0:
+            data["after"] = [part_name(i - 1)]
+        parts[part_name(i)] = data
+
+    return {"parts": parts}
+
+
+def fan(count: int, *, seed: int = 0) -> Dict[str, Any]:
+    """A single root part with all other parts depending on it."""
+
+    parts = {part_name(0): {"plugin": "nil"}}  # type: Dict[str, Any]
+    for i in range(1, count):
+        parts[part_name(i)] = {"plugin": "nil", "after": [part_name(0)]}
+
+    return {"parts": parts}
+
+
+def diamond(count: int, *, seed: int = 0) -> Dict[str, Any]:
+    """A sequence of diamonds, each one hanging from the previous bottom part.
+
+    Every diamond has a top, two sides and a bottom part which is the top
+    of the next diamond.
+    """
+
+    parts = {part_name(0): {"plugin": "nil"}}  # type: Dict[str, Any]
+    top = 0
+    i = 1
+    while i < count:
+        sides = [i, i + 1][: count - i]
+        for s in sides:
+            parts[part_name(s)] = {"plugin": "nil", "after": [part_name(top)]}
+        i += len(sides)
+        if i < count:
+            parts[part_name(i)] = {
+                "plugin": "nil",
+                "after": [part_name(s) for s in sides],
+            }
+            top = i
+            i += 1
+
+    return {"parts": parts}
+
+
+def random_dag(
+    count: int, *, seed: int = 0, max_deps: int = 3, window: int = 100
+) -> Dict[str, Any]:
+    """A random directed acyclic graph.
+
+    Each part depends on up to `max_deps` parts randomly chosen among the
+    `window` parts defined immediately before it, so no cycles are created.
+    """
+
+    rng = random.Random(seed)
+    parts = {}
+    for i in range(count):
+        data = {"plugin": "nil"}  # type: Dict[str, Any]
+        candidates = range(max(0, i - window), i)
+        ndeps = rng.randint(0, min(max_deps, len(candidates)))
+        if ndeps:
+            data["after"] = [part_name(d) for d in rng.sample(candidates, ndeps)]
+        parts[part_name(i)] = data
+
+    return {"parts": parts}
+
+
+_GENERATORS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "chain": chain,
+    "fan": fan,
+    "diamond": diamond,
+    "random": random_dag,
+}
+
+
+def generate(shape: str, count: int, *, seed: int = 0) -> Dict[str, Any]:
+    """Generate a parts definition with the given shape and number of parts."""
+
+    return _GENERATORS[shape](count, seed=seed)
+
+
+def populate_state(
+    parts: Dict[str, Any], *, work_dir: str, steps: List[Step] = STEPS
+) -> None:
+    """Create state files for the given steps of every part.
+
+    State files are created in lifecycle order, so timestamps are
+    consistent with a previous successful run.
+    """
+
+    for step in steps:
+        for name in parts.get("parts", {}):
+            state_dir = os.path.join(work_dir, "parts", name, "state")
+            os.makedirs(state_dir, exist_ok=True)
+            Path(state_dir, step.name.lower()).touch()
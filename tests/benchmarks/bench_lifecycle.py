@@ -0,0 +1,190 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Lifecycle benchmarks on synthetic part graphs.
+
+Measure the construction of a LifecycleManager, the computation of actions
+for each step (with and without the plan cache), and the execution of the
+actions to prime. Results are written as JSON lines, one record per
+measurement, so they can be appended to a file and compared between commits:
+
+    python3 -m tests.benchmarks.bench_lifecycle --shapes chain random \\
+        --sizes 1000 10000 --output bench_output.txt
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import partbuilder
+from partbuilder._step import STEPS, Step
+from tests.benchmarks import _graphs
+
+_STATES = {
+    "none": [],
+    "pull": STEPS[:1],
+    "build": STEPS[:2],
+    "stage": STEPS[:3],
+    "prime": STEPS,
+}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.decode().strip()
+
+
+def _measure(
+    func: Callable[[Any], Any], *, setup: Callable[[], Any], repeat: int
+) -> List[float]:
+    """Run func(setup()) repeat times, timing only the call to func."""
+
+    timings = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+class _Project:
+    def __init__(self, parts: Dict[str, Any], *, state: str, base_dir: str):
+        self.parts = parts
+        self.state = state
+        self.work_dir = tempfile.mkdtemp(dir=base_dir)
+
+    def reset(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        _graphs.populate_state(
+            self.parts, work_dir=self.work_dir, steps=_STATES[self.state]
+        )
+
+    def manager(self, *, use_plan_cache: bool = False) -> partbuilder.LifecycleManager:
+        return partbuilder.LifecycleManager(
+            parts=self.parts, work_dir=self.work_dir, use_plan_cache=use_plan_cache
+        )
+
+
+def run_benchmarks(
+    *, shape: str, size: int, state: str, repeat: int, seed: int, base_dir: str
+) -> Iterator[Dict[str, Any]]:
+    parts = _graphs.generate(shape, size, seed=seed)
+    project = _Project(parts, state=state, base_dir=base_dir)
+    project.reset()
+
+    def record(benchmark: str, timings: List[float], **extra) -> Dict[str, Any]:
+        rec = {
+            "benchmark": benchmark,
+            "shape": shape,
+            "parts": size,
+            "state": state,
+            "repeat": repeat,
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "max": max(timings),
+        }
+        rec.update(extra)
+        return rec
+
+    timings = _measure(lambda _: project.manager(), setup=lambda: None, repeat=repeat)
+    yield record("construct", timings)
+
+    for step in STEPS:
+        timings = _measure(
+            lambda lf: lf.actions(step), setup=project.manager, repeat=repeat
+        )
+        yield record("actions", timings, step=step.name.lower())
+
+        cached = lambda: project.manager(use_plan_cache=True)  # noqa: E731
+        cached().actions(step)
+        timings = _measure(lambda lf: lf.actions(step), setup=cached, repeat=repeat)
+        yield record("actions-cached", timings, step=step.name.lower())
+
+    def execute_setup():
+        project.reset()
+        lf = project.manager()
+        return lf, lf.actions(Step.PRIME)
+
+    timings = _measure(
+        lambda arg: arg[0].execute(arg[1]), setup=execute_setup, repeat=repeat
+    )
+    yield record("execute", timings, step="prime")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--shapes", nargs="+", choices=_graphs.SHAPES, default=_graphs.SHAPES
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument(
+        "--state",
+        choices=list(_STATES),
+        default="none",
+        help="the last step already run in the pre-populated work directory",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default="-", help="file to append results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    header = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+    }
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    base_dir = tempfile.mkdtemp(prefix="partbuilder-bench-")
+    try:
+        for shape in args.shapes:
+            for size in args.sizes:
+                for rec in run_benchmarks(
+                    shape=shape,
+                    size=size,
+                    state=args.state,
+                    repeat=args.repeat,
+                    seed=args.seed,
+                    base_dir=base_dir,
+                ):
+                    rec.update(header)
+                    print(json.dumps(rec, sort_keys=True), file=out, flush=True)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
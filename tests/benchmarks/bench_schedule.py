@@ -0,0 +1,166 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scheduling simulation on synthetic part graphs.
+
+Simulate the parallel execution of a fresh build to prime with a number of
+workers, and compare the makespan of critical-path scheduling against
+handing out ready actions in plan order (FIFO). Step durations are drawn at
+random, and the durations known to the scheduler deviate from the actual
+ones to model the noise of historical measurements:
+
+    python3 -m tests.benchmarks.bench_schedule --shapes random --sizes 1000 \\
+        --workers 4 16
+"""
+
+import argparse
+import heapq
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from partbuilder._durations import StepDurations, StepUsage
+from partbuilder._part import Part
+from partbuilder._scheduler import Scheduler
+from partbuilder._step import STEPS, PartAction, action_for_step, step_for_action
+from tests.benchmarks import _graphs
+from tests.benchmarks.bench_lifecycle import _git_revision
+
+
+def _fresh_plan(parts: List[Part]) -> List[PartAction]:
+    # Generated parts only depend on parts defined before them, so running
+    # each step for all parts in definition order is a valid plan.
+    return [PartAction(p.name, action_for_step(step)) for step in STEPS for p in parts]
+
+
+def simulate(scheduler: Scheduler, duration: Dict[Any, float], workers: int) -> float:
+    """Return the time to run all actions with the given number of workers."""
+
+    now = 0.0
+    running = []  # type: List[Any]
+    while not scheduler.finished:
+        while len(running) < workers:
+            act = scheduler.pop()
+            if act is None:
+                break
+            end = now + duration[act.part_name, step_for_action(act.action)]
+            heapq.heappush(running, (end, id(act), act))
+
+        now, _, act = heapq.heappop(running)
+        scheduler.done(act)
+
+    return now
+
+
+def run_benchmarks(
+    *,
+    shape: str,
+    size: int,
+    workers: List[int],
+    noise: float,
+    seed: int,
+    cache_dir: str,
+) -> Iterator[Dict[str, Any]]:
+    data = _graphs.generate(shape, size, seed=seed)
+    parts = [Part(name, p) for name, p in data["parts"].items()]
+    plan = _fresh_plan(parts)
+
+    # a few parts are much slower than the others, as in real projects
+    rng = random.Random(seed)
+    duration = {
+        (p.name, step): rng.lognormvariate(0, 1.5) for p in parts for step in STEPS
+    }
+    history = StepDurations(os.path.join(cache_dir, "history"))
+    actual = StepDurations(os.path.join(cache_dir, "actual"))
+    for (name, step), seconds in duration.items():
+        action = action_for_step(step)
+        noisy = seconds * rng.lognormvariate(0, noise)
+        history.record(name, action, StepUsage(wall=noisy, cpu=noisy))
+        actual.record(name, action, StepUsage(wall=seconds, cpu=seconds))
+
+    # no schedule is shorter than the critical path or than the total work
+    # evenly split between workers
+    critical_path = Scheduler(plan, parts, durations=actual)
+    longest_path = max(critical_path.priority(a) for a in plan)
+    total = sum(duration.values())
+    for count in workers:
+        fifo = simulate(Scheduler(plan, parts, critical_path=False), duration, count)
+        critical = simulate(Scheduler(plan, parts, durations=history), duration, count)
+        yield {
+            "benchmark": "schedule",
+            "shape": shape,
+            "parts": size,
+            "workers": count,
+            "noise": noise,
+            "fifo": fifo,
+            "critical-path": critical,
+            "speedup": fifo / critical,
+            "lower-bound": max(longest_path, total / count),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--shapes", nargs="+", choices=_graphs.SHAPES, default=_graphs.SHAPES
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--workers", nargs="+", type=int, default=[2, 8, 32])
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0.3,
+        help="deviation of the historical durations from the actual ones",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default="-", help="file to append results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    header = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+    }
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    try:
+        with tempfile.TemporaryDirectory(prefix="partbuilder-bench-") as cache_dir:
+            for shape in args.shapes:
+                for size in args.sizes:
+                    for rec in run_benchmarks(
+                        shape=shape,
+                        size=size,
+                        workers=args.workers,
+                        noise=args.noise,
+                        seed=args.seed,
+                        cache_dir=cache_dir,
+                    ):
+                        rec.update(header)
+                        print(json.dumps(rec, sort_keys=True), file=out, flush=True)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
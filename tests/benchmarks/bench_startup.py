@@ -0,0 +1,150 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Startup benchmarks with a growing number of local plugins.
+
+Each measurement runs in a fresh interpreter and records the time to import
+partbuilder, to create a LifecycleManager, to list the available plugins and
+to load a single local plugin. Results are written as JSON lines:
+
+    python3 -m tests.benchmarks.bench_startup --plugins 0 100 1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from typing import Any, Dict, List, Optional
+
+from tests.benchmarks.bench_lifecycle import _git_revision
+
+_PLUGIN = textwrap.dedent(
+    """\
+    from partbuilder.plugins import Plugin
+
+    class Plugin{index}(Plugin):
+        def get_build_commands(self):
+            return ["echo {index}"]
+    """
+)
+
+_PROBE = textwrap.dedent(
+    """\
+    import json, sys, time
+
+    t0 = time.perf_counter()
+    import partbuilder
+    t1 = time.perf_counter()
+    lf = partbuilder.LifecycleManager(
+        parts={"parts": {"p": {"plugin": "plugin-0"}}}, local_plugins_dir=sys.argv[1]
+    )
+    t2 = time.perf_counter()
+    from partbuilder import plugins
+    names = plugins.available_plugins(local_plugins_dir=sys.argv[1])
+    t3 = time.perf_counter()
+    if len(names) > 2:
+        plugins.get_plugin_class("plugin-0", local_plugins_dir=sys.argv[1])
+    t4 = time.perf_counter()
+    print(json.dumps({
+        "import": t1 - t0,
+        "construct": t2 - t1,
+        "discover": t3 - t2,
+        "load": t4 - t3,
+        "modules": len(sys.modules),
+    }))
+    """
+)
+
+
+def _create_plugins(path: str, count: int) -> None:
+    os.makedirs(path, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(path, f"plugin_{i}.py"), "w") as f:
+            f.write(_PLUGIN.format(index=i))
+
+
+def _probe(plugins_dir: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, plugins_dir],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    result = json.loads(out.stdout.decode())
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def run_benchmarks(*, count: int, repeat: int, base_dir: str) -> List[Dict[str, Any]]:
+    plugins_dir = os.path.join(base_dir, f"plugins-{count}")
+    _create_plugins(plugins_dir, count)
+
+    probes = [_probe(plugins_dir) for _ in range(repeat)]
+    records = []
+    for name in ["import", "construct", "discover", "load", "process"]:
+        timings = [p[name] for p in probes]
+        records.append(
+            {
+                "benchmark": f"startup-{name}",
+                "plugins": count,
+                "repeat": repeat,
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "max": max(timings),
+                "modules": probes[0]["modules"],
+            }
+        )
+    return records
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plugins", nargs="+", type=int, default=[0, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--output", default="-", help="file to append results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    header = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+    }
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    base_dir = tempfile.mkdtemp(prefix="partbuilder-bench-")
+    try:
+        for count in args.plugins:
+            records = run_benchmarks(count=count, repeat=args.repeat, base_dir=base_dir)
+            for rec in records:
+                rec.update(header)
+                print(json.dumps(rec, sort_keys=True), file=out, flush=True)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder import _callbacks
+from partbuilder._step import Step
+from tests import unit
+
+
+class TestStepCallbacks(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_callbacks.pre_step.clear)
+        self.addCleanup(_callbacks.post_step.clear)
+        self.lf = partbuilder.LifecycleManager(
+            parts={"parts": {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil"}}}
+        )
+
+    def test_no_callbacks(self):
+        self.assertThat(_callbacks.pre_step.dispatch[Step.PULL], Equals(()))
+        self.lf.execute(self.lf.actions(Step.PRIME))
+
+    def test_pre_and_post_callbacks(self):
+        calls = []
+
+        def pre(info):
+            calls.append(("pre", info.part_name, info.step))
+
+        def post(info):
+            calls.append(("post", info.part_name, info.step))
+
+        partbuilder.register_pre_step_callback(pre, [Step.BUILD])
+        partbuilder.register_post_step_callback(post, [Step.BUILD, Step.STAGE])
+        self.lf.execute(self.lf.actions(Step.STAGE, ["foo"]))
+
+        self.assertThat(
+            calls,
+            Equals(
+                [
+                    ("pre", "foo", Step.BUILD),
+                    ("post", "foo", Step.BUILD),
+                    ("post", "foo", Step.STAGE),
+                ]
+            ),
+        )
+
+    def test_callbacks_not_called_for_skipped_steps(self):
+        calls = []
+        self.lf.execute(self.lf.actions(Step.PULL))
+
+        partbuilder.register_pre_step_callback(calls.append, [Step.PULL])
+        lf = partbuilder.LifecycleManager(
+            parts={"parts": {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil"}}}
+        )
+        lf.execute(lf.actions(Step.PULL))
+        self.assertThat(calls, Equals([]))
+
+    def test_step_info_is_not_shared(self):
+        infos = []
+        partbuilder.register_pre_step_callback(infos.append, [Step.PULL])
+        self.lf.execute(self.lf.actions(Step.PULL))
+
+        self.assertThat([i.part_name for i in infos], Equals(["bar", "foo"]))
+        self.assertThat(infos[0].work_dir, Equals(infos[1].work_dir))
+
+    def test_async_post_callback(self):
+        calls = []
+
+        async def upload(info):
+            await asyncio.sleep(0.01)
+            calls.append(info.part_name)
+
+        partbuilder.register_post_step_callback(upload, [Step.PRIME])
+        self.lf.execute(self.lf.actions(Step.PRIME))
+
+        # all pending callbacks are finished when execute returns
+        self.assertThat(sorted(calls), Equals(["bar", "foo"]))
+
+    def test_async_callback_error(self):
+        async def fail(info):
+            raise RuntimeError("upload failed")
+
+        partbuilder.register_post_step_callback(fail, [Step.PULL])
+        self.assertRaises(
+            RuntimeError, self.lf.execute, self.lf.actions(Step.PULL, ["foo"])
+        )
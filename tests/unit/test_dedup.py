@@ -0,0 +1,132 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import fcntl
+import os
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder import _dedup
+from partbuilder._step import Step
+from partbuilder.utils import file_utils
+from tests import unit
+
+_LICENSE = "license text\n" * 100
+
+
+def _write(path, content, mode=0o644):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Path(path).write_text(content)
+    os.chmod(path, mode)
+
+
+def _same_file(a, b):
+    return os.stat(a).st_ino == os.stat(b).st_ino
+
+
+class TestDeduplicate(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        _write("stage/foo/LICENSE", _LICENSE)
+        _write("stage/bar/LICENSE", _LICENSE)
+        _write("prime/bar/LICENSE", _LICENSE)
+        _write("stage/bar/NOTICE", _LICENSE.upper())
+
+    def dedup(self):
+        return _dedup.deduplicate(["stage", "prime"], cache_dir="cache", workers=2)
+
+    def test_identical_files_are_linked(self):
+        result = self.dedup()
+        self.assertThat(result.linked, Equals(2))
+        self.assertThat(result.saved, Equals(2 * len(_LICENSE)))
+        self.assertTrue(_same_file("stage/foo/LICENSE", "stage/bar/LICENSE"))
+        self.assertTrue(_same_file("stage/foo/LICENSE", "prime/bar/LICENSE"))
+        self.assertFalse(_same_file("stage/foo/LICENSE", "stage/bar/NOTICE"))
+        self.assertThat(Path("prime/bar/LICENSE").read_text(), Equals(_LICENSE))
+
+    def test_different_permissions_are_kept(self):
+        os.chmod("stage/bar/LICENSE", 0o755)
+        self.dedup()
+        self.assertFalse(_same_file("stage/foo/LICENSE", "stage/bar/LICENSE"))
+        self.assertThat(os.stat("stage/bar/LICENSE").st_mode & 0o777, Equals(0o755))
+
+    def test_only_same_size_files_are_hashed(self):
+        hashed = []
+        calculate_hash = file_utils.calculate_hash
+
+        def fake_calculate_hash(path, *, algorithm):
+            hashed.append(path)
+            return calculate_hash(path, algorithm=algorithm)
+
+        self.useFixture(
+            fixtures.MonkeyPatch(
+                "partbuilder.utils.file_utils.calculate_hash", fake_calculate_hash
+            )
+        )
+        _write("stage/baz/LICENSE", _LICENSE + "more")
+        self.dedup()
+        self.assertThat(len(hashed), Equals(4))
+
+        # hashes of unchanged files are cached
+        hashed.clear()
+        _write("prime/baz/LICENSE", _LICENSE)
+        self.dedup()
+        self.assertThat(hashed, Equals(["prime/baz/LICENSE"]))
+
+    def test_nothing_to_link(self):
+        result = _dedup.deduplicate(["stage/foo"], cache_dir="cache")
+        self.assertThat(result, Equals(_dedup.DedupResult(0, 0)))
+
+
+class TestExecuteDedup(unit.TestCase):
+    def test_dedup_after_stage(self):
+        _write("stage/foo/LICENSE", _LICENSE)
+        _write("stage/bar/LICENSE", _LICENSE)
+
+        parts = {"parts": {"foo": {"plugin": "nil"}}}
+        lf = partbuilder.LifecycleManager(parts=parts, dedup=True)
+        lf.execute(lf.actions(Step.STAGE))
+        self.assertTrue(_same_file("stage/foo/LICENSE", "stage/bar/LICENSE"))
+
+    def test_disabled_by_default(self):
+        _write("stage/foo/LICENSE", _LICENSE)
+        _write("stage/bar/LICENSE", _LICENSE)
+
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+        lf.execute(lf.actions(Step.STAGE))
+        self.assertFalse(_same_file("stage/foo/LICENSE", "stage/bar/LICENSE"))
+
+    def test_stage_prime_locked(self):
+        def deduplicate(roots, **kwargs):
+            path = os.path.join("parts", ".cache", "locks", "stage-prime.lock")
+            with open(path) as f:
+                self.assertRaises(
+                    BlockingIOError, fcntl.flock, f, fcntl.LOCK_EX | fcntl.LOCK_NB
+                )
+            calls.append(roots)
+
+        calls = []
+        self.useFixture(
+            fixtures.MonkeyPatch("partbuilder._dedup.deduplicate", deduplicate)
+        )
+        lf = partbuilder.LifecycleManager(
+            parts={"parts": {"foo": {"plugin": "nil"}}}, dedup=True
+        )
+        lf.execute(lf.actions(Step.STAGE))
+        self.assertThat(len(calls), Equals(1))
@@ -0,0 +1,190 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import socket
+import threading
+
+import fixtures
+from testtools.matchers import Contains, Equals
+
+import partbuilder
+from partbuilder import errors
+from partbuilder._step import Action, Step
+from partbuilder.distributed import Coordinator, Job, SocketTransport, run_worker
+from partbuilder.distributed._job import JobResult
+from partbuilder.distributed._transport import (
+    Transport,
+    TransportEvent,
+    receive_message,
+)
+from tests import unit
+
+_PARTS = {
+    "parts": {
+        "foo": {"plugin": "nil"},
+        "bar": {"plugin": "nil", "after": ["foo"]},
+        "baz": {"plugin": "nil"},
+    }
+}
+
+
+class TestDistributedExecution(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.transport = SocketTransport(os.path.join(self.path, "coordinator.sock"))
+        self.addCleanup(self.transport.close)
+        self.coordinator = Coordinator(self.transport, worker_timeout=5)
+
+    def start_worker(self, name):
+        thread = threading.Thread(
+            target=run_worker,
+            args=(self.transport.address,),
+            kwargs={"work_dir": os.path.join(self.path, name)},
+            daemon=True,
+        )
+        thread.start()
+
+    def test_job_serialization(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS, custom="value")
+        part = lf._parts[0]
+        act = lf.actions(Step.PULL, [part.name])[0]
+        job = Job.for_action(1, act, part=part, step_info=lf._step_info)
+
+        self.assertThat(Job.from_json(job.to_json()), Equals(job))
+        self.assertThat(job.step_info["custom"], Equals("value"))
+
+    def test_execute_on_workers(self):
+        for name in ["worker-a", "worker-b"]:
+            self.start_worker(name)
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.execute(lf.actions(Step.PRIME), coordinator=self.coordinator)
+
+        # state returned by the workers is saved in the coordinator work dir
+        for name in ["foo", "bar", "baz"]:
+            self.assertThat(
+                sorted(os.listdir(os.path.join("parts", name, "state"))),
+                Equals(["build", "prime", "pull", "stage"]),
+            )
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS, use_plan_cache=False)
+        actions = lf.actions(Step.PRIME)
+        self.assertTrue(all(a.action >= Action.SKIP_PULL for a in actions))
+
+    def test_lost_worker(self):
+        # a worker that disappears after receiving its first job, replaced
+        # by a working one
+        def flaky_worker():
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.connect(self.transport.address)
+                receive_message(sock)
+                self.start_worker("worker-a")
+
+        threading.Thread(target=flaky_worker, daemon=True).start()
+        logger = self.useFixture(fixtures.FakeLogger())
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.execute(lf.actions(Step.BUILD, ["foo"]), coordinator=self.coordinator)
+        self.assertTrue(os.path.exists("parts/foo/state/build"))
+        self.assertThat(
+            logger.output,
+            Contains("Lost worker-1 running foo:Action.PULL, rescheduling."),
+        )
+
+    def test_job_failure(self):
+        self.start_worker("worker-a")
+        parts = {"parts": {"foo": {"plugin": "missing"}}}
+        lf = partbuilder.LifecycleManager(parts=parts, validate=False)
+
+        raised = self.assertRaises(
+            errors.PartbuilderJobFailed,
+            lf.execute,
+            lf.actions(Step.PULL),
+            coordinator=self.coordinator,
+        )
+        self.assertThat(raised.get_details(), Equals('Plugin "missing" was not found.'))
+
+    def test_job_failure_keep_going(self):
+        self.start_worker("worker-a")
+        parts = {
+            "parts": {
+                "foo": {"plugin": "missing"},
+                "bar": {"plugin": "nil", "after": ["foo"]},
+                "baz": {"plugin": "nil"},
+            }
+        }
+        lf = partbuilder.LifecycleManager(parts=parts, validate=False)
+        result = lf.execute(
+            lf.actions(Step.BUILD), coordinator=self.coordinator, keep_going=True
+        )
+
+        self.assertThat(
+            [(f.action.part_name, f.action.action) for f in result.failed],
+            Equals([("foo", Action.PULL)]),
+        )
+        self.assertThat({a.part_name for a in result.skipped}, Equals({"foo", "bar"}))
+        self.assertTrue(os.path.exists("parts/baz/state/build"))
+        self.assertFalse(os.path.exists("parts/foo/state/pull"))
+
+
+class _FakeTransport(Transport):
+    """Workers failing the first send, then answering every job at once."""
+
+    def __init__(self):
+        self.sent = []
+        self._events = [
+            TransportEvent("joined", "worker-1"),
+            TransportEvent("joined", "worker-2"),
+            # a late result from a worker already lost
+            TransportEvent("result", "worker-0", JobResult(99, True)),
+        ]
+        self._failed = False
+
+    def send(self, worker, job):
+        if not self._failed:
+            self._failed = True
+            raise ConnectionError()
+        self.sent.append(worker)
+        self._events.append(
+            TransportEvent("result", worker, JobResult(job.job_id, True))
+        )
+
+    def poll(self, timeout):
+        events, self._events = self._events, []
+        return events
+
+    def close(self):
+        pass
+
+
+class TestCoordinator(unit.TestCase):
+    def test_resend_and_stale_result(self):
+        transport = _FakeTransport()
+        logger = self.useFixture(fixtures.FakeLogger())
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PULL, ["foo"])
+        started = []
+
+        Coordinator(transport, worker_timeout=5).execute(
+            actions, parts=lf._parts, step_info=lf._step_info, on_start=started.append
+        )
+
+        self.assertThat(transport.sent, Equals(["worker-1"]))
+        self.assertThat(started, Equals(actions))
+        self.assertThat(
+            logger.output, Contains("Ignoring result of job 99 from worker-0.")
+        )
@@ -0,0 +1,168 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import struct
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder import _elf
+from partbuilder._part import Part
+from partbuilder._step import Step
+from partbuilder.sequencer.states import load_state
+from tests import unit
+
+
+def _make_elf(path, *, needed=(), rpath=None, runpath=None, is64=True, end="<"):
+    """Write a minimal shared object with a dynamic section."""
+    tags = [(1, name) for name in needed]
+    if rpath:
+        tags.append((15, rpath))
+    if runpath:
+        tags.append((29, runpath))
+
+    strtab = b"\0"
+    dynamic = []
+    for tag, value in tags:
+        dynamic.append((tag, len(strtab)))
+        strtab += value.encode() + b"\0"
+
+    if is64:
+        ehdr, phdr, dyn = struct.Struct(end + "16xHHIQQQIHHHHHH"), "IIQQQQQQ", "qQ"
+    else:
+        ehdr, phdr, dyn = struct.Struct(end + "16xHHIIIIIHHHHHH"), "IIIIIIII", "iI"
+    phdr_size = struct.calcsize(end + phdr)
+    strtab_offset = ehdr.size + 2 * phdr_size
+    dyn_offset = strtab_offset + len(strtab)
+    dynamic += [(5, strtab_offset), (0, 0)]
+    dyn_data = b"".join(struct.pack(end + dyn, t, v) for t, v in dynamic)
+    total = dyn_offset + len(dyn_data)
+
+    header = bytearray(
+        ehdr.pack(3, 62, 1, 0, ehdr.size, 0, 0, ehdr.size, phdr_size, 2, 0, 0, 0)
+    )
+    header[:6] = b"\x7fELF" + bytes([2 if is64 else 1, 1 if end == "<" else 2])
+    if is64:
+        load = (1, 5, 0, 0, 0, total, total, 0x1000)
+        dyn_segment = (2, 6, dyn_offset, dyn_offset, 0, len(dyn_data), 0, 8)
+    else:
+        load = (1, 0, 0, 0, total, total, 5, 0x1000)
+        dyn_segment = (2, dyn_offset, dyn_offset, 0, len(dyn_data), 0, 6, 4)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Path(path).write_bytes(
+        bytes(header)
+        + struct.pack(end + phdr, *load)
+        + struct.pack(end + phdr, *dyn_segment)
+        + strtab
+        + dyn_data
+    )
+
+
+class TestReadElf(unit.TestCase):
+    def test_64_bit_little_endian(self):
+        _make_elf(
+            "x/app", needed=["libfoo.so.1", "libc.so.6"], runpath="$ORIGIN/../lib"
+        )
+        elf = _elf.read_elf("x/app")
+        self.assertThat(elf.needed, Equals(("libfoo.so.1", "libc.so.6")))
+        self.assertThat(elf.runpath, Equals(("$ORIGIN/../lib",)))
+        self.assertThat(elf.rpath, Equals(()))
+
+    def test_32_bit_big_endian(self):
+        _make_elf("x/app", needed=["libfoo.so.1"], rpath="/a:/b", is64=False, end=">")
+        elf = _elf.read_elf("x/app")
+        self.assertThat(elf.needed, Equals(("libfoo.so.1",)))
+        self.assertThat(elf.rpath, Equals(("/a", "/b")))
+
+    def test_not_elf(self):
+        Path("script").write_text("#!/bin/sh\n")
+        self.assertIsNone(_elf.read_elf("script"))
+
+    def test_truncated(self):
+        Path("broken").write_bytes(b"\x7fELF\x02\x01" + b"\0" * 10)
+        self.assertIsNone(_elf.read_elf("broken"))
+
+
+class TestScanElfFiles(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        _make_elf("root/bin/app", needed=["libfoo.so.1", "libc.so.6"])
+        _make_elf("root/lib/libfoo.so.1.0", needed=["libbar.so"])
+        os.symlink("libfoo.so.1.0", "root/lib/libfoo.so.1")
+        _make_elf("root/opt/lib/libbar.so")
+        Path("root/README").write_text("hello")
+        self.files = [
+            "README",
+            "bin/app",
+            "lib/libfoo.so.1",
+            "lib/libfoo.so.1.0",
+            "opt/lib/libbar.so",
+        ]
+
+    def scan(self):
+        return _elf.scan_elf_files("root", self.files, cache_dir="cache", workers=2)
+
+    def test_scan(self):
+        elf_files = self.scan()
+        self.assertThat(
+            sorted(elf_files),
+            Equals(["bin/app", "lib/libfoo.so.1.0", "opt/lib/libbar.so"]),
+        )
+        paths = _elf.dependency_paths(self.files, elf_files)
+        self.assertThat(paths, Equals({"lib", "opt/lib"}))
+
+    def test_runpath_takes_precedence(self):
+        _make_elf("root/other/libfoo.so.1")
+        _make_elf("root/bin/app", needed=["libfoo.so.1"], runpath="$ORIGIN/../other")
+        self.files.append("other/libfoo.so.1")
+        paths = _elf.dependency_paths(self.files, self.scan())
+        self.assertThat(paths, Equals({"other", "opt/lib"}))
+
+    def test_unchanged_files_are_not_read_again(self):
+        self.scan()
+
+        read = []
+        read_elf = _elf.read_elf
+
+        def fake_read_elf(path):
+            read.append(path)
+            return read_elf(path)
+
+        self.useFixture(
+            fixtures.MonkeyPatch("partbuilder._elf.read_elf", fake_read_elf)
+        )
+        _make_elf("root/bin/app", needed=["libc.so.6"])
+        os.utime("root/bin/app", ns=(0, 0))
+        elf_files = self.scan()
+        self.assertThat(read, Equals(["root/bin/app"]))
+        self.assertThat(elf_files["bin/app"].needed, Equals(("libc.so.6",)))
+
+
+class TestPrimeDependencyPaths(unit.TestCase):
+    def test_prime_records_dependency_paths(self):
+        _make_elf("parts/foo/install/bin/app", needed=["libfoo.so.1"])
+        _make_elf("parts/foo/install/usr/lib/libfoo.so.1")
+
+        data = {"plugin": "nil"}
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": data}})
+        lf.execute(lf.actions(Step.PRIME))
+
+        state = load_state(Part("foo", data), Step.PRIME)
+        self.assertThat(state.dependency_paths, Equals(["usr/lib"]))
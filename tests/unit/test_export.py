@@ -0,0 +1,101 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import tarfile
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Contains, Equals, GreaterThan, Not
+
+import partbuilder
+from partbuilder import _export
+from partbuilder._step import Step
+from tests import unit
+
+
+class TestExportPrime(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.useFixture(fixtures.MonkeyPatch("partbuilder._export._CHUNK_SIZE", 4096))
+
+        for name, files in (("foo", ["bin/foo", "README"]), ("bar", ["lib/bar"])):
+            for i, path in enumerate(files):
+                path = os.path.join("parts", name, "install", path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                Path(path).write_bytes(bytes([i]) * (5000 * (i + 1)))
+
+        parts = {"parts": {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil"}}}
+        self.lf = partbuilder.LifecycleManager(parts=parts, parallel_build_count=2)
+        self.lf.execute(self.lf.actions(Step.PRIME))
+
+    def test_archive(self):
+        self.lf.export_prime("prime.tar.gz")
+        with tarfile.open("prime.tar.gz") as tar:
+            names = tar.getnames()
+            content = tar.extractfile("lib/bar").read()
+        self.assertThat(
+            sorted(names), Equals(["README", "bin", "bin/foo", "lib", "lib/bar"])
+        )
+        self.assertThat(content, Equals(Path("parts/bar/install/lib/bar").read_bytes()))
+
+        with open("prime.tar.gz" + _export.INDEX_SUFFIX) as f:
+            index = json.load(f)
+        self.assertThat(len(index["members"]), GreaterThan(2))
+
+    def test_read_file_with_index(self):
+        self.lf.export_prime("prime.tar.gz")
+        for path in ("README", "bin/foo", "lib/bar"):
+            self.assertThat(
+                _export.read_file("prime.tar.gz", path),
+                Equals(self._installed(path).read_bytes()),
+            )
+
+    def test_hard_links(self):
+        os.unlink("parts/foo/install/README")
+        os.link("parts/foo/install/bin/foo", "parts/foo/install/README")
+        self.lf.export_prime("prime.tar.gz", reproducible=True)
+        with tarfile.open("prime.tar.gz") as tar:
+            self.assertTrue(tar.getmember("bin/foo").islnk())
+        self.assertThat(
+            _export.read_file("prime.tar.gz", "bin/foo"),
+            Equals(Path("parts/foo/install/README").read_bytes()),
+        )
+
+    def test_reproducible(self):
+        self.useFixture(fixtures.EnvironmentVariable("SOURCE_DATE_EPOCH", "1000"))
+        self.lf.export_prime("first.tar.gz", reproducible=True)
+        os.utime("parts/bar/install/lib/bar", (5, 5))
+        self.lf.export_prime("second.tar.gz", reproducible=True)
+
+        first = Path("first.tar.gz").read_bytes()
+        self.assertThat(first, Equals(Path("second.tar.gz").read_bytes()))
+        with tarfile.open("first.tar.gz") as tar:
+            self.assertThat(tar.getnames()[0], Equals("README"))
+            self.assertThat(tar.getmember("lib/bar").mtime, Equals(1000))
+
+    def test_partial_archive_removed_on_error(self):
+        os.unlink("parts/bar/install/lib/bar")
+        self.assertRaises(
+            FileNotFoundError, self.lf.export_prime, "prime.tar.gz", reproducible=True
+        )
+        self.assertThat(os.listdir("."), Not(Contains("prime.tar.gz.partial")))
+        self.assertFalse(os.path.exists("prime.tar.gz"))
+
+    def _installed(self, path):
+        part = "bar" if path.startswith("lib/") else "foo"
+        return Path("parts", part, "install", path)
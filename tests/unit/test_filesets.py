@@ -0,0 +1,162 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder import _filesets, errors
+from partbuilder._part import Part
+from partbuilder._step import Step
+from partbuilder.sequencer.state_manager import StateManager
+from tests import unit
+
+_TREE = [
+    "bin/hello",
+    "lib/libhello.so",
+    "lib/libhello.a",
+    "share/doc/hello/README",
+    "share/man/man1/hello.1",
+]
+
+
+class TestFilesetMatcher(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        for path in _TREE:
+            os.makedirs(os.path.dirname(os.path.join("root", path)), exist_ok=True)
+            Path("root", path).touch()
+
+    def walk(self, *patterns):
+        return _filesets.compile_fileset(patterns).walk("root")
+
+    def test_everything(self):
+        files, dirs = self.walk("*")
+        self.assertThat(files, Equals(sorted(_TREE)))
+        self.assertThat(len(dirs), Equals(7))
+
+    def test_include_and_exclude(self):
+        files, dirs = self.walk("bin", "lib/*.so", "share", "-share/doc")
+        self.assertThat(
+            files, Equals(["bin/hello", "lib/libhello.so", "share/man/man1/hello.1"])
+        )
+        self.assertThat(
+            dirs, Equals(["bin", "lib", "share", "share/man", "share/man/man1"])
+        )
+
+    def test_wildcards_dont_match_slashes(self):
+        files, _ = self.walk("*/hello", "share/*/hello.1")
+        self.assertThat(files, Equals(["bin/hello"]))
+
+    def test_negated_class_doesnt_match_slashes(self):
+        files, _ = self.walk("lib[!.]libhello.so", "bin[!]]hello")
+        self.assertThat(files, Equals([]))
+        files, _ = self.walk("lib/libhello.[!a]*")
+        self.assertThat(files, Equals(["lib/libhello.so"]))
+
+    def test_only_excludes(self):
+        files, _ = self.walk("-share", "-lib/*.a")
+        self.assertThat(files, Equals(["bin/hello", "lib/libhello.so"]))
+
+    def test_excluded_subtrees_are_not_visited(self):
+        visited = []
+        scandir = os.scandir
+
+        def fake_scandir(path):
+            visited.append(os.path.relpath(path, "root"))
+            return scandir(path)
+
+        self.useFixture(fixtures.MonkeyPatch("os.scandir", fake_scandir))
+        self.walk("share/man", "-share/man/man1")
+        self.assertThat(sorted(visited), Equals([".", "share", "share/man"]))
+
+    def test_filter(self):
+        matcher = _filesets.compile_fileset(("lib", "-lib/*.a"))
+        files, dirs = matcher.filter(_TREE, ["bin", "lib", "share"])
+        self.assertThat(files, Equals(["lib/libhello.so"]))
+        self.assertThat(dirs, Equals(["lib"]))
+
+    def test_compiled_matchers_are_cached(self):
+        self.assertIs(
+            _filesets.compile_fileset(("bin", "-lib")),
+            _filesets.compile_fileset(("bin", "-lib")),
+        )
+
+
+class TestExpandFilesets(unit.TestCase):
+    def test_expand(self):
+        patterns = _filesets.expand_filesets(
+            "foo", ["$binaries", "-share"], {"binaries": ["bin", "sbin"]}
+        )
+        self.assertThat(patterns, Equals(("bin", "sbin", "-share")))
+
+    def test_undefined_fileset(self):
+        raised = self.assertRaises(
+            errors.PartbuilderFilesetNotFound,
+            _filesets.expand_filesets,
+            "foo",
+            ["$missing"],
+            {},
+        )
+        self.assertThat(
+            str(raised), Equals('Part "foo" refers to undefined fileset "missing".')
+        )
+
+    def test_absolute_path(self):
+        self.assertRaises(
+            errors.PartbuilderInvalidFileset,
+            _filesets.expand_filesets,
+            "foo",
+            ["-/usr/share"],
+            {},
+        )
+
+
+class TestStageAndPrimeFilesets(unit.TestCase):
+    def test_stage_and_prime(self):
+        for path in _TREE:
+            path = os.path.join("parts/foo/install", path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            Path(path).touch()
+
+        data = {
+            "plugin": "nil",
+            "filesets": {"no-docs": ["-share/doc"]},
+            "stage": ["$no-docs"],
+            "prime": ["bin", "lib/*.so"],
+        }
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": data}})
+        lf.execute(lf.actions(Step.PRIME))
+
+        sm = StateManager([Part("foo", data)])
+        stage = sm.manifest(Part("foo", {}), Step.STAGE)
+        self.assertThat(
+            stage.files,
+            Equals(
+                [
+                    "bin/hello",
+                    "lib/libhello.a",
+                    "lib/libhello.so",
+                    "share/man/man1/hello.1",
+                ]
+            ),
+        )
+        prime = sm.manifest(Part("foo", {}), Step.PRIME)
+        self.assertThat(prime.files, Equals(["bin/hello", "lib/libhello.so"]))
+        self.assertThat(prime.directories, Equals(["bin", "lib"]))
@@ -0,0 +1,92 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+from typing import Dict
+
+from testtools.matchers import LessThan, Not, Contains
+
+import partbuilder
+from tests import unit
+
+# Import time budget in microseconds for the partbuilder modules loaded to
+# list steps and create a LifecycleManager. This is a few times the time
+# measured in a development machine, to accommodate slower test runners.
+_IMPORT_TIME_BUDGET = 100000
+
+# Modules that must only be loaded when planning or execution begins
+_DEFERRED_MODULES = [
+    "yaml",
+    "mypy_extensions",
+    "asyncio",
+    "partbuilder.sequencer",
+    "partbuilder.sequencer.states",
+    "partbuilder.executor",
+    "partbuilder.plugins",
+]
+
+_PROBE = """\
+import partbuilder
+partbuilder.Step.PRIME
+partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+"""
+
+
+def _run_python(*args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(partbuilder.__file__))
+    return subprocess.run(
+        [sys.executable, *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        check=True,
+    )
+
+
+def _import_times(stderr: str) -> Dict[str, int]:
+    """Parse the output of -X importtime, returning top-level cumulative times."""
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImport(unit.TestCase):
+    def test_deferred_modules(self):
+        probe = _PROBE + "import sys; print('\\n'.join(sys.modules))"
+        modules = _run_python("-c", probe).stdout.decode().splitlines()
+
+        for name in _DEFERRED_MODULES:
+            self.assertThat(modules, Not(Contains(name)))
+
+    def test_import_time_budget(self):
+        stderr = _run_python("-X", "importtime", "-c", _PROBE).stderr.decode()
+        times = _import_times(stderr)
+        total = sum(t for name, t in times.items() if name.startswith("partbuilder"))
+
+        self.assertThat(total, LessThan(_IMPORT_TIME_BUDGET))
+
+    def test_lazy_names(self):
+        self.assertThat(dir(partbuilder), Contains("LifecycleManager"))
+        self.assertRaises(AttributeError, getattr, partbuilder, "missing")
@@ -0,0 +1,160 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import fixtures
+from testtools.matchers import Contains, Equals, Not
+
+import partbuilder
+from partbuilder import _callbacks, _journal, _plan_cache, plugins
+from partbuilder._step import Action, PartAction, Step
+from partbuilder.plugins import _registry
+from partbuilder.plugins.nil import NilPlugin
+from tests import unit
+
+_PARTS = {
+    "parts": {
+        "foo": {"plugin": "crash"},
+        "bar": {"plugin": "nil", "after": ["foo"]},
+    }
+}
+
+# builds foo, leaving a partial result, and dies without cleaning up
+_CRASHING_RUN = textwrap.dedent(
+    """\
+    import os
+    import partbuilder
+    from partbuilder.plugins.nil import NilPlugin
+
+    class CrashPlugin(NilPlugin):
+        def get_build_commands(self):
+            open("parts/foo/state/build", "w").close()
+            os._exit(1)
+
+    partbuilder.register_plugin({{"crash": CrashPlugin}})
+    lf = partbuilder.LifecycleManager(parts={parts!r})
+    lf.execute(lf.actions(partbuilder.Step.PRIME))
+    """
+)
+
+
+class TestJournal(unit.TestCase):
+    def test_completed_run_is_removed(self):
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+        lf.execute(lf.actions(Step.PRIME))
+        self.assertThat(os.listdir("parts/.cache/journal"), Equals([]))
+
+    def test_unplanned_actions_not_recorded(self):
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+        lf.execute([PartAction("foo", Action.PULL)])
+        self.assertTrue(os.path.exists("parts/foo/state/pull"))
+        self.assertFalse(os.path.exists("parts/.cache/journal"))
+
+    def test_journal_bound_to_plan(self):
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+        pull = lf.actions(Step.PULL)
+        build = lf.actions(Step.BUILD)
+        self.assertThat(pull.journal_key, Not(Equals(build.journal_key)))
+
+        keys = []
+        journal_class = _journal.Journal
+
+        def journal(cache_dir, key):
+            keys.append(key)
+            return journal_class(cache_dir, key)
+
+        self.useFixture(fixtures.MonkeyPatch("partbuilder._journal.Journal", journal))
+        lf.execute(pull)
+        self.assertThat(keys, Equals([pull.journal_key]))
+
+    def test_interrupted_run(self):
+        act = [PartAction("foo", a) for a in [Action.PULL, Action.BUILD, Action.STAGE]]
+        journal = _journal.Journal(self.path, "key")
+        with journal:
+            journal.planned(act, complete=True)
+            journal.started(act[0])
+            journal.done(act[0])
+            journal.started(act[1])
+
+            # the journal of a run in progress is not loaded
+            self.assertThat(_journal.interrupted_run(self.path, "key"), Equals(None))
+
+            # simulate a crash, leaving the journal behind
+            journal._file.close()
+            journal._file = None
+
+        run = _journal.interrupted_run(self.path, "key")
+        self.assertTrue(run.complete)
+        self.assertThat(
+            [a.action for a in run.remaining], Equals([Action.BUILD, Action.STAGE])
+        )
+        self.assertThat([a.action for a in run.in_flight], Equals([Action.BUILD]))
+
+
+class TestResume(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_registry.clear_cache)
+        self.addCleanup(_registry._registered_plugins.clear)
+        plugins.register_plugin({"crash": NilPlugin})
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(partbuilder.__file__))
+        script = _CRASHING_RUN.format(parts=_PARTS)
+        subprocess.run([sys.executable, "-c", script], env=env)
+
+    def test_resume_interrupted_run(self):
+        logger = self.useFixture(fixtures.FakeLogger())
+
+        self.addCleanup(_callbacks.pre_step.clear)
+        built = []
+
+        def check_state(info):
+            if info.part_name == "foo":
+                built.append(os.path.exists("parts/foo/state/build"))
+
+        partbuilder.register_pre_step_callback(check_state, [Step.BUILD])
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PRIME)
+
+        # the remaining actions are not planned again
+        self.assertThat(lf._sequencer, Equals(None))
+        self.assertThat(
+            (actions[0].part_name, actions[0].action), Equals(("foo", Action.BUILD))
+        )
+
+        # the in-flight step is cleaned before it runs again
+        lf.execute(actions)
+        self.assertThat(built, Equals([False]))
+        self.assertThat(
+            logger.output, Contains("Clean foo:Action.BUILD, it was interrupted.")
+        )
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PRIME)
+        self.assertTrue(all(a.action >= Action.SKIP_PULL for a in actions))
+
+    def test_state_changed_since_interruption(self):
+        _plan_cache.bump_state_generation(os.path.join("parts", ".cache"))
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.actions(Step.PRIME)
+        self.assertThat(lf._sequencer, Not(Equals(None)))
@@ -0,0 +1,107 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import fixtures
+from testtools.matchers import Contains, Equals
+
+import partbuilder
+from partbuilder import plugins
+from partbuilder._part import Part
+from partbuilder._step import Action, Step
+from partbuilder.plugins import _registry
+from partbuilder.plugins.nil import NilPlugin
+from tests import unit
+
+
+class FailingPlugin(NilPlugin):
+    def get_build_commands(self):
+        raise RuntimeError("build failed")
+
+
+_PARTS = {
+    "parts": {
+        "foo": {"plugin": "failing"},
+        "bar": {"plugin": "nil", "after": ["foo"]},
+        "baz": {"plugin": "nil", "after": ["bar"]},
+        "qux": {"plugin": "nil"},
+    }
+}
+
+
+class TestKeepGoing(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_registry.clear_cache)
+        self.addCleanup(_registry._registered_plugins.clear)
+        plugins.register_plugin({"failing": FailingPlugin})
+        self.logger = self.useFixture(fixtures.FakeLogger())
+
+    def _execute(self, **kwargs):
+        lf = partbuilder.LifecycleManager(parts=_PARTS, **kwargs)
+        return lf.execute(lf.actions(Step.PRIME), keep_going=True)
+
+    def _assert_result(self, result):
+        self.assertFalse(result.success)
+        self.assertThat(
+            [(f.action.part_name, f.action.action) for f in result.failed],
+            Equals([("foo", Action.BUILD)]),
+        )
+        self.assertThat(str(result.failed[0].error), Equals("build failed"))
+
+        skipped = {(a.part_name, a.action) for a in result.skipped}
+        self.assertThat(skipped, Contains(("bar", Action.BUILD)))
+        self.assertThat(skipped, Contains(("baz", Action.PRIME)))
+        self.assertThat(skipped, Contains(("foo", Action.STAGE)))
+        self.assertThat(
+            {a.part_name for a in result.skipped}, Equals({"foo", "bar", "baz"})
+        )
+
+        succeeded = {(a.part_name, a.action) for a in result.succeeded}
+        self.assertThat(succeeded, Contains(("qux", Action.PRIME)))
+        self.assertThat(succeeded, Contains(("foo", Action.PULL)))
+
+        # only the state of the steps that succeeded is kept
+        self.assertTrue(self._has_state("foo", Step.PULL))
+        self.assertFalse(self._has_state("foo", Step.BUILD))
+        self.assertFalse(self._has_state("bar", Step.BUILD))
+        self.assertTrue(self._has_state("qux", Step.PRIME))
+
+        self.assertThat(
+            self.logger.output,
+            Contains("foo:Action.BUILD failed: build failed"),
+        )
+
+    def _has_state(self, part_name, step):
+        state_dir = Part(part_name, {}).part_state_dir
+        return os.path.exists(os.path.join(state_dir, step.name.lower()))
+
+    def test_keep_going(self):
+        self._assert_result(self._execute())
+
+    def test_keep_going_concurrently(self):
+        self._assert_result(self._execute(parallel_build_count=2))
+
+    def test_stop_on_error(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        self.assertRaises(RuntimeError, lf.execute, lf.actions(Step.PRIME))
+
+    def test_result_without_errors(self):
+        lf = partbuilder.LifecycleManager(parts={"parts": {"qux": {"plugin": "nil"}}})
+        result = lf.execute(lf.actions(Step.PRIME))
+        self.assertTrue(result.success)
+        self.assertThat(len(result.succeeded), Equals(4))
@@ -0,0 +1,121 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Equals, FileExists
+
+import partbuilder
+from partbuilder import errors, sources
+from partbuilder._step import Step
+from tests import unit
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Path(path).write_text(content)
+
+
+class TestLocalSource(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        _write("src/main.c", "int main() {}")
+        _write("src/include/main.h", "#pragma once")
+        os.symlink("main.c", "src/link.c")
+
+    def pull(self, workers=1):
+        source = sources.LocalSource("src", "dst", cache_dir="cache", workers=workers)
+        return source.pull()
+
+    def test_first_pull(self):
+        result = self.pull()
+        self.assertThat(result, Equals(sources.SyncResult(3, 0, 0)))
+        self.assertThat(Path("dst/include/main.h").read_text(), Equals("#pragma once"))
+        self.assertThat(os.readlink("dst/link.c"), Equals("main.c"))
+        # files are hard linked
+        self.assertThat(os.stat("dst/main.c").st_nlink, Equals(2))
+
+    def test_unchanged_pull(self):
+        self.pull()
+        self.assertThat(self.pull(), Equals(sources.SyncResult(0, 0, 3)))
+
+    def test_changes_and_deletions(self):
+        self.pull()
+        os.unlink("src/main.c")
+        _write("src/main.c", "int main() { return 1; }")
+        _write("src/new/file", "new")
+        os.unlink("src/include/main.h")
+        os.rmdir("src/include")
+
+        result = self.pull(workers=2)
+        self.assertThat(result, Equals(sources.SyncResult(2, 2, 1)))
+        self.assertThat(
+            Path("dst/main.c").read_text(), Equals("int main() { return 1; }")
+        )
+        self.assertThat("dst/new/file", FileExists())
+        self.assertFalse(os.path.exists("dst/include"))
+
+    def test_copies_compared_by_hash(self):
+        self.useFixture(fixtures.MonkeyPatch("os.link", self._no_link))
+        self.pull()
+        self.assertThat(os.stat("dst/main.c").st_nlink, Equals(1))
+
+        # same content, different timestamp
+        os.utime("src/main.c", (1000, 1000))
+        self.assertThat(self.pull(), Equals(sources.SyncResult(0, 0, 3)))
+        self.assertThat(os.stat("dst/main.c").st_mtime, Equals(1000))
+
+        # same size, different content
+        Path("src/main.c").write_text("int mian() {}")
+        self.assertThat(self.pull(), Equals(sources.SyncResult(1, 0, 2)))
+        self.assertThat(Path("dst/main.c").read_text(), Equals("int mian() {}"))
+
+    def test_source_not_found(self):
+        self.assertRaises(
+            errors.PartbuilderSourceNotFound,
+            sources.LocalSource("missing", "dst", cache_dir="cache").pull,
+        )
+
+    @staticmethod
+    def _no_link(src, dst):
+        raise PermissionError(src)
+
+
+class TestSourceType(unit.TestCase):
+    def test_source_type(self):
+        for source, source_type in [
+            ("src", "local"),
+            ("../project", "local"),
+            ("https://example.com/foo.tar.gz", "tar"),
+            ("git@example.com:foo.git", "git"),
+            ("https://example.com/foo", "url"),
+        ]:
+            self.assertThat(sources.get_source_type(source), Equals(source_type))
+        self.assertThat(sources.get_source_type("src", "git"), Equals("git"))
+
+
+class TestPullLocalSource(unit.TestCase):
+    def test_pull_excludes_work_dir(self):
+        Path("main.c").write_text("int main() {}")
+        parts = {"parts": {"foo": {"plugin": "nil", "source": "."}}}
+        lf = partbuilder.LifecycleManager(parts=parts)
+        lf.execute(lf.actions(Step.PULL))
+
+        main = Path("parts/foo/src/main.c")
+        self.assertThat(main.read_text(), Equals("int main() {}"))
+        self.assertFalse(os.path.exists("parts/foo/src/parts"))
@@ -0,0 +1,173 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Contains, Equals
+
+import partbuilder
+from partbuilder import _callbacks, _locks
+from partbuilder._locks import PartLock, PartLocks
+from partbuilder._part import Part
+from partbuilder._step import Step
+from tests import unit
+
+_PARTS = {
+    "parts": {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil", "after": ["foo"]}}
+}
+
+_LOCKS_DIR = os.path.join("parts", ".cache", "locks")
+
+# the ordinals of the parts
+_ORDINALS = {"foo": 0, "bar": 1}
+
+_TRY_LOCK = """\
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR)
+operation = fcntl.LOCK_SH if sys.argv[2] == "shared" else fcntl.LOCK_EX
+fcntl.lockf(fd, operation | fcntl.LOCK_NB, int(sys.argv[3]), int(sys.argv[4]))
+"""
+
+
+def _lockable(name, *, shared):
+    """Whether another process could lock the part now."""
+    args = [
+        os.path.join(_LOCKS_DIR, "parts.lock"),
+        "shared" if shared else "exclusive",
+        str(_locks._SLOT_SIZE),
+        str(_ORDINALS[name] * _locks._SLOT_SIZE),
+    ]
+    process = subprocess.run(
+        [sys.executable, "-c", _TRY_LOCK, *args], stderr=subprocess.DEVNULL
+    )
+    return process.returncode == 0
+
+
+def _part_lock(name):
+    return PartLock(_LOCKS_DIR, name, _ORDINALS[name])
+
+
+def _execute_in_thread(lf, actions):
+    thread = threading.Thread(target=lf.execute, args=(actions,))
+    thread.start()
+    return thread
+
+
+def _plan_and_execute_in_thread(lf, target_step, part_names):
+    def run():
+        lf.execute(lf.actions(target_step, part_names))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+class TestPartLocks(unit.TestCase):
+    def test_dependencies_locked_shared(self):
+        parts = [Part("foo", {}), Part("bar", {"after": ["foo"]})]
+        with PartLocks(_LOCKS_DIR, parts, exclusive={"bar"}, shared={"foo"}):
+            self.assertTrue(_lockable("foo", shared=True))
+            self.assertFalse(_lockable("foo", shared=False))
+            self.assertFalse(_lockable("bar", shared=True))
+
+        self.assertTrue(_lockable("bar", shared=False))
+
+    def test_shared_within_process(self):
+        parts = [Part("foo", {}), Part("bar", {"after": ["foo"]})]
+        with PartLocks(_LOCKS_DIR, parts, exclusive=set(), shared={"foo"}):
+            with PartLocks(_LOCKS_DIR, parts, exclusive=set(), shared={"foo"}):
+                pass
+            # still held by the first run
+            self.assertFalse(_lockable("foo", shared=False))
+
+    def test_one_file_descriptor(self):
+        parts = [Part(f"part-{i}", {}) for i in range(2000)]
+        names = {p.name for p in parts}
+        fds = len(os.listdir("/proc/self/fd"))
+        with PartLocks(_LOCKS_DIR, parts, exclusive=names, shared=set()):
+            self.assertThat(len(os.listdir("/proc/self/fd")), Equals(fds + 1))
+        self.assertThat(len(os.listdir("/proc/self/fd")), Equals(fds))
+
+    def test_disjoint_parts(self):
+        lock = _part_lock("bar")
+        lock.acquire()
+        self.addCleanup(lock.release)
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        thread = _execute_in_thread(lf, lf.actions(Step.PULL, ["foo"]))
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(os.path.exists("parts/foo/state/pull"))
+
+    def test_contention(self):
+        self.addCleanup(_callbacks.pre_step.clear)
+        logger = self.useFixture(fixtures.FakeLogger())
+        calls = []
+        partbuilder.register_pre_step_callback(calls.append, [Step.PULL])
+
+        # the other run locks foo after we planned
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PULL, ["foo"])
+        lock = _part_lock("foo")
+        lock.acquire()
+        thread = _execute_in_thread(lf, actions)
+
+        # the other run pulls foo while we wait
+        time.sleep(0.2)
+        self.assertTrue(thread.is_alive())
+        os.makedirs("parts/foo/state")
+        Path("parts/foo/state/pull").touch()
+        lock.release()
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertThat(calls, Equals([]))
+        self.assertThat(
+            logger.output,
+            Contains(f"Waiting for 'foo', locked by process {os.getpid()}."),
+        )
+
+    def test_planning_locks_parts_shared(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.iter_actions(Step.PULL, ["bar"])
+        next(actions)
+
+        for name in ("foo", "bar"):
+            self.assertTrue(_lockable(name, shared=True))
+            self.assertFalse(_lockable(name, shared=False))
+
+        list(actions)
+        self.assertTrue(_lockable("foo", shared=False))
+
+    def test_planning_waits_for_other_runs(self):
+        lock = _part_lock("foo")
+        lock.acquire()
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        thread = _plan_and_execute_in_thread(lf, Step.PULL, ["foo"])
+
+        time.sleep(0.2)
+        self.assertTrue(thread.is_alive())
+        lock.release()
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(os.path.exists("parts/foo/state/pull"))
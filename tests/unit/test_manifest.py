@@ -0,0 +1,115 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from pathlib import Path
+
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder._part import Part
+from partbuilder._step import Action, Step
+from partbuilder.sequencer.state_manager import StateManager
+from partbuilder.sequencer.states import Manifest, write_manifest
+from tests import unit
+
+
+class TestManifest(unit.TestCase):
+    def test_write_and_read(self):
+        write_manifest(
+            "manifest",
+            files=["bin/hello", "lib/libhello.so"],
+            directories=["bin", "lib"],
+            digest=b"\1" * 32,
+        )
+
+        manifest = Manifest("manifest")
+        self.assertThat(manifest.file_count, Equals(2))
+        self.assertThat(manifest.directory_count, Equals(2))
+        self.assertThat(manifest.digest, Equals(b"\1" * 32))
+        self.assertThat(manifest.files, Equals(["bin/hello", "lib/libhello.so"]))
+        self.assertThat(manifest.directories, Equals(["bin", "lib"]))
+
+    def test_empty_lists(self):
+        write_manifest("manifest", files=[], directories=[])
+
+        manifest = Manifest("manifest")
+        self.assertThat(manifest.files, Equals([]))
+        self.assertThat(manifest.directories, Equals([]))
+
+    def test_undecodable_names(self):
+        name = os.fsdecode(b"bin/caf\xe9")
+        write_manifest("manifest", files=[name], directories=["bin"])
+        self.assertThat(Manifest("manifest").files, Equals([name]))
+
+    def test_invalid_manifest(self):
+        Path("manifest").write_bytes(b"\0" * 100)
+        self.assertRaises(ValueError, getattr, Manifest("manifest"), "file_count")
+
+    def test_stage_and_prime_manifests(self):
+        os.makedirs("parts/foo/install/usr/bin")
+        Path("parts/foo/install/usr/bin/foo").touch()
+
+        parts = {"parts": {"foo": {"plugin": "nil"}}}
+        lf = partbuilder.LifecycleManager(parts=parts)
+        lf.execute(lf.actions(Step.PRIME))
+
+        sm = StateManager([Part("foo", parts["parts"]["foo"])])
+        self.assertThat(sm.manifest(Part("foo", {}), Step.PULL), Equals(None))
+        for step in [Step.STAGE, Step.PRIME]:
+            manifest = sm.manifest(Part("foo", {}), step)
+            self.assertThat(manifest.file_count, Equals(1))
+            self.assertThat(manifest.files, Equals(["usr/bin/foo"]))
+            self.assertThat(manifest.directories, Equals(["usr", "usr/bin"]))
+
+
+class TestDependencyDigests(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs("parts/foo/install")
+        Path("parts/foo/install/foo").write_text("1")
+
+        self.parts = {
+            "parts": {
+                "foo": {"plugin": "nil"},
+                "bar": {"plugin": "nil", "after": ["foo"]},
+            }
+        }
+        lf = partbuilder.LifecycleManager(parts=self.parts)
+        lf.execute(lf.actions(Step.STAGE))
+
+        # make the dependency's new stage state newer than bar's states
+        state_dir = Part("bar", {}).part_state_dir
+        for name in os.listdir(state_dir):
+            path = os.path.join(state_dir, name)
+            mtime = os.stat(path).st_mtime - 3600
+            os.utime(path, (mtime, mtime))
+
+    def _restage_foo_and_plan_bar(self):
+        lf = partbuilder.LifecycleManager(parts=self.parts)
+        lf.execute(lf.actions(Step.STAGE, ["foo"]))
+        lf = partbuilder.LifecycleManager(parts=self.parts)
+        return [(a.part_name, a.action) for a in lf.actions(Step.PRIME, ["bar"])]
+
+    def test_same_output_does_not_rebuild(self):
+        actions = self._restage_foo_and_plan_bar()
+        self.assertIn(("bar", Action.SKIP_BUILD), actions)
+        self.assertIn(("bar", Action.SKIP_STAGE), actions)
+
+    def test_changed_output_rebuilds(self):
+        Path("parts/foo/install/foo").write_text("2")
+        actions = self._restage_foo_and_plan_bar()
+        self.assertIn(("bar", Action.REBUILD), actions)
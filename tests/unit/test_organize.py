@@ -0,0 +1,187 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from pathlib import Path
+
+import fixtures
+from testtools.matchers import Equals, FileExists
+
+import partbuilder
+from partbuilder import _organize, errors
+from partbuilder._filesets import compile_fileset
+from partbuilder._step import Step
+from tests import unit
+
+
+def _make_tree(root, paths):
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+        Path(root, path).touch()
+
+
+def _files(root):
+    return compile_fileset(("*",)).walk(root)[0]
+
+
+class TestOrganize(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        _make_tree("root", ["bin/hello", "bin/hi", "lib/libhello.so", "README"])
+
+    def organize(self, mapping):
+        _organize.organize("foo", "root", mapping)
+        return _files("root")
+
+    def test_rename_file(self):
+        files = self.organize({"README": "share/doc/hello/README"})
+        self.assertThat(
+            files,
+            Equals(
+                ["bin/hello", "bin/hi", "lib/libhello.so", "share/doc/hello/README"]
+            ),
+        )
+
+    def test_glob_into_directory(self):
+        files = self.organize({"bin/*": "usr/bin/"})
+        self.assertThat(
+            files, Equals(["README", "lib/libhello.so", "usr/bin/hello", "usr/bin/hi"])
+        )
+        self.assertFalse(os.path.exists("root/bin/hello"))
+
+    def test_merge_directories(self):
+        _make_tree("root", ["usr/bin/other"])
+        files = self.organize({"bin": "usr/bin"})
+        self.assertThat(
+            files,
+            Equals(
+                [
+                    "README",
+                    "lib/libhello.so",
+                    "usr/bin/hello",
+                    "usr/bin/hi",
+                    "usr/bin/other",
+                ]
+            ),
+        )
+        self.assertFalse(os.path.exists("root/bin"))
+
+    def test_no_match(self):
+        files = self.organize({"missing": "elsewhere"})
+        self.assertThat(len(files), Equals(4))
+
+    def test_uses_rename(self):
+        calls = []
+        rename = os.rename
+
+        def fake_rename(src, dst):
+            calls.append(dst)
+            rename(src, dst)
+
+        self.useFixture(fixtures.MonkeyPatch("os.rename", fake_rename))
+        self.organize({"bin": "usr/bin", "lib": "usr/lib"})
+        self.assertThat(calls, Equals(["root/usr/bin", "root/usr/lib"]))
+
+    def test_existing_destination(self):
+        self.assertRaises(
+            errors.PartbuilderOrganizeConflict,
+            _organize.plan_organize,
+            "foo",
+            "root",
+            {"README": "bin/hello"},
+        )
+
+    def test_same_destination(self):
+        raised = self.assertRaises(
+            errors.PartbuilderOrganizeConflict,
+            _organize.plan_organize,
+            "foo",
+            "root",
+            {"bin/hello": "hello", "bin/hi": "hello"},
+        )
+        self.assertThat(
+            str(raised),
+            Equals(
+                'Part "foo" cannot organize "bin/hi" to "hello": '
+                "'bin/hello' is also organized there."
+            ),
+        )
+
+    def test_many_sources_to_file(self):
+        self.assertRaises(
+            errors.PartbuilderOrganizeConflict,
+            _organize.plan_organize,
+            "foo",
+            "root",
+            {"bin/*": "hello"},
+        )
+
+    def test_conflicts_leave_tree_untouched(self):
+        self.assertRaises(
+            errors.PartbuilderOrganizeConflict,
+            _organize.organize,
+            "foo",
+            "root",
+            {"lib": "usr/lib", "README": "bin/hi"},
+        )
+        self.assertThat("root/lib/libhello.so", FileExists())
+
+    def test_destination_freed_by_earlier_move(self):
+        files = self.organize({"bin/hello": "usr/bin/hello", "README": "bin/hello"})
+        self.assertThat(
+            files,
+            Equals(["bin/hello", "bin/hi", "lib/libhello.so", "usr/bin/hello"]),
+        )
+
+    def test_patterns_match_moved_entries(self):
+        files = self.organize({"bin": "opt/", "opt/bin/hi": "hi"})
+        self.assertThat(
+            files, Equals(["README", "hi", "lib/libhello.so", "opt/bin/hello"])
+        )
+
+    def test_moved_entry_moved_again(self):
+        files = self.organize({"README": "doc/README", "doc": "share/doc"})
+        self.assertThat(
+            files,
+            Equals(["bin/hello", "bin/hi", "lib/libhello.so", "share/doc/README"]),
+        )
+
+    def test_merged_directory_reused(self):
+        _make_tree("root", ["usr/bin/other"])
+        files = self.organize({"bin": "usr/bin", "README": "bin/"})
+        self.assertThat(
+            files,
+            Equals(
+                [
+                    "bin/README",
+                    "lib/libhello.so",
+                    "usr/bin/hello",
+                    "usr/bin/hi",
+                    "usr/bin/other",
+                ]
+            ),
+        )
+
+
+class TestBuildOrganize(unit.TestCase):
+    def test_build_organizes_install_dir(self):
+        _make_tree("parts/foo/install", ["bin/hello"])
+        data = {"plugin": "nil", "organize": {"bin/*": "usr/bin/"}}
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": data}})
+        lf.execute(lf.actions(Step.BUILD))
+
+        self.assertThat("parts/foo/install/usr/bin/hello", FileExists())
+        self.assertFalse(os.path.exists("parts/foo/install/bin/hello"))
@@ -64,3 +64,14 @@ class TestPartDependencies(unit.TestCase):
             parts=[p1, p2, p3],
         )
         self.assertThat(raised._part_name, Equals("invalid"))
+
+    def test_get_dependencies_diamonds(self):
+        parts = [Part("p0", {})]
+        for i in range(1, 40):
+            parts.append(Part(f"a{i}", {"after": [f"p{i - 1}"]}))
+            parts.append(Part(f"b{i}", {"after": [f"p{i - 1}"]}))
+            parts.append(Part(f"p{i}", {"after": [f"a{i}", f"b{i}"]}))
+
+        # shared dependencies are only visited once
+        x = _part.get_dependencies("p39", parts=parts, recursive=True)
+        self.assertThat(len(x), Equals(len(parts) - 1))
@@ -0,0 +1,104 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+
+from testtools.matchers import Equals, Is, Not
+
+import partbuilder
+from partbuilder._step import Step
+from tests import unit
+
+_PARTS = {
+    "parts": {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil", "after": ["foo"]}}
+}
+
+
+def _plan(actions):
+    return [(a.part_name, a.action, a.reason) for a in actions]
+
+
+class TestPlanCache(unit.TestCase):
+    def test_cached_plan_skips_planning(self):
+        expected = _plan(partbuilder.LifecycleManager(parts=_PARTS).actions(Step.BUILD))
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        self.assertThat(_plan(lf.actions(Step.BUILD)), Equals(expected))
+        self.assertThat(lf._sequencer, Is(None))
+
+    def test_plan_not_cached_after_planning(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.actions(Step.PULL)
+        lf.actions(Step.PULL)
+        self.assertThat(lf._sequencer, Not(Is(None)))
+
+    def test_execute_invalidates_plan(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.execute(lf.actions(Step.PULL))
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PULL)
+        self.assertThat(lf._sequencer, Not(Is(None)))
+        self.assertThat(
+            {a.action for a in actions}, Equals({partbuilder.Action.SKIP_PULL})
+        )
+
+    def test_parts_change_invalidates_plan(self):
+        partbuilder.LifecycleManager(parts=_PARTS).actions(Step.PULL)
+
+        parts = {"parts": {"foo": {"plugin": "nil"}}}
+        lf = partbuilder.LifecycleManager(parts=parts)
+        self.assertThat(
+            _plan(lf.actions(Step.PULL)),
+            Equals([("foo", partbuilder.Action.PULL, None)]),
+        )
+        self.assertThat(lf._sequencer, Not(Is(None)))
+
+    def test_removed_state_invalidates_plan(self):
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.execute(lf.actions(Step.PULL))
+        partbuilder.LifecycleManager(parts=_PARTS).actions(Step.PULL)
+
+        shutil.rmtree(os.path.join("parts", "foo", "state"))
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        actions = lf.actions(Step.PULL)
+        self.assertThat(
+            [(a.part_name, a.action) for a in actions],
+            Equals(
+                [
+                    ("foo", partbuilder.Action.PULL),
+                    ("bar", partbuilder.Action.SKIP_PULL),
+                ]
+            ),
+        )
+
+    def test_disable_plan_cache(self):
+        partbuilder.LifecycleManager(parts=_PARTS).actions(Step.PULL)
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS, use_plan_cache=False)
+        lf.actions(Step.PULL)
+        self.assertThat(lf._sequencer, Not(Is(None)))
+
+    def test_execute_cached_plan(self):
+        partbuilder.LifecycleManager(parts=_PARTS).actions(Step.PULL)
+
+        lf = partbuilder.LifecycleManager(parts=_PARTS)
+        lf.execute(lf.actions(Step.PULL))
+        self.assertThat(lf._sequencer, Is(None))
+        for name in ["foo", "bar"]:
+            state_file = os.path.join("parts", name, "state", "pull")
+            self.assertTrue(os.path.exists(state_file))
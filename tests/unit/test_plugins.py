@@ -0,0 +1,116 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import textwrap
+
+from testtools.matchers import Contains, Equals, Is, Not
+
+from tests import unit
+from partbuilder import errors, plugins
+from partbuilder.plugins import _registry
+from partbuilder.plugins.nil import NilPlugin
+
+_LOCAL_PLUGIN = textwrap.dedent(
+    """\
+    import os
+    from partbuilder.plugins import Plugin
+
+    with open("imported", "a") as f:
+        f.write("x")
+
+    class LocalPlugin(Plugin):
+        def get_build_commands(self):
+            return ["echo local"]
+    """
+)
+
+
+class TestPluginRegistry(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_registry.clear_cache)
+        self.addCleanup(_registry._registered_plugins.clear)
+        _registry.clear_cache()
+
+        os.mkdir("plugins")
+        with open(os.path.join("plugins", "my_local.py"), "w") as f:
+            f.write(_LOCAL_PLUGIN)
+        with open(os.path.join("plugins", "broken.py"), "w") as f:
+            f.write("x = 1\n")
+
+    def test_builtin_plugins(self):
+        self.assertThat(_registry.builtin_plugins(), Contains("nil"))
+        self.assertThat(_registry.builtin_plugins(), Contains("make"))
+        self.assertThat(plugins.get_plugin_class("nil"), Is(NilPlugin))
+
+    def test_local_plugins_are_discovered_without_import(self):
+        names = plugins.available_plugins(local_plugins_dir="plugins")
+        self.assertThat(names, Contains("my-local"))
+        self.assertThat(names, Contains("nil"))
+        self.assertFalse(os.path.exists("imported"))
+
+    def test_local_plugin_imported_once(self):
+        plugin_class = plugins.get_plugin_class("my-local", local_plugins_dir="plugins")
+        self.addCleanup(sys.modules.pop, plugin_class.__module__, None)
+        self.assertThat(plugin_class.__name__, Equals("LocalPlugin"))
+        self.assertThat(
+            sys.modules[plugin_class.__module__].LocalPlugin, Is(plugin_class)
+        )
+        again = plugins.get_plugin_class("my-local", local_plugins_dir="plugins")
+        self.assertThat(again, Is(plugin_class))
+
+        with open("imported") as f:
+            self.assertThat(f.read(), Equals("x"))
+
+    def test_local_plugins_of_same_name_in_two_dirs(self):
+        os.mkdir("other")
+        with open(os.path.join("other", "my_local.py"), "w") as f:
+            f.write(_LOCAL_PLUGIN.replace("echo local", "echo other"))
+
+        first = plugins.get_plugin_class("my-local", local_plugins_dir="plugins")
+        second = plugins.get_plugin_class("my-local", local_plugins_dir="other")
+        for plugin_class in (first, second):
+            self.addCleanup(sys.modules.pop, plugin_class.__module__, None)
+
+        self.assertThat(first.__module__, Not(Equals(second.__module__)))
+        self.assertThat(sys.modules[first.__module__].LocalPlugin, Is(first))
+        self.assertThat(sys.modules[second.__module__].LocalPlugin, Is(second))
+
+    def test_registered_plugin_takes_precedence(self):
+        self.assertThat(plugins.get_plugin_class("nil"), Is(NilPlugin))
+
+        class MyNilPlugin(NilPlugin):
+            pass
+
+        plugins.register_plugin({"nil": MyNilPlugin})
+        self.assertThat(plugins.get_plugin_class("nil"), Is(MyNilPlugin))
+        self.assertThat(plugins.get_plugin_class("nil"), Not(Is(NilPlugin)))
+
+    def test_plugin_not_found(self):
+        raised = self.assertRaises(
+            errors.PartbuilderPluginNotFound, plugins.get_plugin_class, "missing"
+        )
+        self.assertThat(raised._plugin_name, Equals("missing"))
+
+    def test_invalid_plugin(self):
+        self.assertRaises(
+            errors.PartbuilderInvalidPlugin,
+            plugins.get_plugin_class,
+            "broken",
+            local_plugins_dir="plugins",
+        )
@@ -0,0 +1,132 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Contains, Equals
+
+import partbuilder
+from partbuilder import _callbacks, errors
+from partbuilder._part import Part
+from partbuilder._resources import (
+    Resources,
+    ResourcePool,
+    parse_size,
+    requested_resources,
+)
+from partbuilder._step import Step
+from partbuilder._validator import Validator
+from tests import unit
+
+
+class TestResources(unit.TestCase):
+    def test_parse_size(self):
+        self.assertThat(parse_size(1000), Equals(1000))
+        self.assertThat(parse_size("512M"), Equals(512 << 20))
+        self.assertThat(parse_size("1.5GiB"), Equals(3 << 29))
+        self.assertRaises(ValueError, parse_size, "lots")
+
+    def test_validate_resources(self):
+        parts = {
+            "parts": {
+                "foo": {"plugin": "nil", "resources": {"cpu": 0, "disk": "1G"}},
+                "bar": {"plugin": "nil", "resources": {"cpu": 2, "memory": "4G"}},
+            }
+        }
+        self.assertThat(
+            Validator(parts).problems(),
+            Equals(
+                [
+                    "Part 'foo' has unknown resource 'disk'.",
+                    "Part 'foo': resource 'cpu' must be a positive integer.",
+                ]
+            ),
+        )
+
+    def test_requested_resources(self):
+        capacity = Resources(cpu=8, memory=16 << 30)
+        part = Part("foo", {"resources": {"cpu": 2, "memory": "32G"}})
+        self.assertThat(
+            requested_resources(part, Step.BUILD, capacity=capacity),
+            Equals(Resources(cpu=2, memory=16 << 30)),
+        )
+        self.assertThat(
+            requested_resources(part, Step.PULL, capacity=capacity),
+            Equals(Resources(cpu=1, memory=0)),
+        )
+        self.assertThat(
+            requested_resources(Part("bar", {}), Step.BUILD, capacity=capacity),
+            Equals(Resources(cpu=8, memory=0)),
+        )
+
+    def test_requested_resources_not_validated(self):
+        capacity = Resources(cpu=8, memory=16 << 30)
+        part = Part("foo", {"resources": ["cpu"]})
+        raised = self.assertRaises(
+            errors.PartbuilderPartsValidationError,
+            requested_resources,
+            part,
+            Step.BUILD,
+            capacity=capacity,
+        )
+        self.assertThat(
+            raised.get_brief(),
+            Equals(
+                "Invalid parts definition: Part 'foo': 'resources' must be a mapping."
+            ),
+        )
+
+    def test_pool_admission(self):
+        pool = ResourcePool(Resources(cpu=4, memory=8))
+        big = pool.admit(Resources(cpu=1, memory=6))
+        self.assertIsNotNone(big)
+
+        # memory is not oversubscribed even if there are CPUs left
+        self.assertIsNone(pool.admit(Resources(cpu=1, memory=4)))
+        self.assertIsNotNone(pool.admit(Resources(cpu=3, memory=2)))
+        self.assertIsNone(pool.admit(Resources(cpu=1, memory=0)))
+
+        pool.release(big)
+        self.assertIsNotNone(pool.admit(Resources(cpu=1, memory=4)))
+
+
+class TestConcurrentExecution(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_callbacks.pre_step.clear)
+
+    def test_execute_concurrently(self):
+        parts = {
+            "parts": {
+                "foo": {"plugin": "make", "resources": {"cpu": 2}},
+                "bar": {"plugin": "make", "after": ["foo"]},
+                "baz": {"plugin": "nil", "resources": {"memory": "1G"}},
+            }
+        }
+        shares = {}
+        partbuilder.register_pre_step_callback(
+            lambda info: shares.update({info.part_name: info.parallel_build_count}),
+            [Step.BUILD],
+        )
+
+        lf = partbuilder.LifecycleManager(parts=parts, parallel_build_count=4)
+        lf.execute(lf.actions(Step.PRIME))
+
+        self.assertThat(shares, Equals({"foo": 2, "bar": 4, "baz": 4}))
+        for name in ["foo", "bar", "baz"]:
+            self.assertThat(
+                os.listdir(os.path.join("parts", name, "state")), Contains("prime")
+            )
@@ -0,0 +1,140 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from testtools.matchers import Equals
+
+import partbuilder
+from partbuilder import _durations
+from partbuilder._durations import PartDuration, StepDurations, StepUsage
+from partbuilder._part import Part
+from partbuilder._scheduler import Scheduler
+from partbuilder._step import Action, PartAction, Step
+from tests import unit
+
+
+def _run(scheduler):
+    order = []
+    while not scheduler.finished:
+        act = scheduler.pop()
+        order.append((act.part_name, act.action))
+        scheduler.done(act)
+    return order
+
+
+class TestScheduler(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.parts = [
+            Part("foo", {"plugin": "nil"}),
+            Part("bar", {"plugin": "nil", "after": ["foo"]}),
+            Part("baz", {"plugin": "nil"}),
+        ]
+        self.plan = [
+            PartAction("baz", Action.PULL),
+            PartAction("foo", Action.PULL),
+            PartAction("bar", Action.PULL),
+            PartAction("foo", Action.BUILD),
+            PartAction("foo", Action.STAGE),
+            PartAction("bar", Action.BUILD),
+        ]
+
+    def test_dependencies(self):
+        scheduler = Scheduler(self.plan, self.parts)
+        ready = [scheduler.pop() for _ in range(3)]
+        self.assertThat(
+            sorted(a.part_name for a in ready), Equals(["bar", "baz", "foo"])
+        )
+        self.assertIsNone(scheduler.pop())
+
+        # bar can only be built after foo is staged
+        for act in ready:
+            scheduler.done(act)
+        self.assertThat(
+            _run(scheduler),
+            Equals(
+                [
+                    ("foo", Action.BUILD),
+                    ("foo", Action.STAGE),
+                    ("bar", Action.BUILD),
+                ]
+            ),
+        )
+
+    def test_longest_path_first(self):
+        scheduler = Scheduler(self.plan, self.parts)
+        self.assertThat(scheduler.priority(self.plan[1]), Equals(4.0))
+        self.assertThat(_run(scheduler)[0], Equals(("foo", Action.PULL)))
+
+    def test_fifo(self):
+        scheduler = Scheduler(self.plan, self.parts, critical_path=False)
+        self.assertThat(_run(scheduler)[0], Equals(("baz", Action.PULL)))
+
+    def test_weighted_by_durations(self):
+        durations = StepDurations("cache")
+        durations.record("baz", Action.PULL, StepUsage(wall=10.0, cpu=1.0))
+        scheduler = Scheduler(self.plan, self.parts, durations=durations)
+        self.assertThat(scheduler.priority(self.plan[0]), Equals(10.0))
+        self.assertThat(_run(scheduler)[0], Equals(("baz", Action.PULL)))
+
+
+class TestStepDurations(unit.TestCase):
+    def test_durations_recorded_by_execute(self):
+        lf = partbuilder.LifecycleManager(parts={"parts": {"foo": {"plugin": "nil"}}})
+        lf.execute(lf.actions(Step.BUILD))
+
+        durations = StepDurations("parts/.cache")
+        self.assertIsNotNone(durations.get("foo", Step.PULL))
+        self.assertIsNotNone(durations.get("foo", Step.BUILD))
+        self.assertIsNone(durations.get("foo", Step.STAGE))
+
+    def test_moving_average(self):
+        durations = StepDurations("cache")
+        durations.record("foo", Action.BUILD, StepUsage(wall=4.0, cpu=1.0))
+        durations.save()
+        durations = StepDurations("cache")
+        durations.record("foo", Action.REBUILD, StepUsage(wall=2.0, cpu=1.0))
+        durations.save()
+
+        self.assertThat(StepDurations("cache").get("foo", Step.BUILD), Equals(3.0))
+
+    def test_slowest_parts(self):
+        durations = StepDurations("cache")
+        durations.record("foo", Action.PULL, StepUsage(wall=1.0, cpu=0.5))
+        durations.record("foo", Action.BUILD, StepUsage(wall=2.0, cpu=1.5, max_rss=10))
+        durations.record("bar", Action.BUILD, StepUsage(wall=5.0, cpu=4.0))
+        durations.save()
+        durations.record("foo", Action.REBUILD, StepUsage(wall=6.0, cpu=5.0))
+        durations.save()
+
+        self.assertThat(
+            StepDurations("cache").slowest_parts(),
+            Equals(
+                [
+                    PartDuration("bar", wall=5.0, cpu=4.0, max_rss=None, runs=1),
+                    PartDuration("foo", wall=4.5, cpu=3.5, max_rss=10, runs=2),
+                ]
+            ),
+        )
+
+    def test_old_runs_discarded(self):
+        durations = StepDurations("cache")
+        for i in range(_durations._MAX_RUNS + 1):
+            durations.record(f"part-{i}", Action.PULL, StepUsage(wall=1.0, cpu=1.0))
+            durations.save()
+
+        parts = [p.part_name for p in durations.slowest_parts(limit=100)]
+        self.assertThat(len(parts), Equals(_durations._MAX_RUNS))
+        self.assertNotIn("part-0", parts)
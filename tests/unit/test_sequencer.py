@@ -0,0 +1,113 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Equals
+
+from tests import unit
+from partbuilder import errors
+from partbuilder._part import Part
+from partbuilder._step import Action, Step
+from partbuilder.sequencer import Sequencer
+
+
+def _parts():
+    return [
+        Part("foo", {"plugin": "nil"}),
+        Part("bar", {"plugin": "nil", "after": ["foo"]}),
+        Part("baz", {"plugin": "nil", "after": ["bar"]}),
+    ]
+
+
+class TestSequencerActions(unit.TestCase):
+    def test_actions(self):
+        seq = Sequencer(_parts())
+        actions = seq.actions(Step.BUILD, ["bar"])
+        self.assertThat(
+            [(a.part_name, a.action) for a in actions],
+            Equals(
+                [
+                    ("bar", Action.PULL),
+                    ("foo", Action.PULL),
+                    ("foo", Action.BUILD),
+                    ("foo", Action.STAGE),
+                    ("bar", Action.BUILD),
+                ]
+            ),
+        )
+
+    def test_iter_actions_is_incremental(self):
+        seq = Sequencer(_parts())
+        it = seq.iter_actions(Step.PRIME)
+        first = next(it)
+        self.assertThat((first.part_name, first.action), Equals(("foo", Action.PULL)))
+
+        # later parts are not planned yet
+        self.assertFalse(seq._sm.has_step_run(_parts()[2], Step.PULL))
+
+        rest = [a for a in it if a.action < Action.SKIP_PULL]
+        self.assertThat(len(rest), Equals(11))
+
+    def test_iter_actions_same_as_actions(self):
+        streamed = Sequencer(_parts()).iter_actions(Step.PRIME, ["baz"])
+        listed = Sequencer(_parts()).actions(Step.PRIME, ["baz"])
+        self.assertThat([repr(a) for a in streamed], Equals([repr(a) for a in listed]))
+
+    def test_iter_actions_ordering(self):
+        parts = _parts()
+        order = {
+            (a.part_name, a.action): i
+            for i, a in enumerate(Sequencer(parts).iter_actions(Step.PRIME))
+        }
+        for p in parts:
+            for s, a in [
+                (Action.PULL, Action.BUILD),
+                (Action.BUILD, Action.STAGE),
+                (Action.STAGE, Action.PRIME),
+            ]:
+                self.assertTrue(order[(p.name, s)] < order[(p.name, a)])
+        self.assertTrue(order[("foo", Action.STAGE)] < order[("bar", Action.BUILD)])
+        self.assertTrue(order[("bar", Action.PRIME)] < order[("baz", Action.PRIME)])
+
+    def test_ordering_violation(self):
+        seq = Sequencer(_parts())
+        part = seq._parts[1]
+        raised = self.assertRaises(
+            errors.PartbuilderInternalError,
+            list,
+            seq._run_step(part, Step.STAGE),
+        )
+        self.assertThat(
+            str(raised),
+            Equals("Internal error: bar:Step.STAGE planned before bar:Step.PULL"),
+        )
+
+    def test_skip_steps_already_run(self):
+        os.makedirs(os.path.join("parts", "foo", "state"))
+        open(os.path.join("parts", "foo", "state", "pull"), "w").close()
+
+        actions = Sequencer(_parts()).actions(Step.PULL)
+        self.assertThat(
+            [(a.part_name, a.action) for a in actions],
+            Equals(
+                [
+                    ("foo", Action.SKIP_PULL),
+                    ("bar", Action.PULL),
+                    ("baz", Action.PULL),
+                ]
+            ),
+        )
@@ -0,0 +1,146 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from testtools.matchers import Equals
+
+import partbuilder
+
+from partbuilder._part import Part
+from partbuilder._step import Step
+from partbuilder.sequencer.state_manager import StateManager
+from partbuilder.sequencer.state_manager._step_table import StepStatus, StepTable
+from tests import unit
+
+
+class TestStepTable(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.table = StepTable([f"p{i}" for i in range(100)])
+
+    def test_set_and_test(self):
+        self.table.set(StepStatus.RUN, Step.BUILD, ["p3", "p70"])
+        self.assertTrue(self.table.test(StepStatus.RUN, Step.BUILD, "p70"))
+        self.assertFalse(self.table.test(StepStatus.RUN, Step.STAGE, "p70"))
+        self.assertFalse(self.table.test(StepStatus.DIRTY, Step.BUILD, "p70"))
+        self.assertThat(
+            self.table.parts_with(StepStatus.RUN, Step.BUILD), Equals(["p3", "p70"])
+        )
+
+        self.table.clear(StepStatus.RUN, Step.BUILD, ["p3"])
+        self.assertFalse(self.table.test(StepStatus.RUN, Step.BUILD, "p3"))
+        self.assertTrue(self.table.test(StepStatus.RUN, Step.BUILD, "p70"))
+
+    def test_parts_without(self):
+        self.table.set(StepStatus.RUN, Step.PULL, ["p1", "p2"])
+        self.assertThat(
+            self.table.parts_without(
+                StepStatus.RUN, Step.PULL, ["p0", "p1", "p2", "p99"]
+            ),
+            Equals(["p0", "p99"]),
+        )
+        self.assertThat(
+            len(self.table.parts_without(StepStatus.RUN, Step.PULL)), Equals(98)
+        )
+
+    def test_clear_from(self):
+        everything = [f"p{i}" for i in range(100)]
+        for step in [Step.PULL, Step.BUILD, Step.STAGE]:
+            self.table.set(StepStatus.RUN, step, everything)
+        self.table.set(StepStatus.DIRTY, Step.STAGE, everything)
+
+        self.table.clear_from(Step.BUILD, ["p5", "p50"])
+        self.assertThat(
+            self.table.parts_without(StepStatus.RUN, Step.BUILD), Equals(["p5", "p50"])
+        )
+        self.assertThat(self.table.parts_without(StepStatus.RUN, Step.PULL), Equals([]))
+        self.assertFalse(self.table.test(StepStatus.DIRTY, Step.STAGE, "p50"))
+        self.assertTrue(self.table.test(StepStatus.DIRTY, Step.STAGE, "p51"))
+
+
+class TestStateManagerSteps(unit.TestCase):
+    def test_steps_run(self):
+        parts = [Part("foo", {}), Part("bar", {})]
+        sm = StateManager(parts)
+        sm.add_step_run(parts[0], Step.PULL)
+        sm.add_step_run(parts[0], Step.BUILD)
+
+        self.assertTrue(sm.has_step_run(parts[0], Step.BUILD))
+        self.assertThat(sm.parts_not_run(Step.PULL, parts), Equals(["bar"]))
+
+        sm.clear_steps(parts, Step.BUILD)
+        self.assertTrue(sm.has_step_run(parts[0], Step.PULL))
+        self.assertFalse(sm.has_step_run(parts[0], Step.BUILD))
+
+    def test_should_step_run_is_invalidated(self):
+        parts = [Part("foo", {}), Part("bar", {"after": ["foo"]})]
+        sm = StateManager(parts)
+        for step in [Step.PULL, Step.BUILD, Step.STAGE]:
+            sm.add_step_run(parts[0], step)
+        sm.add_step_run(parts[1], Step.PULL)
+        sm.add_step_run(parts[1], Step.BUILD)
+
+        self.assertFalse(sm.should_step_run(parts[0], Step.STAGE))
+        self.assertFalse(sm.should_step_run(parts[1], Step.BUILD))
+        self.assertFalse(sm.should_step_run(parts[1], Step.PULL))
+
+        sm.clear_step(parts[0], Step.BUILD)
+        self.assertTrue(sm.should_step_run(parts[0], Step.STAGE))
+        self.assertFalse(sm.should_step_run(parts[1], Step.PULL))
+
+    def test_dependents_are_invalidated(self):
+        data = {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil", "after": ["foo"]}}
+        lf = partbuilder.LifecycleManager(parts={"parts": data})
+        lf.execute(lf.actions(Step.BUILD))
+
+        foo, bar = Part("foo", data["foo"]), Part("bar", data["bar"])
+        sm = StateManager([foo, bar])
+        self.assertFalse(sm.should_step_run(bar, Step.BUILD))
+
+        sm.clean_part(foo, Step.PULL)
+        sm.clear_steps([foo], Step.PULL)
+        self.assertTrue(sm.should_step_run(bar, Step.BUILD))
+
+    def test_indirect_dependents_are_invalidated(self):
+        data = {
+            "foo": {"plugin": "nil"},
+            "bar": {"plugin": "nil", "after": ["foo"]},
+            "baz": {"plugin": "nil", "after": ["bar"]},
+        }
+        lf = partbuilder.LifecycleManager(parts={"parts": data})
+        lf.execute(lf.actions(Step.BUILD))
+
+        foo, bar, baz = (Part(name, data[name]) for name in ("foo", "bar", "baz"))
+        sm = StateManager([foo, bar, baz])
+        self.assertFalse(sm.should_step_run(baz, Step.BUILD))
+
+        sm.clean_part(foo, Step.STAGE)
+        sm.clear_steps([foo], Step.STAGE)
+        self.assertTrue(sm.should_step_run(baz, Step.BUILD))
+        self.assertThat(sm.parts_dirty(Step.BUILD, [bar, baz]), Equals(["bar", "baz"]))
+
+    def test_dirty_parts(self):
+        data = {"foo": {"plugin": "nil"}, "bar": {"plugin": "nil", "after": ["foo"]}}
+        lf = partbuilder.LifecycleManager(parts={"parts": data})
+        lf.execute(lf.actions(Step.STAGE))
+
+        foo, bar = Part("foo", data["foo"]), Part("bar", data["bar"])
+        sm = StateManager([foo, bar])
+        self.assertThat(sm.parts_dirty(Step.BUILD, [foo, bar]), Equals([]))
+        self.assertThat(sm.parts_outdated(Step.BUILD, [foo, bar]), Equals([]))
+
+        sm.clean_part(foo, Step.STAGE)
+        sm.clear_steps([foo], Step.STAGE)
+        self.assertThat(sm.parts_dirty(Step.BUILD, [foo, bar]), Equals(["bar"]))
@@ -0,0 +1,83 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import pickle
+
+from testtools.matchers import Equals, Is
+
+from tests import unit
+from partbuilder._part import Part
+from partbuilder._step import Step
+from partbuilder._stepinfo import StepInfo
+
+
+class TestPartStepInfo(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.info = StepInfo(
+            work_dir="work",
+            target_arch="aarch64",
+            platform_id="ubuntu",
+            platform_version_id="20.04",
+            parallel_build_count=4,
+            local_plugins_dir="",
+            custom="value",
+        )
+        self.part = Part("foo", {}, work_dir="work")
+
+    def test_part_and_step_fields(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        self.assertThat(x.part_name, Equals("foo"))
+        self.assertThat(x.step, Equals(Step.BUILD))
+        self.assertThat(x.part_src_dir, Equals("work/parts/foo/src"))
+        self.assertThat(x.part_install_dir, Equals("work/parts/foo/install"))
+
+    def test_project_fields_are_shared(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        self.assertThat(x.step_info, Is(self.info))
+        self.assertThat(x.stage_dir, Equals("work/stage"))
+        self.assertThat(x.parallel_build_count, Equals(4))
+        self.assertThat(x.arch_triplet, Equals("aarch64-linux-gnu"))
+        self.assertThat(x.deb_arch, Equals("arm64"))
+        self.assertThat(x.custom, Equals("value"))
+
+    def test_read_only(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        self.assertRaises(AttributeError, setattr, x, "step", Step.PRIME)
+        self.assertRaises(AttributeError, setattr, x, "work_dir", "other")
+        self.assertRaises(AttributeError, delattr, x, "part_name")
+        self.assertThat(self.info.work_dir, Equals("work"))
+
+    def test_copy(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        self.assertThat(copy.copy(x), Is(x))
+        y = copy.deepcopy(x)
+        self.assertThat(y.part_name, Equals("foo"))
+        self.assertThat(y.step, Equals(Step.BUILD))
+        self.assertThat(y.custom, Equals("value"))
+
+    def test_pickle(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        y = pickle.loads(pickle.dumps(x))
+        self.assertThat(y.part_name, Equals("foo"))
+        self.assertThat(y.step, Equals(Step.BUILD))
+        self.assertThat(y.parallel_build_count, Equals(4))
+        self.assertThat(y.deb_arch, Equals("arm64"))
+
+    def test_private_attributes_not_delegated(self):
+        x = self.info.for_step(part=self.part, step=Step.BUILD)
+        self.assertRaises(AttributeError, getattr, x, "_local_plugins_dir")
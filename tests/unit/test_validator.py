@@ -0,0 +1,171 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import textwrap
+from unittest import mock
+
+from testtools.matchers import Equals
+
+import partbuilder
+from tests import unit
+from partbuilder import _loader, errors
+from partbuilder._validator import Validator
+
+
+class TestValidator(unit.TestCase):
+    def test_valid(self):
+        parts = {
+            "parts": {
+                "foo": {"plugin": "make", "make-parameters": ["-s"]},
+                "bar": {"plugin": "nil", "after": ["foo"], "stage": ["*"]},
+            }
+        }
+        self.assertThat(Validator(parts).problems(), Equals([]))
+
+    def test_all_problems_reported(self):
+        parts = {
+            "parts": {
+                "a": {"plugin": "nil", "after": ["c"]},
+                "b": {"plugin": "nil", "after": ["a", "missing"], "foo": 1},
+                "c": {"plugin": "nil", "after": ["b"]},
+                "d": {"plugin": "nil", "after": ["c"]},
+                "e": {"plugin": "other"},
+                "f": {},
+                ".g": {"plugin": "nil"},
+            }
+        }
+        problems = Validator(
+            parts, duplicate_keys=[("a", 7)], plugin_names=["nil"]
+        ).problems()
+        self.assertThat(
+            problems,
+            Equals(
+                [
+                    "Duplicate key 'a' in line 7.",
+                    "Part 'b' has unknown property 'foo'.",
+                    "Part 'e' uses unknown plugin 'other'.",
+                    "Part 'f' does not define a plugin.",
+                    "Part name '.g' is invalid.",
+                    "Part 'b' depends on undefined part 'missing'.",
+                    "Part 'a' belongs to a circular dependency chain.",
+                    "Part 'b' belongs to a circular dependency chain.",
+                    "Part 'c' belongs to a circular dependency chain.",
+                ]
+            ),
+        )
+
+    def test_parts_between_cycles(self):
+        parts = {
+            "parts": {
+                "a": {"plugin": "nil", "after": ["b"]},
+                "b": {"plugin": "nil", "after": ["a"]},
+                "c": {"plugin": "nil", "after": ["b"]},
+                "d": {"plugin": "nil", "after": ["c", "e"]},
+                "e": {"plugin": "nil", "after": ["d"]},
+            }
+        }
+        self.assertThat(
+            Validator(parts).problems(),
+            Equals(
+                [
+                    f"Part {name!r} belongs to a circular dependency chain."
+                    for name in ["a", "b", "d", "e"]
+                ]
+            ),
+        )
+
+    def test_long_cycle(self):
+        parts = {
+            f"p{i}": {"plugin": "nil", "after": [f"p{i + 1}"]} for i in range(5000)
+        }
+        parts["p5000"] = {"plugin": "nil", "after": ["p0"]}
+        problems = Validator({"parts": parts}).problems()
+        self.assertThat(len(problems), Equals(5001))
+
+    def test_validate_raises(self):
+        raised = self.assertRaises(
+            errors.PartbuilderPartsValidationError,
+            Validator({"parts": {"foo": {"plugin": "nil", "after": ["foo"]}}}).validate,
+        )
+        self.assertThat(
+            str(raised),
+            Equals(
+                "Invalid parts definition: "
+                "Part 'foo' belongs to a circular dependency chain."
+            ),
+        )
+
+    def test_lifecycle_manager_validates(self):
+        self.assertRaises(
+            errors.PartbuilderPartsValidationError,
+            partbuilder.LifecycleManager,
+            parts={"parts": {"foo": {}}},
+        )
+
+
+class TestLoadParts(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        with open("parts.yaml", "w") as f:
+            f.write(
+                textwrap.dedent(
+                    """\
+                    parts:
+                      foo:
+                        plugin: nil
+                      bar:
+                        plugin: nil
+                        after: [foo]
+                    """
+                )
+            )
+
+    def test_load_parts(self):
+        parts = partbuilder.load_parts("parts.yaml")
+        self.assertThat(
+            parts,
+            Equals(
+                {
+                    "parts": {
+                        "foo": {"plugin": "nil"},
+                        "bar": {"plugin": "nil", "after": ["foo"]},
+                    }
+                }
+            ),
+        )
+
+    def test_validation_is_cached(self):
+        partbuilder.load_parts("parts.yaml")
+
+        with mock.patch.object(_loader, "Validator") as validator:
+            partbuilder.load_parts("parts.yaml")
+            validator.assert_not_called()
+
+            with open("parts.yaml", "a") as f:
+                f.write("  baz:\n    plugin: nil\n")
+            partbuilder.load_parts("parts.yaml")
+            validator.assert_called_once()
+
+    def test_duplicate_part_names(self):
+        with open("parts.yaml", "a") as f:
+            f.write("  foo:\n    plugin: nil\n")
+
+        raised = self.assertRaises(
+            errors.PartbuilderPartsValidationError,
+            partbuilder.load_parts,
+            "parts.yaml",
+        )
+        self.assertThat(raised.get_details(), Equals("Duplicate key 'foo' in line 7."))